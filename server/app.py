@@ -1,39 +1,159 @@
 # app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, request, jsonify, stream_with_context
 from flask_cors import CORS
 from config import Config
-from models import db, User, Cocktail, Ingredient, CocktailIngredient, Review
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from datetime import timedelta, datetime
+from models import (
+    db, User, Cocktail, CocktailIngredient, Review, CatalogState, touch_cocktails,
+    update_rating_aggregates, resolve_ingredients
+)
+from flask_jwt_extended import (
+    JWTManager, create_access_token, create_refresh_token, current_user, decode_token, get_jwt, jwt_required,
+    get_jwt_identity
+)
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from datetime import datetime
+from sqlalchemy import func, insert, text
+from sqlalchemy.orm import load_only
+from pagination import get_page_args, set_next_cursor
+from serializers import (
+    COCKTAIL_FIELDS, SEARCH_FIELDS, parse_fields, serialize_cocktail, serialize_review, serialize_user_review
+)
 from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from cache import ResponseCache
+from query_stats import QueryStats
+from metrics import Metrics
+from passwords import HasherBusy, PasswordHasher
+from identity import IdentityCache
+from revocation import RevocationList
+from ratelimit import RateLimiter
+from conditional import conditional
+import database
+import migrations
+import queries
+import search
+from pantry import PantryIndex
+from autocomplete import IngredientAutocomplete
+from catalog import CatalogCache
+import bulk
+from streaming import stream_json
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# CORS policy for /api/*; asgi.py applies the same one to its async routes
+API_CORS = {
+    "origins": ["https://client-vejc.vercel.app"],
+    "supports_credentials": True,
+    "allow_headers": ["Content-Type", "Authorization"],
+    "expose_headers": ["X-Next-Cursor", "Link", "ETag", "Last-Modified", "Server-Timing"],
+    "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+}
+
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # Behind reverse proxies, the client address (and scheme, host, prefix)
+    # come from the X-Forwarded-* headers they set; the rate limiter keys
+    # anonymous callers on that address
+    if any(app.config['PROXY_FIX'].values()):
+        app.wsgi_app = ProxyFix(app.wsgi_app, **app.config['PROXY_FIX'])
+    
     # Configure CORS with specific origins
-    CORS(app, resources={
-        r"/api/*": {
-            "origins": ["https://client-vejc.vercel.app"],
-            "supports_credentials": True,
-            "allow_headers": ["Content-Type", "Authorization"],
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-        }
-    })
+    CORS(app, resources={r"/api/*": API_CORS})
     
     # Initialize extensions
     db.init_app(app)
+    database.init_app(app, db)
     jwt = JWTManager(app)
+    pantry = PantryIndex()
+    pantry.init_app(app)
+    autocomplete = app.extensions['autocomplete'] = IngredientAutocomplete(pantry)
+    catalog = CatalogCache()
+    catalog.init_app(app)
+    response_cache = ResponseCache()
+    response_cache.init_app(app)
+    QueryStats().init_app(app)
+    metrics = Metrics()
+    metrics.init_app(app, response_cache)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    identities = IdentityCache()
+    identities.init_app(app)
+    # After the metrics hooks, so rejected requests are still counted
+    limiter = RateLimiter()
+    limiter.init_app(app)
+    limiter.exempt('metrics')
+
+    # Every @jwt_required() view resolves its caller through the identity
+    # cache, so tokens of deleted accounts are rejected without a query per
+    # request
+    @jwt.user_lookup_loader
+    def load_identity(jwt_header, jwt_data):
+        return identities.get(jwt_data['sub'])
+
+    @jwt.user_lookup_error_loader
+    def identity_not_found(jwt_header, jwt_data):
+        return jsonify({'error': 'User no longer exists'}), 401
+
+    revocations = RevocationList()
+    revocations.init_app(app)
+
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_data):
+        return revocations.is_revoked(jwt_data['jti'])
+
+    # Cheap validators for conditional GETs (queries.py)
+    def catalog_state():
+        return db.session.execute(queries.catalog_state_statement()).first()
+
+    def cocktail_state(id):
+        return db.session.execute(queries.cocktail_state_statement(id)).first()
+
+    def fetch_page(statement, limit):
+        return queries.split_page(db.session.scalars(queries.page_statement(statement, limit)).all(), limit)
+
+    def review_page(statement, limit):
+        # `statement` from queries.cocktail_reviews_statement() or
+        # user_reviews_statement()
+        reviews, has_more = fetch_page(statement, limit)
+        return reviews, queries.review_next_cursor(reviews, has_more)
+
+    def hashing_busy():
+        response = jsonify({'error': 'Too many sign-in requests, please retry shortly'})
+        response.headers['Retry-After'] = str(app.config['PASSWORD_HASH_RETRY_AFTER'])
+        return response, 429
+
+    def rehash_password(user, password):
+        # The password was just verified, so this is the one moment its hash
+        # can be brought up to the configured parameters. Best effort: a busy
+        # pool or failed write must not fail the login.
+        try:
+            user.password_hash = hasher.hash(password)
+            db.session.commit()
+            logger.info(f"Rehashed password for user: {user.username}")
+        except HasherBusy:
+            db.session.rollback()
+        except Exception as e:
+            logger.error(f"Password rehash failed for user {user.username}: {e}")
+            db.session.rollback()
+
+    def index_pantry(cocktail_id, ingredient_ids, created):
+        for ingredient_id, name in created.items():
+            pantry.add_ingredient(ingredient_id, name)
+        pantry.set_cocktail(cocktail_id, ingredient_ids)
+        autocomplete.add_ingredients(created)
 
     # Error handlers
     @app.errorhandler(HTTPException)
     def handle_http_error(error):
         logger.error(f"HTTP error occurred: {error}")
+        metrics.count_error(error.code, error)
         response = {
             "error": str(error.description),
             "status_code": error.code
@@ -43,6 +163,7 @@ def create_app():
     @app.errorhandler(Exception)
     def handle_generic_error(error):
         logger.error(f"Unexpected error occurred: {error}")
+        metrics.count_error(500, error)
         response = {
             "error": "An unexpected error occurred",
             "status_code": 500
@@ -51,13 +172,15 @@ def create_app():
 
     # Health check and home route
     @app.route('/')
+    @limiter.exempt
     def home():
         return jsonify({"message": "Welcome to the Cocktail API", "status": "online"})
 
     @app.route('/api/health-check')
+    @limiter.exempt
     def health_check():
         try:
-            db.session.execute('SELECT 1')
+            db.session.execute(text('SELECT 1'))
             return jsonify({
                 "status": "healthy",
                 "database": "connected",
@@ -70,8 +193,13 @@ def create_app():
                 "error": str(e)
             }), 503
 
+    @app.route('/api/cache/stats')
+    def cache_stats():
+        return jsonify(response_cache.stats())
+
     # User CRUD Operations
     @app.route('/api/register', methods=['POST'])
+    @limiter.limit(app.config['RATELIMIT_AUTH'])
     def register():
         try:
             data = request.get_json()
@@ -92,9 +220,9 @@ def create_app():
             
             user = User(
                 username=data['username'],
-                email=data['email'].lower()
+                email=data['email'].lower(),
+                password_hash=hasher.hash(data['password'])
             )
-            user.set_password(data['password'])
             
             db.session.add(user)
             db.session.commit()
@@ -105,12 +233,16 @@ def create_app():
                 'user_id': user.id
             }), 201
 
+        except HasherBusy:
+            db.session.rollback()
+            return hashing_busy()
         except Exception as e:
             logger.error(f"Registration error: {e}")
             db.session.rollback()
             return jsonify({'error': 'Registration failed'}), 500
 
     @app.route('/api/login', methods=['POST'])
+    @limiter.limit(app.config['RATELIMIT_AUTH'])
     def login():
         try:
             data = request.get_json()
@@ -120,15 +252,20 @@ def create_app():
 
             user = User.query.filter_by(username=data['username']).first()
             
-            if user and user.check_password(data['password']):
-                access_token = create_access_token(
-                    identity=user.id,
-                    expires_delta=timedelta(hours=24)
-                )
+            if user and hasher.verify(user.password_hash, data['password']):
+                if hasher.needs_rehash(user.password_hash):
+                    rehash_password(user, data['password'])
+                # Lets clients show who is signed in without asking the API;
+                # the server still resolves the caller by id
+                claims = {'username': user.username} if app.config['JWT_USERNAME_CLAIM'] else None
+                access_token = create_access_token(identity=user.id, additional_claims=claims)
+                refresh_token = create_refresh_token(identity=user.id)
                 
+                identities.remember(user)
                 logger.info(f"User logged in: {user.username}")
                 return jsonify({
                     'token': access_token,
+                    'refresh_token': refresh_token,
                     'user': {
                         'id': user.id,
                         'username': user.username,
@@ -138,31 +275,86 @@ def create_app():
                 
             return jsonify({'error': 'Invalid credentials'}), 401
 
+        except HasherBusy:
+            return hashing_busy()
         except Exception as e:
             logger.error(f"Login error: {e}")
             return jsonify({'error': 'Login failed'}), 500
 
+    @app.route('/api/token/refresh', methods=['POST'])
+    @jwt_required(refresh=True)
+    def refresh_token():
+        try:
+            claims = {'username': current_user.username} if app.config['JWT_USERNAME_CLAIM'] else None
+            return jsonify({
+                'token': create_access_token(identity=current_user.id, additional_claims=claims)
+            })
+        except Exception as e:
+            logger.error(f"Token refresh error: {e}")
+            return jsonify({'error': 'Token refresh failed'}), 500
+
+    @app.route('/api/logout', methods=['POST'])
+    @jwt_required(verify_type=False)
+    def logout():
+        # Revokes the presented token, and the refresh token too when it is
+        # passed in the body, so a client can end its session in one call
+        try:
+            tokens = [get_jwt()]
+            data = request.get_json(silent=True) or {}
+            if data.get('refresh_token'):
+                try:
+                    refresh = decode_token(data['refresh_token'])
+                except ExpiredSignatureError:
+                    return jsonify({'error': 'Refresh token has expired'}), 401
+                except (InvalidTokenError, JWTExtendedException, AttributeError, TypeError):
+                    # Malformed, badly signed, or not a string at all
+                    return jsonify({'error': 'Invalid refresh token'}), 400
+                if refresh['sub'] != get_jwt_identity() or refresh['type'] != 'refresh':
+                    return jsonify({'error': 'Invalid refresh token'}), 400
+                tokens.append(refresh)
+            revocations.revoke([token for token in tokens if not revocations.is_revoked(token['jti'])])
+            logger.info(f"User logged out: {current_user.username}")
+            return jsonify({'message': 'Logged out successfully'})
+        except Exception as e:
+            logger.error(f"Logout error: {e}")
+            db.session.rollback()
+            return jsonify({'error': 'Logout failed'}), 500
+
     @app.route('/api/user/profile', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
     @jwt_required()
     def get_user_profile():
         try:
             current_user_id = get_jwt_identity()
             user = User.query.get_or_404(current_user_id)
+            reviews, next_cursor = review_page(
+                queries.user_reviews_statement(current_user_id), app.config['EMBEDDED_REVIEWS_LIMIT']
+            )
             return jsonify({
                 'username': user.username,
                 'email': user.email,
-                'reviews': [{
-                    'id': review.id,
-                    'cocktail_name': review.cocktail.name,
-                    'content': review.content,
-                    'rating': review.rating,
-                    'created_at': review.created_at.isoformat()
-                } for review in user.reviews]
+                'reviews': [serialize_user_review(review) for review in reviews],
+                'reviews_next_cursor': next_cursor
             })
         except Exception as e:
             logger.error(f"Profile retrieval error: {e}")
             return jsonify({'error': 'Failed to retrieve profile'}), 500
 
+    @app.route('/api/user/profile/reviews', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
+    @jwt_required()
+    def get_user_reviews():
+        try:
+            limit, cursor = get_page_args(arity=2)
+            reviews, next_cursor = review_page(queries.user_reviews_statement(get_jwt_identity(), cursor), limit)
+            response = jsonify([serialize_user_review(review) for review in reviews])
+            return set_next_cursor(response, next_cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching user reviews: {e}")
+            return jsonify({'error': 'Failed to fetch reviews'}), 500
+
     @app.route('/api/user/profile', methods=['PUT'])
     @jwt_required()
     def update_user_profile():
@@ -171,10 +363,14 @@ def create_app():
             user = User.query.get_or_404(current_user_id)
             data = request.get_json()
 
+            reviewed = set()
             if 'username' in data and data['username'] != user.username:
                 if User.query.filter_by(username=data['username']).first():
                     return jsonify({'error': 'Username already exists'}), 400
                 user.username = data['username']
+                # Usernames are embedded in cocktail review lists
+                reviewed = {r.cocktail_id for r in user.reviews}
+                touch_cocktails(reviewed)
 
             if 'email' in data and data['email'] != user.email:
                 if User.query.filter_by(email=data['email']).first():
@@ -182,11 +378,16 @@ def create_app():
                 user.email = data['email']
 
             if 'password' in data:
-                user.set_password(data['password'])
+                user.password_hash = hasher.hash(data['password'])
 
             db.session.commit()
+            identities.invalidate(user.id)
+            response_cache.invalidate(*(f'cocktail:{cocktail_id}' for cocktail_id in reviewed))
             logger.info(f"Profile updated for user: {user.username}")
             return jsonify({'message': 'Profile updated successfully'})
+        except HasherBusy:
+            db.session.rollback()
+            return hashing_busy()
         except Exception as e:
             logger.error(f"Profile update error: {e}")
             db.session.rollback()
@@ -199,11 +400,21 @@ def create_app():
             current_user_id = get_jwt_identity()
             user = User.query.get_or_404(current_user_id)
             
+            reviewed = db.session.query(
+                Review.cocktail_id, func.count(Review.id), func.sum(Review.rating)
+            ).filter_by(user_id=current_user_id).group_by(Review.cocktail_id).all()
+
             # Delete all user's reviews first
             Review.query.filter_by(user_id=current_user_id).delete()
+            for cocktail_id, count, rating_sum in reviewed:
+                update_rating_aggregates(cocktail_id, -count, -rating_sum)
+            if reviewed:
+                CatalogState.bump()
             
             db.session.delete(user)
             db.session.commit()
+            identities.invalidate(current_user_id)
+            response_cache.invalidate('cocktails', *(f'cocktail:{cocktail_id}' for cocktail_id, _, _ in reviewed))
             
             logger.info(f"User account deleted: {user.username}")
             return jsonify({'message': 'User account deleted successfully'})
@@ -214,20 +425,24 @@ def create_app():
 
     # Cocktail CRUD Operations
     @app.route('/api/cocktails', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
+    @conditional(catalog_state)
+    @response_cache.cached(['cocktails'])
     def get_cocktails():
         try:
-            cocktails = Cocktail.query.all()
-            return jsonify([{
-                'id': c.id,
-                'name': c.name,
-                'image_url': c.image_url,
-                'instructions': c.instructions,
-                'glass_type': c.glass_type,
-                'ingredients': [{
-                    'name': ci.ingredient.name,
-                    'amount': ci.amount
-                } for ci in c.ingredients]
-            } for c in cocktails])
+            fields, sort, limit, cursor = queries.list_args(request.args, app.config)
+            if catalog.enabled:
+                snapshot = catalog.current()
+                cocktails, has_more = snapshot.page(sort, cursor, limit)
+                response = app.response_class(snapshot.cocktails_json(cocktails, fields), mimetype='application/json')
+                return set_next_cursor(response, queries.list_next_cursor(cocktails, sort, has_more))
+
+            cocktails, has_more = fetch_page(queries.cocktail_list_statement(fields, sort, cursor), limit)
+            next_cursor = queries.list_next_cursor(cocktails, sort, has_more)
+            response = stream_json(cocktails, lambda c: serialize_cocktail(c, fields))
+            return set_next_cursor(response, next_cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error fetching cocktails: {e}")
             return jsonify({'error': 'Failed to fetch cocktails'}), 500
@@ -244,6 +459,8 @@ def create_app():
                 if field not in data:
                     return jsonify({'error': f'{field} is required'}), 400
             
+            amounts = bulk.ingredient_amounts(data['ingredients'])
+
             # Create new cocktail
             cocktail = Cocktail(
                 name=data['name'],
@@ -254,61 +471,149 @@ def create_app():
             db.session.add(cocktail)
             db.session.flush()
 
-            # Add ingredients
-            for ingredient_data in data['ingredients']:
-                if not ingredient_data.get('name'):
-                    return jsonify({'error': 'Ingredient name is required'}), 400
-                
-                ingredient = Ingredient.query.filter_by(name=ingredient_data['name']).first()
-                if not ingredient:
-                    ingredient = Ingredient(name=ingredient_data['name'])
-                    db.session.add(ingredient)
-                    db.session.flush()
-
-                cocktail_ingredient = CocktailIngredient(
-                    cocktail_id=cocktail.id,
-                    ingredient_id=ingredient.id,
-                    amount=ingredient_data.get('amount', '')
-                )
-                db.session.add(cocktail_ingredient)
-
+            # Add ingredients: one lookup, one insert for new names, one
+            # executemany for the links
+            ids, created = resolve_ingredients(amounts)
+            if amounts:
+                db.session.execute(insert(CocktailIngredient), [{
+                    'cocktail_id': cocktail.id,
+                    'ingredient_id': ids[name],
+                    'amount': amount
+                } for name, amount in amounts.items()])
+
+            search.index_cocktails([cocktail.id])
+            CatalogState.bump()
             db.session.commit()
+            index_pantry(cocktail.id, ids.values(), created)
+            response_cache.invalidate('cocktails', 'ingredients')
             logger.info(f"New cocktail created: {cocktail.name}")
             return jsonify({
                 'message': 'Cocktail created successfully',
                 'id': cocktail.id
             }), 201
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error creating cocktail: {e}")
             db.session.rollback()
             return jsonify({'error': 'Failed to create cocktail'}), 500
 
+    @app.route('/api/cocktails/bulk', methods=['POST'])
+    @jwt_required()
+    def bulk_import_cocktails():
+        # NDJSON body, one cocktail per line. Valid lines are inserted in
+        # transactions of BULK_CHUNK_SIZE; invalid lines are skipped and
+        # reported by line number without failing the rest of the import.
+        chunk_size = app.config['BULK_CHUNK_SIZE']
+        max_errors = app.config['BULK_MAX_ERRORS']
+        imported, failed, errors = 0, 0, []
+
+        def report(line_number, message):
+            nonlocal failed
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append({'line': line_number, 'error': message})
+
+        def flush(chunk):
+            nonlocal imported
+            try:
+                rows, created = bulk.insert_chunk([record for _, record in chunk])
+                CatalogState.bump()
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error importing cocktails at lines {chunk[0][0]}-{chunk[-1][0]}: {e}")
+                db.session.rollback()
+                for line_number, _ in chunk:
+                    report(line_number, 'Failed to import cocktail')
+                return
+            for ingredient_id, name in created.items():
+                pantry.add_ingredient(ingredient_id, name)
+            autocomplete.add_ingredients(created)
+            for cocktail_id, ingredient_ids in rows:
+                pantry.set_cocktail(cocktail_id, ingredient_ids)
+            imported += len(rows)
+
+        chunk = []
+        for line_number, line in bulk.iter_lines(request.stream):
+            if not line.strip():
+                continue
+            try:
+                chunk.append((line_number, bulk.parse_record(line)))
+            except ValueError as e:
+                report(line_number, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+
+        if imported:
+            response_cache.invalidate('cocktails', 'ingredients')
+        logger.info(f"Bulk import: {imported} cocktails imported, {failed} failed")
+        return jsonify({
+            'imported': imported,
+            'failed': failed,
+            'errors': errors
+        }), 201 if imported else 400
+
+    @app.route('/api/cocktails/export', methods=['GET'])
+    @jwt_required()
+    def export_cocktails():
+        # Streamed, so the response never holds more than one yield_per batch
+        return Response(
+            stream_with_context(bulk.export_lines(app.config['BULK_CHUNK_SIZE'])),
+            mimetype='application/x-ndjson'
+        )
+
     @app.route('/api/cocktails/<int:id>', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
+    @conditional(cocktail_state)
+    @response_cache.cached(lambda id: [f'cocktail:{id}'])
     def get_cocktail(id):
         try:
-            cocktail = Cocktail.query.get_or_404(id)
-            return jsonify({
-                'id': cocktail.id,
-                'name': cocktail.name,
-                'image_url': cocktail.image_url,
-                'instructions': cocktail.instructions,
-                'glass_type': cocktail.glass_type,
-                'ingredients': [{
-                    'name': ci.ingredient.name,
-                    'amount': ci.amount
-                } for ci in cocktail.ingredients],
-                'reviews': [{
-                    'id': r.id,
-                    'content': r.content,
-                    'rating': r.rating,
-                    'user': r.user.username,
-                    'created_at': r.created_at.isoformat()
-                } for r in cocktail.reviews]
-            })
+            reviews_limit = app.config['EMBEDDED_REVIEWS_LIMIT']
+            if catalog.enabled:
+                snapshot = catalog.current()
+                record = snapshot.records.get(id)
+                if record is None:
+                    abort(404)
+                reviews, next_cursor = review_page(queries.cocktail_reviews_statement(id), reviews_limit)
+                return app.response_class(
+                    snapshot.cocktail_json(record, [serialize_review(r) for r in reviews], next_cursor),
+                    mimetype='application/json'
+                )
+            cocktail = db.session.scalars(queries.cocktail_detail_statement(id, COCKTAIL_FIELDS)).first()
+            if cocktail is None:
+                abort(404)
+            reviews, next_cursor = review_page(queries.cocktail_reviews_statement(id), reviews_limit)
+            return jsonify(queries.serialize_cocktail_detail(
+                cocktail, [serialize_review(r) for r in reviews], next_cursor
+            ))
+        except HTTPException:
+            # 404 for unknown ids
+            raise
         except Exception as e:
             logger.error(f"Error fetching cocktail {id}: {e}")
             return jsonify({'error': 'Failed to fetch cocktail'}), 500
 
+    @app.route('/api/cocktails/<int:id>/reviews', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
+    @conditional(cocktail_state)
+    @response_cache.cached(lambda id: [f'cocktail:{id}'])
+    def get_cocktail_reviews(id):
+        try:
+            limit, cursor = get_page_args(arity=2)
+            reviews, next_cursor = review_page(queries.cocktail_reviews_statement(id, cursor), limit)
+            response = jsonify([serialize_review(r) for r in reviews])
+            return set_next_cursor(response, next_cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching reviews for cocktail {id}: {e}")
+            return jsonify({'error': 'Failed to fetch reviews'}), 500
+
     @app.route('/api/cocktails/<int:id>', methods=['PUT'])
     @jwt_required()
     def update_cocktail(id):
@@ -322,27 +627,44 @@ def create_app():
             cocktail.instructions = data.get('instructions', cocktail.instructions)
             cocktail.glass_type = data.get('glass_type', cocktail.glass_type)
 
-            # Update ingredients
+            # Update ingredients by diffing against the stored rows instead
+            # of deleting and re-inserting all of them
+            ingredient_ids = None
             if 'ingredients' in data:
-                CocktailIngredient.query.filter_by(cocktail_id=cocktail.id).delete()
-
-                for ingredient_data in data['ingredients']:
-                    ingredient = Ingredient.query.filter_by(name=ingredient_data['name']).first()
-                    if not ingredient:
-                        ingredient = Ingredient(name=ingredient_data['name'])
-                        db.session.add(ingredient)
-                        db.session.flush()
-
-                    cocktail_ingredient = CocktailIngredient(
-                        cocktail_id=cocktail.id,
-                        ingredient_id=ingredient.id,
-                        amount=ingredient_data.get('amount', '')
-                    )
-                    db.session.add(cocktail_ingredient)
-
+                amounts = bulk.ingredient_amounts(data['ingredients'])
+                ids, created = resolve_ingredients(amounts)
+                wanted = {ids[name]: amount for name, amount in amounts.items()}
+                current = {ci.ingredient_id: ci for ci in CocktailIngredient.query.filter_by(cocktail_id=cocktail.id)}
+
+                removed = [ci.id for ingredient_id, ci in current.items() if ingredient_id not in wanted]
+                if removed:
+                    CocktailIngredient.query.filter(
+                        CocktailIngredient.id.in_(removed)
+                    ).delete(synchronize_session=False)
+
+                added = []
+                for ingredient_id, amount in wanted.items():
+                    if ingredient_id not in current:
+                        added.append({'cocktail_id': cocktail.id, 'ingredient_id': ingredient_id, 'amount': amount})
+                    elif current[ingredient_id].amount != amount:
+                        current[ingredient_id].amount = amount
+                if added:
+                    db.session.execute(insert(CocktailIngredient), added)
+                ingredient_ids = wanted.keys()
+
+            cocktail.version = Cocktail.version + 1
+            db.session.flush()
+            search.index_cocktails([cocktail.id])
+            CatalogState.bump()
             db.session.commit()
+            if ingredient_ids is not None:
+                index_pantry(cocktail.id, ingredient_ids, created)
+            response_cache.invalidate('cocktails', f'cocktail:{id}', 'ingredients')
             logger.info(f"Cocktail updated: {cocktail.name}")
             return jsonify({'message': 'Cocktail updated successfully'})
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error updating cocktail {id}: {e}")
             db.session.rollback()
@@ -357,7 +679,11 @@ def create_app():
             Review.query.filter_by(cocktail_id=id).delete()
             CocktailIngredient.query.filter_by(cocktail_id=id).delete()
             db.session.delete(cocktail)
+            search.remove_cocktails([id])
+            CatalogState.bump()
             db.session.commit()
+            pantry.remove_cocktail(id)
+            response_cache.invalidate('cocktails', f'cocktail:{id}')
             
             logger.info(f"Cocktail deleted: {cocktail.name}")
             return jsonify({'message': 'Cocktail deleted successfully'})
@@ -376,24 +702,30 @@ def create_app():
             
             if not data.get('content') or 'rating' not in data:
                 return jsonify({'error': 'Content and rating are required'}), 400
+            rating = queries.review_rating(data['rating'])
+            if cocktail_state(cocktail_id) is None:
+                abort(404)
             
             review = Review(
                 content=data['content'],
-                rating=data['rating'],
+                rating=rating,
                 user_id=current_user_id,
                 cocktail_id=cocktail_id
             )
             
             db.session.add(review)
+            statements, namespaces = queries.review_created(review)
+            for statement in statements:
+                db.session.execute(statement)
             db.session.commit()
+            response_cache.invalidate(*namespaces)
             
-            return jsonify({
-                'id': review.id,
-                'content': review.content,
-                'rating': review.rating,
-                'user': review.user.username,
-                'created_at': review.created_at.isoformat()
-            }), 201
+            return jsonify(serialize_review(review)), 201
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except HTTPException:
+            # Unknown cocktail, or a body that is not JSON
+            raise
         except Exception as e:
             logger.error(f"Error creating review: {e}")
             db.session.rollback()
@@ -403,7 +735,6 @@ def create_app():
     @jwt_required()
     def update_review(review_id):
         try:
-            current_user_id = get_jwt
             current_user_id = get_jwt_identity()
             review = Review.query.get_or_404(review_id)
             
@@ -412,21 +743,20 @@ def create_app():
                 
             data = request.get_json()
             
-            if 'content' in data:
-                review.content = data['content']
-            if 'rating' in data:
-                review.rating = data['rating']
-            
+            statements, namespaces = queries.review_updated(review, data)
+            for statement in statements:
+                db.session.execute(statement)
             db.session.commit()
+            response_cache.invalidate(*namespaces)
             logger.info(f"Review updated: ID {review.id}")
             
-            return jsonify({
-                'id': review.id,
-                'content': review.content,
-                'rating': review.rating,
-                'user': review.user.username,
-                'created_at': review.created_at.isoformat()
-            })
+            return jsonify(serialize_review(review))
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        except HTTPException:
+            # get_or_404, or a body that is not JSON
+            raise
         except Exception as e:
             logger.error(f"Error updating review {review_id}: {e}")
             db.session.rollback()
@@ -443,10 +773,17 @@ def create_app():
                 return jsonify({'error': 'Unauthorized'}), 403
             
             db.session.delete(review)
+            statements, namespaces = queries.review_deleted(review)
+            for statement in statements:
+                db.session.execute(statement)
             db.session.commit()
+            response_cache.invalidate(*namespaces)
             logger.info(f"Review deleted: ID {review_id}")
             
             return jsonify({'message': 'Review deleted successfully'})
+        except HTTPException:
+            # 404 from get_or_404
+            raise
         except Exception as e:
             logger.error(f"Error deleting review {review_id}: {e}")
             db.session.rollback()
@@ -454,15 +791,14 @@ def create_app():
 
     # New helper endpoint for token verification
     @app.route('/api/verify-token', methods=['POST'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
     @jwt_required()
     def verify_token():
         try:
-            current_user_id = get_jwt_identity()
-            user = User.query.get_or_404(current_user_id)
             return jsonify({
                 'valid': True,
-                'user_id': user.id,
-                'username': user.username
+                'user_id': current_user.id,
+                'username': current_user.username
             })
         except Exception as e:
             logger.error(f"Token verification error: {e}")
@@ -470,60 +806,119 @@ def create_app():
 
     # Search endpoints
     @app.route('/api/cocktails/search', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
     def search_cocktails():
         try:
             query = request.args.get('q', '').lower()
             ingredient = request.args.get('ingredient', '').lower()
-            
-            cocktails_query = Cocktail.query
-            
-            if query:
-                cocktails_query = cocktails_query.filter(
-                    Cocktail.name.ilike(f'%{query}%')
+            fields = parse_fields(request.args.get('fields'), SEARCH_FIELDS)
+
+            match = search.build_match(query, ingredient) if search.is_enabled() else None
+            if match:
+                # Ranked full-text search; pages are keyed on (score, id)
+                limit, cursor = get_page_args(arity=2)
+                hits, has_more = queries.split_page(search.search_ids(match, limit + 1, cursor), limit)
+                cocktails = queries.in_hit_order(hits, db.session.scalars(
+                    queries.cocktails_by_id_statement(fields, [cocktail_id for cocktail_id, _ in hits])
+                ))
+                next_cursor = queries.search_hits_next_cursor(hits, has_more)
+            else:
+                limit, cursor = get_page_args()
+                cocktails, has_more = fetch_page(
+                    queries.substring_search_statement(query, ingredient, fields, cursor), limit
                 )
-            
-            if ingredient:
-                cocktails_query = cocktails_query.join(
-                    CocktailIngredient
-                ).join(
-                    Ingredient
-                ).filter(
-                    Ingredient.name.ilike(f'%{ingredient}%')
-                )
-            
-            cocktails = cocktails_query.all()
-            
-            return jsonify([{
-                'id': c.id,
-                'name': c.name,
-                'image_url': c.image_url,
-                'glass_type': c.glass_type,
-                'ingredients': [{
-                    'name': ci.ingredient.name,
-                    'amount': ci.amount
-                } for ci in c.ingredients]
-            } for c in cocktails])
+                next_cursor = queries.list_next_cursor(cocktails, 'id', has_more)
+
+            response = stream_json(cocktails, lambda c: serialize_cocktail(c, fields))
+            return set_next_cursor(response, next_cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Search error: {e}")
             return jsonify({'error': 'Search failed'}), 500
 
+    @app.route('/api/cocktails/makeable', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
+    def get_makeable_cocktails():
+        try:
+            values = [v for arg in request.args.getlist('ingredients') for v in arg.split(',') if v.strip()]
+            if not values:
+                return jsonify({'error': 'ingredients is required'}), 400
+            max_missing = int(request.args.get('max_missing', 0))
+            limit = int(request.args.get('limit', app.config['API_DEFAULT_PAGE_SIZE']))
+            if max_missing < 0 or not 1 <= limit <= app.config['API_MAX_PAGE_SIZE']:
+                return jsonify({'error': 'Invalid max_missing or limit'}), 400
+
+            pantry.sync()
+            matches = pantry.makeable(pantry.resolve(values), max_missing, limit)
+            by_id = {c.id: c for c in Cocktail.query.options(
+                load_only(Cocktail.id, Cocktail.name, Cocktail.image_url, Cocktail.glass_type)
+            ).filter(Cocktail.id.in_([cocktail_id for cocktail_id, _ in matches]))}
+
+            return jsonify([{
+                'id': cocktail_id,
+                'name': by_id[cocktail_id].name,
+                'image_url': by_id[cocktail_id].image_url,
+                'glass_type': by_id[cocktail_id].glass_type,
+                'missing_count': len(missing),
+                'missing_ingredients': [pantry.ingredient_name(i) for i in missing]
+            } for cocktail_id, missing in matches if cocktail_id in by_id])
+        except ValueError:
+            return jsonify({'error': 'max_missing and limit must be integers'}), 400
+        except Exception as e:
+            logger.error(f"Error fetching makeable cocktails: {e}")
+            return jsonify({'error': 'Failed to fetch makeable cocktails'}), 500
+
     @app.route('/api/ingredients', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_READ'])
+    @conditional(catalog_state)
+    @response_cache.cached(['ingredients'])
     def get_ingredients():
         try:
-            ingredients = Ingredient.query.order_by(Ingredient.name).all()
-            return jsonify([{
+            if catalog.enabled:
+                return app.response_class(catalog.current().ingredients_json, mimetype='application/json')
+            # Streamed as the rows are fetched
+            ingredients = db.session.execute(queries.ingredients_statement())
+            return stream_json(ingredients, lambda i: {
                 'id': i.id,
                 'name': i.name
-            } for i in ingredients])
+            })
         except Exception as e:
             logger.error(f"Error fetching ingredients: {e}")
             return jsonify({'error': 'Failed to fetch ingredients'}), 500
 
+    @app.route('/api/ingredients/autocomplete', methods=['GET'])
+    @limiter.limit(app.config['RATELIMIT_AUTOCOMPLETE'])
+    def autocomplete_ingredients():
+        try:
+            prefix = request.args.get('prefix', '')
+            limit = int(request.args.get('limit', app.config['AUTOCOMPLETE_DEFAULT_LIMIT']))
+            if not 1 <= limit <= app.config['AUTOCOMPLETE_MAX_LIMIT']:
+                return jsonify({'error': 'Invalid limit'}), 400
+
+            autocomplete.sync()
+            return jsonify([{
+                'id': ingredient_id,
+                'name': name,
+                'cocktail_count': count
+            } for ingredient_id, name, count in autocomplete.complete(prefix, limit)])
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        except Exception as e:
+            logger.error(f"Error completing ingredients: {e}")
+            return jsonify({'error': 'Failed to complete ingredients'}), 500
+
     # Initialize the app context and create tables
     with app.app_context():
         try:
             db.create_all()
             logger.info("Database tables created successfully")
+            migrations.upgrade()
+            search.init_app(app)
+            pantry.load()
+            autocomplete.load()
+            catalog.load()
+            revocations.load()
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
             raise e
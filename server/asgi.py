@@ -0,0 +1,605 @@
+# asgi.py
+#
+# Async serving mode. The catalog reads and the review writes run as
+# coroutines on SQLAlchemy's asyncio engine (aiosqlite for SQLite, asyncpg
+# for PostgreSQL); every other route falls through to the Flask app from
+# create_app(), mounted underneath and run in a thread pool, so the URL
+# surface and the response bodies are the same as under a WSGI server. The
+# statements and bodies come from queries.py, as in app.py, and the catalog
+# snapshot, metrics and SQL stats of the Flask app cover these routes too.
+# Needs the packages in requirements-async.txt. Run from the server
+# directory with:
+#
+#   uvicorn --factory asgi:create_asgi_app --workers 4
+import asyncio
+import logging
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
+from functools import partial
+from urllib.parse import urlencode
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound
+from werkzeug.http import http_date, parse_date, parse_etags
+from app import API_CORS, create_app
+from conditional import make_etag
+import database
+from identity import identity_query
+from models import db, Review
+from pagination import parse_page_args
+import queries
+from ratelimit import TOO_MANY_REQUESTS
+import search
+from serializers import COCKTAIL_FIELDS, SEARCH_FIELDS, parse_fields, serialize_cocktail, serialize_review
+from streaming import async_json_array, dumps, json_array
+
+logger = logging.getLogger(__name__)
+
+# Sync dialect -> the asyncio driver used for ASYNC_DATABASE_URL's default
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def json_response(data, status=200, headers=None):
+    return Response(dumps(data), status, headers, media_type='application/json')
+
+
+def async_database_url(app):
+    if app.config['ASYNC_DATABASE_URL']:
+        return app.config['ASYNC_DATABASE_URL']
+    with app.app_context():
+        # The engine's URL, not the config string: Flask-SQLAlchemy resolves
+        # relative SQLite paths against the instance folder
+        url = db.engine.url
+    if url.get_backend_name() not in ASYNC_DRIVERS or (url.get_backend_name() == 'sqlite' and not url.database):
+        raise RuntimeError(f"No async driver for {url.render_as_string()}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def create_asgi_app():
+    flask_app = create_app()
+    config = flask_app.config
+    response_cache = flask_app.extensions['response_cache']
+    identities = flask_app.extensions['identity_cache']
+    revocations = flask_app.extensions['revocation_list']
+    fts_enabled = flask_app.extensions['cocktail_search']
+    limiter = flask_app.extensions['rate_limiter']
+    catalog = flask_app.extensions['catalog']
+    metrics = flask_app.extensions['metrics']
+    query_stats = flask_app.extensions['query_stats']
+    # Metric labels are the Flask rules of the same endpoints
+    rules = {rule.endpoint: rule.rule for rule in flask_app.url_map.iter_rules()}
+
+    options = dict(config['SQLALCHEMY_ENGINE_OPTIONS'])
+    if 'pool_size' in options:
+        # aiosqlite defaults to NullPool, which would open a connection (and
+        # aiosqlite's thread) per request
+        options['poolclass'] = AsyncAdaptedQueuePool
+    engine = create_async_engine(async_database_url(flask_app), **options)
+    if engine.dialect.name == 'sqlite':
+        database.apply_pragmas(engine.sync_engine, config['SQLITE_PRAGMAS'])
+    if metrics.enabled:
+        metrics.instrument_pool(engine.sync_engine.pool)
+    if query_stats.enabled:
+        query_stats.watch(engine.sync_engine)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    # SQLite has one writer at a time, and a write transaction here stays
+    # open across awaits while the loop serves other requests; queueing the
+    # writers of this process on a lock keeps them from spending their
+    # busy_timeout (and failing with "database is locked") behind each other
+    write_lock = asyncio.Lock() if engine.dialect.name == 'sqlite' else None
+
+    def writing():
+        return write_lock if write_lock is not None else nullcontext()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    # The decorator stack of the sync views, conditional(state) outside
+    # response_cache.cached(namespaces), sharing the Flask app's cache so
+    # writes on either side invalidate entries for both
+    def endpoint(view, state=None, namespaces=None):
+        route = rules.get(view.__name__, 'unmatched')
+
+        async def handle(request):
+            # The before/after/teardown hooks of Metrics and QueryStats
+            started = metrics.start_request() if metrics.enabled else None
+            stats = query_stats.begin(request.method, request.url.path, view.__name__) if query_stats.enabled else None
+
+            def finish(status):
+                if stats is not None:
+                    query_stats.log(stats)
+                if started is not None:
+                    metrics.finish_request(started, route, request.method, status)
+
+            try:
+                response = await respond(request)
+            except BaseException:
+                finish(500)
+                raise
+            if stats is not None:
+                response.headers.append('Server-Timing', query_stats.server_timing(stats))
+            if isinstance(response, StreamingResponse):
+                # Once the body is sent, like teardown_request
+                response.body_iterator = finish_after(response.body_iterator, finish, response.status_code)
+            else:
+                finish(response.status_code)
+            return response
+
+        async def respond(request):
+            params = request.path_params
+            # Same counters as the Flask endpoint of the same name
+            retry_after = await rate_limited(request, view.__name__)
+            if retry_after is not None:
+                response = json_response(TOO_MANY_REQUESTS, 429, {'Retry-After': str(retry_after)})
+            else:
+                async with Session() as session:
+                    validator = await state(session, **params) if state is not None else None
+                    # The catalog snapshot is served when it is at least at
+                    # this version
+                    request.state.validator = validator
+                    render = partial(view, request, session, **params)
+                    if namespaces is not None:
+                        version = validator[0] if validator is not None else None
+                        render = partial(cached, request, namespaces(**params), version, render)
+                    if state is not None:
+                        response = await conditional(request, validator, render)
+                    else:
+                        response = await render()
+            if request.url.path.startswith('/api/'):
+                response.headers.update(cors_headers(request))
+            return response
+        return handle
+
+    async def finish_after(chunks, finish, status):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            finish(status)
+
+    async def rate_limited(request, endpoint):
+        if not limiter.enabled or not limiter.limits_for(endpoint):
+            return None
+        with flask_app.app_context():
+            client = limiter.client_key(request.headers.get('Authorization'), client_address(request))
+        # The counter storage is blocking (SQLite waits out other writers for
+        # up to its busy timeout), so it runs off the loop
+        return await run_in_threadpool(limiter.hit, endpoint, client)
+
+    def client_address(request):
+        # The address ProxyFix gives the Flask routes: the PROXY_FIX x_for-th
+        # X-Forwarded-For entry from the right, if there are that many
+        trusted = config['PROXY_FIX']['x_for']
+        forwarded = ','.join(request.headers.getlist('X-Forwarded-For')).split(',')
+        if trusted and len(forwarded) >= trusted and forwarded[-trusted].strip():
+            return forwarded[-trusted].strip()
+        return request.client.host if request.client else None
+
+    async def conditional(request, state, render):
+        if state is None:
+            return await render()
+        version, last_modified = state
+        etag = make_etag(request.url.path, request.query_params.multi_items(), version)
+        if last_modified is not None:
+            last_modified = last_modified.replace(microsecond=0)
+
+        if not_modified(request, etag, last_modified):
+            response = Response(status_code=304)
+        else:
+            response = await render()
+            if response.status_code != 200:
+                return response
+        response.headers['ETag'] = f'"{etag}"'
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+
+    async def cached(request, namespaces, resource_version, render):
+        if not response_cache.enabled:
+            return await render()
+        key = response_cache.make_key(
+            request.url.path, request.query_params.multi_items(), namespaces, resource_version
+        )
+        entry = response_cache.lookup(key)
+        if entry is not None:
+            body, status, headers = entry
+            return Response(body, status, dict(headers))
+
+        response = await render()
+        if response.status_code == 200:
+            headers = [[k, v] for k, v in response.headers.items() if k != 'content-length']
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = store_streamed(key, headers, response.body_iterator)
+            else:
+                response_cache.store(key, response.body.decode(), headers)
+        return response
+
+    async def store_streamed(key, headers, chunks):
+        # Cached once sent in full, like ResponseCache._store_streamed
+        body, size = [], 0
+        async for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                body.append(chunk)
+                if not response_cache.cacheable_size(size):
+                    body = None
+            yield chunk
+        if body is not None:
+            response_cache.store(key, b''.join(body).decode(), headers)
+
+    async def authenticate(request, session):
+        # What jwt_required() and the JWTManager loaders in app.py do for the
+        # sync views; returns (UserIdentity, None) or (None, error response)
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if not scheme:
+            return None, json_response({'msg': 'Missing Authorization Header'}, 401)
+        if scheme != 'Bearer' or not token:
+            return None, json_response({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}, 422)
+        with flask_app.app_context():
+            try:
+                claims = decode_token(token)
+            except ExpiredSignatureError:
+                return None, json_response({'msg': 'Token has expired'}, 401)
+            except Exception as e:
+                return None, json_response({'msg': str(e)}, 422)
+            if claims['type'] != 'access':
+                return None, json_response({'msg': 'Only non-refresh tokens are allowed'}, 422)
+            # A dict lookup, plus a short blocking query once per
+            # REVOCATION_SYNC_INTERVAL
+            if revocations.is_revoked(claims['jti']):
+                return None, json_response({'msg': 'Token has been revoked'}, 401)
+
+        identity = identities.cached(claims['sub'])
+        if identity is None:
+            row = (await session.execute(identity_query(claims['sub']))).first()
+            identity = identities.put(claims['sub'], row)
+        if not identity:
+            return None, json_response({'error': 'User no longer exists'}, 401)
+        return identity, None
+
+    # Validators for conditional GETs, as in app.py
+    async def catalog_state(session):
+        return (await session.execute(queries.catalog_state_statement())).first()
+
+    async def cocktail_state(session, id):
+        return (await session.execute(queries.cocktail_state_statement(id))).first()
+
+    def current_snapshot():
+        with flask_app.app_context():
+            return catalog.current()
+
+    async def snapshot(request):
+        # The snapshot as of the catalog_state validator; refreshing it runs
+        # the sync queries of CatalogCache in a worker thread
+        validator = request.state.validator
+        current = catalog.fresh(validator.version) if validator is not None else None
+        return current if current is not None else await run_in_threadpool(current_snapshot)
+
+    async def cocktail_record(request, id):
+        # A cocktail's record, when the snapshot holds the version the
+        # cocktail_state validator read; otherwise the snapshot is refreshed
+        validator = request.state.validator
+        current = catalog.fresh(0)
+        record = current.records.get(id) if current is not None else None
+        if validator is None or record is None or (record.version, record.updated_at) != tuple(validator):
+            current = await run_in_threadpool(current_snapshot)
+            record = current.records.get(id)
+        return current, record
+
+    def page_args(request, arity=1):
+        return parse_page_args(request.query_params, config, arity)
+
+    async def fetch_page(session, statement, limit):
+        return queries.split_page((await session.scalars(queries.page_statement(statement, limit))).all(), limit)
+
+    async def review_page(session, statement, limit):
+        reviews, has_more = await fetch_page(session, statement, limit)
+        return reviews, queries.review_next_cursor(reviews, has_more)
+
+    def cocktail_list(request, cocktails, fields, next_cursor):
+        body = b''.join(json_array(cocktails, lambda c: serialize_cocktail(c, fields)))
+        return with_next_cursor(request, Response(body, media_type='application/json'), next_cursor)
+
+    async def write(session, statements):
+        # Runs a review write's queries.review_*() statements and commits
+        async with writing():
+            for statement in statements:
+                await session.execute(statement)
+            await session.commit()
+
+    def http_error(error):
+        # handle_http_error() in app.py
+        metrics.count_error(error.code, error)
+        return json_response({
+            "error": str(error.description),
+            "status_code": error.code
+        }, error.code)
+
+    async def home(request, session):
+        return json_response({"message": "Welcome to the Cocktail API", "status": "online"})
+
+    async def health_check(request, session):
+        try:
+            await session.execute(text('SELECT 1'))
+            return json_response({
+                "status": "healthy",
+                "database": "connected",
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            logger.error(f"Health check failed: {e}")
+            return json_response({
+                "status": "unhealthy",
+                "error": str(e)
+            }, 503)
+
+    async def get_cocktails(request, session):
+        try:
+            fields, sort, limit, cursor = queries.list_args(request.query_params, config)
+            if catalog.enabled:
+                current = await snapshot(request)
+                cocktails, has_more = current.page(sort, cursor, limit)
+                response = Response(current.cocktails_json(cocktails, fields), media_type='application/json')
+                return with_next_cursor(request, response, queries.list_next_cursor(cocktails, sort, has_more))
+
+            cocktails, has_more = await fetch_page(session, queries.cocktail_list_statement(fields, sort, cursor), limit)
+            return cocktail_list(request, cocktails, fields, queries.list_next_cursor(cocktails, sort, has_more))
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        except Exception as e:
+            logger.error(f"Error fetching cocktails: {e}")
+            return json_response({'error': 'Failed to fetch cocktails'}, 500)
+
+    async def get_cocktail(request, session, id):
+        try:
+            reviews_limit = config['EMBEDDED_REVIEWS_LIMIT']
+            if catalog.enabled:
+                current, record = await cocktail_record(request, id)
+                if record is None:
+                    return http_error(NotFound())
+                reviews, next_cursor = await review_page(session, queries.cocktail_reviews_statement(id), reviews_limit)
+                return Response(
+                    current.cocktail_json(record, [serialize_review(r) for r in reviews], next_cursor),
+                    media_type='application/json'
+                )
+            cocktail = (await session.scalars(queries.cocktail_detail_statement(id, COCKTAIL_FIELDS))).first()
+            if cocktail is None:
+                return http_error(NotFound())
+            reviews, next_cursor = await review_page(session, queries.cocktail_reviews_statement(id), reviews_limit)
+            return json_response(queries.serialize_cocktail_detail(
+                cocktail, [serialize_review(r) for r in reviews], next_cursor
+            ))
+        except Exception as e:
+            logger.error(f"Error fetching cocktail {id}: {e}")
+            return json_response({'error': 'Failed to fetch cocktail'}, 500)
+
+    async def get_cocktail_reviews(request, session, id):
+        try:
+            limit, cursor = page_args(request, arity=2)
+            reviews, next_cursor = await review_page(session, queries.cocktail_reviews_statement(id, cursor), limit)
+            response = json_response([serialize_review(r) for r in reviews])
+            return with_next_cursor(request, response, next_cursor)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        except Exception as e:
+            logger.error(f"Error fetching reviews for cocktail {id}: {e}")
+            return json_response({'error': 'Failed to fetch reviews'}, 500)
+
+    async def search_cocktails(request, session):
+        try:
+            query = request.query_params.get('q', '').lower()
+            ingredient = request.query_params.get('ingredient', '').lower()
+            fields = parse_fields(request.query_params.get('fields'), SEARCH_FIELDS)
+
+            match = search.build_match(query, ingredient) if fts_enabled else None
+            if match:
+                limit, cursor = page_args(request, arity=2)
+                hits, has_more = queries.split_page([tuple(row) for row in await session.execute(
+                    *search.search_statement(match, limit + 1, cursor)
+                )], limit)
+                cocktails = queries.in_hit_order(hits, await session.scalars(
+                    queries.cocktails_by_id_statement(fields, [cocktail_id for cocktail_id, _ in hits])
+                ))
+                next_cursor = queries.search_hits_next_cursor(hits, has_more)
+            else:
+                limit, cursor = page_args(request)
+                cocktails, has_more = await fetch_page(
+                    session, queries.substring_search_statement(query, ingredient, fields, cursor), limit
+                )
+                next_cursor = queries.list_next_cursor(cocktails, 'id', has_more)
+
+            return cocktail_list(request, cocktails, fields, next_cursor)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+            return json_response({'error': 'Search failed'}, 500)
+
+    async def get_ingredients(request, session):
+        if catalog.enabled:
+            return Response((await snapshot(request)).ingredients_json, media_type='application/json')
+
+        # Streamed off a server-side cursor; the body outlives the request's
+        # session, so it gets one of its own
+        async def rows():
+            async with Session() as stream_session:
+                async for row in await stream_session.stream(queries.ingredients_statement()):
+                    yield row
+
+        return StreamingResponse(async_json_array(rows(), lambda i: {
+            'id': i.id,
+            'name': i.name
+        }), media_type='application/json')
+
+    async def create_review(request, session, cocktail_id):
+        identity, error = await authenticate(request, session)
+        if error is not None:
+            return error
+        try:
+            data = await read_json(request)
+
+            if not data.get('content') or 'rating' not in data:
+                return json_response({'error': 'Content and rating are required'}, 400)
+            rating = queries.review_rating(data['rating'])
+            if await cocktail_state(session, cocktail_id) is None:
+                raise NotFound()
+
+            review = Review(
+                content=data['content'],
+                rating=rating,
+                user_id=identity.id,
+                cocktail_id=cocktail_id
+            )
+
+            session.add(review)
+            statements, namespaces = queries.review_created(review)
+            await write(session, statements)
+            response_cache.invalidate(*namespaces)
+
+            return json_response(serialize_review(review, identity.username), 201)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        except HTTPException as e:
+            return http_error(e)
+        except Exception as e:
+            logger.error(f"Error creating review: {e}")
+            await session.rollback()
+            return json_response({'error': 'Failed to create review'}, 500)
+
+    async def update_review(request, session, review_id):
+        identity, error = await authenticate(request, session)
+        if error is not None:
+            return error
+        try:
+            review = await session.get(Review, review_id)
+            if review is None:
+                raise NotFound()
+
+            if review.user_id != identity.id:
+                return json_response({'error': 'Unauthorized'}, 403)
+
+            data = await read_json(request)
+
+            statements, namespaces = queries.review_updated(review, data)
+            await write(session, statements)
+            response_cache.invalidate(*namespaces)
+            logger.info(f"Review updated: ID {review.id}")
+
+            return json_response(serialize_review(review, identity.username))
+        except ValueError as e:
+            await session.rollback()
+            return json_response({'error': str(e)}, 400)
+        except HTTPException as e:
+            return http_error(e)
+        except Exception as e:
+            logger.error(f"Error updating review {review_id}: {e}")
+            await session.rollback()
+            return json_response({'error': 'Failed to update review'}, 500)
+
+    async def delete_review(request, session, review_id):
+        identity, error = await authenticate(request, session)
+        if error is not None:
+            return error
+        try:
+            review = await session.get(Review, review_id)
+            if review is None:
+                raise NotFound()
+
+            if review.user_id != identity.id:
+                return json_response({'error': 'Unauthorized'}, 403)
+
+            await session.delete(review)
+            statements, namespaces = queries.review_deleted(review)
+            await write(session, statements)
+            response_cache.invalidate(*namespaces)
+            logger.info(f"Review deleted: ID {review_id}")
+
+            return json_response({'message': 'Review deleted successfully'})
+        except HTTPException as e:
+            return http_error(e)
+        except Exception as e:
+            logger.error(f"Error deleting review {review_id}: {e}")
+            await session.rollback()
+            return json_response({'error': 'Failed to delete review'}, 500)
+
+    async def handle_generic_error(request, error):
+        logger.error(f"Unexpected error occurred: {error}")
+        metrics.count_error(500, error)
+        return json_response({
+            "error": "An unexpected error occurred",
+            "status_code": 500
+        }, 500)
+
+    cocktail_namespaces = lambda id: [f'cocktail:{id}']
+    routes = [
+        Route('/', endpoint(home)),
+        Route('/api/health-check', endpoint(health_check)),
+        Route('/api/cocktails', endpoint(get_cocktails, catalog_state, lambda: ['cocktails'])),
+        Route('/api/cocktails/search', endpoint(search_cocktails)),
+        Route('/api/cocktails/{id:int}', endpoint(get_cocktail, cocktail_state, cocktail_namespaces)),
+        Route('/api/cocktails/{id:int}/reviews', endpoint(get_cocktail_reviews, cocktail_state, cocktail_namespaces)),
+        Route('/api/cocktails/{cocktail_id:int}/reviews', endpoint(create_review), methods=['POST']),
+        Route('/api/reviews/{review_id:int}', endpoint(update_review), methods=['PUT']),
+        Route('/api/reviews/{review_id:int}', endpoint(delete_review), methods=['DELETE']),
+        Route('/api/ingredients', endpoint(get_ingredients, catalog_state, lambda: ['ingredients'])),
+        # Everything else, including CORS preflights and the methods the
+        # routes above do not take, is served by the sync app
+        Mount('/', WSGIMiddleware(flask_app)),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan, exception_handlers={Exception: handle_generic_error})
+
+
+async def read_json(request):
+    # request.get_json(): a body that does not parse is a 400
+    try:
+        return await request.json()
+    except ValueError:
+        raise BadRequest('Failed to decode JSON object')
+
+
+def with_next_cursor(request, response, cursor):
+    # set_next_cursor() for Starlette responses
+    if cursor is None:
+        return response
+    args = dict(request.query_params)
+    args['cursor'] = cursor
+    response.headers['X-Next-Cursor'] = cursor
+    response.headers['Link'] = f'<{request.url.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return parse_etags(if_none_match).contains(etag)
+    if_modified_since = parse_date(request.headers.get('If-Modified-Since'))
+    if if_modified_since and last_modified is not None:
+        return last_modified <= if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def cors_headers(request):
+    # flask-cors' headers for an actual (non-preflight) request from an
+    # allowed origin
+    origin = request.headers.get('Origin')
+    if origin not in API_CORS['origins']:
+        return {}
+    return {
+        'Access-Control-Allow-Origin': origin,
+        'Access-Control-Allow-Credentials': 'true',
+        'Access-Control-Expose-Headers': ', '.join(API_CORS['expose_headers']),
+        'Vary': 'Origin',
+    }
@@ -0,0 +1,124 @@
+# autocomplete.py
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from models import db, Ingredient
+
+# Sorts after any character a normalized prefix can end with
+_PREFIX_END = '\U0010ffff'
+
+# Prefixes matching more index entries than this many per requested result
+# are answered by walking the usage ranking instead of ranking every match
+DENSE_MATCHES = 50
+
+
+def normalize(text):
+    # Case- and accent-insensitive form used for matching: "Crème  de Cassis"
+    # -> "creme de cassis"
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+class IngredientAutocomplete:
+    # Prefix index over ingredient names for type-ahead lookups.
+    #
+    #   entries: sorted (normalized text, ingredient id), one entry for the
+    #            start of every word of a name, so "lime" finds both "Lime"
+    #            and "Fresh Lime Juice"
+    #   ranking: ingredient ids, most used first; rebuilt on demand once the
+    #            pantry's usage counts or the set of names have changed
+    #
+    # A prefix is a bisect range of `entries`, whose ids are ranked by how
+    # many cocktails use them (the pantry's posting arrays). Short prefixes
+    # match a large share of the names, so for those the ranking is walked
+    # until enough names match instead. New ingredients are merged into a
+    # copy of the entries that is then swapped in, so lookups take no lock.
+    # Those other workers created reach the pantry when it syncs with
+    # CatalogState.version, and sync() copies them over from there.
+
+    def __init__(self, pantry):
+        self._pantry = pantry
+        self._lock = threading.Lock()
+        self._entries = []
+        # id -> (name, " " + normalized name)
+        self._names = {}
+        self._ranking = (None, None, [])
+
+    def load(self):
+        names = {i: (name, ' ' + normalize(name)) for i, name in db.session.query(Ingredient.id, Ingredient.name)}
+        entries = sorted(entry for i, (_, key) in names.items() for entry in self._index(i, key))
+        with self._lock:
+            self._entries = entries
+            self._names = names
+
+    def add_ingredients(self, created):
+        # `created` is {id: name}, as returned by resolve_ingredients()
+        if not created:
+            return
+        names = {i: (name, ' ' + normalize(name)) for i, name in created.items()}
+        with self._lock:
+            # Names before entries: lookups read entries first
+            self._names.update(names)
+            added = [entry for i, (_, key) in names.items() for entry in self._index(i, key)]
+            if len(added) * 64 > len(self._entries):
+                entries = sorted(self._entries + added)
+            else:
+                # Usually a handful: a copy plus one insertion each
+                entries = list(self._entries)
+                for entry in added:
+                    insort(entries, entry)
+            self._entries = entries
+
+    def sync(self):
+        # Names are only ever added, so a count behind the pantry's means
+        # some are missing
+        self._pantry.sync()
+        if self._pantry.ingredient_count() > len(self._names):
+            names = self._names
+            self.add_ingredients({i: name for i, name in self._pantry.ingredient_names().items() if i not in names})
+
+    @staticmethod
+    def _index(ingredient_id, key):
+        # `key` is " " + normalized name; one entry per word start
+        return [(key[n + 1:], ingredient_id) for n, c in enumerate(key) if c == ' ']
+
+    def _ranked(self):
+        # Names are only ever added, so their count tells whether any were
+        names, usage = self._names, self._pantry.usage_count
+        generation, count, ranking = self._ranking
+        if (generation, count) != (self._pantry.generation, len(names)):
+            generation, count = self._pantry.generation, len(names)
+            ranking = sorted(names, key=lambda i: (-usage(i), names[i][1], i))
+            self._ranking = (generation, count, ranking)
+        return ranking
+
+    def complete(self, prefix, limit=10):
+        # Returns [(ingredient id, name, usage count)], most used first, then
+        # by name
+        entries, names, usage = self._entries, self._names, self._pantry.usage_count
+        key = normalize(prefix)
+        # "lime " is a whole word: "Lime" and "Lime Juice", not "Limeade".
+        # Entries equal to the word sort right before those continuing it
+        # with a space, so the range starts at the bare word.
+        whole_word = key and prefix[-1:].isspace()
+        if whole_word:
+            key += ' '
+        start = bisect_left(entries, (key[:-1] if whole_word else key,))
+        end = bisect_left(entries, (key + _PREFIX_END,), start)
+        if end - start > limit * DENSE_MATCHES:
+            word = ' ' + key
+            ranked = []
+            for i in self._ranked():
+                if word in names[i][1] + ' ':
+                    ranked.append(i)
+                    if len(ranked) == limit:
+                        break
+        else:
+            matches = {
+                ingredient_id for text, ingredient_id in entries[start:end]
+                if not whole_word or text == key[:-1] or text.startswith(key)
+            }
+            ranked = heapq.nsmallest(limit, matches, key=lambda i: (-usage(i), names[i][1], i))
+        return [(i, names[i][0], usage(i)) for i in ranked]
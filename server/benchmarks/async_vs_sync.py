@@ -0,0 +1,273 @@
+# benchmarks/async_vs_sync.py
+#
+# Requests/sec, latency and server memory per concurrent connection for the
+# sync app under gunicorn against the async app (asgi.py) under uvicorn, at
+# several connection counts. Each client connection is kept alive and sends
+# a mix of catalog reads and review writes back to back; memory is the RSS
+# of the server's whole process tree, sampled while the load runs. Run from
+# the server directory:
+#
+#   python -m benchmarks.async_vs_sync --cocktails 20000 --reviews 200000 --connections 16,64,256
+#
+# The response cache is off on both sides so every request reaches the
+# database.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import quote_plus
+from benchmarks.endpoints import SERVER_DIR, SEARCH_WORDS, free_port, wait_for_port
+
+# (weight, name); the shares are those of a read-heavy catalog
+MIX = [
+    (30, 'list cocktails'),
+    (30, 'cocktail detail'),
+    (10, 'cocktail reviews'),
+    (10, 'search'),
+    (5, 'ingredients'),
+    (15, 'create review'),
+]
+
+
+def server_command(server, port, workers, threads):
+    bind = f'127.0.0.1:{port}'
+    if server == 'sync':
+        return ['gunicorn', '--workers', str(workers), '--threads', str(threads), '--bind', bind,
+                '--log-level', 'warning', '--chdir', SERVER_DIR, 'app:create_app()']
+    return ['uvicorn', '--factory', 'asgi:create_asgi_app', '--workers', str(workers),
+            '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log',
+            '--app-dir', SERVER_DIR]
+
+
+def tree_rss(pid):
+    # RSS of a process and all of its descendants, in bytes
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+class RSSSampler:
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def read_response(reader):
+    # Minimal HTTP/1.1 response reader: Content-Length or chunked bodies
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, bytes(body), headers.get('connection') == 'close'
+
+
+def build_request(rng, args, token):
+    names = [name for _, name in MIX]
+    name = rng.choices(names, weights=[weight for weight, _ in MIX])[0]
+    cocktail = rng.randint(1, args.cocktails)
+    body = None
+    if name == 'list cocktails':
+        path = f'/api/cocktails?limit=20&sort={rng.choice(["id", "top_rated"])}'
+    elif name == 'cocktail detail':
+        path = f'/api/cocktails/{cocktail}'
+    elif name == 'cocktail reviews':
+        path = f'/api/cocktails/{cocktail}/reviews?limit=20'
+    elif name == 'search':
+        path = f'/api/cocktails/search?q={quote_plus(rng.choice(SEARCH_WORDS))}&limit=20'
+    elif name == 'ingredients':
+        path = '/api/ingredients'
+    else:
+        path = f'/api/cocktails/{cocktail}/reviews'
+        body = json.dumps({'content': 'Benchmark review', 'rating': rng.randint(1, 5)}).encode()
+    method = 'POST' if body is not None else 'GET'
+    lines = [f'{method} {path} HTTP/1.1', 'Host: 127.0.0.1', f'Authorization: Bearer {token}']
+    if body is not None:
+        lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+    return name, ('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b'')
+
+
+async def client(port, rng, args, token, deadline, results):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        name, request = build_request(rng, args, token)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            status, _, close = await asyncio.wait_for(read_response(reader), args.timeout)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            results['errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        results['latencies'].append(time.perf_counter() - started)
+        if status >= 400:
+            results['errors'] += 1
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(port, connections, duration, args, token):
+    results = {'latencies': [], 'errors': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        client(port, random.Random(args.seed + i), args, token, deadline, results) for i in range(connections)
+    ))
+    return results
+
+
+def measure(server, args, token):
+    port = free_port()
+    log = open(os.path.join(args.workdir, f'{server}.log'), 'w')
+    process = subprocess.Popen(
+        server_command(server, port, args.workers, args.threads),
+        env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT
+    )
+    try:
+        wait_for_port(port)
+        # Let every worker finish create_app() before the baseline is taken
+        time.sleep(2)
+        asyncio.run(run_load(port, min(args.connections), 2, args, token))
+        idle = tree_rss(process.pid)
+        rows = []
+        for connections in args.connections:
+            with RSSSampler(process.pid) as sampler:
+                started = time.perf_counter()
+                results = asyncio.run(run_load(port, connections, args.duration, args, token))
+                elapsed = time.perf_counter() - started
+            latencies = sorted(results['latencies'])
+            row = {
+                'server': server,
+                'connections': connections,
+                'requests': len(latencies),
+                'errors': results['errors'],
+                'rps': round(len(latencies) / elapsed, 1),
+                'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+                'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+                'idle_rss_mb': round(idle / 2 ** 20, 1),
+                'peak_rss_mb': round(sampler.peak / 2 ** 20, 1),
+                'kb_per_connection': round(max(sampler.peak - idle, 0) / connections / 1024, 1),
+            }
+            rows.append(row)
+            print(f"{server:<6} {connections:>6} {row['rps']:>9} {row['p50_ms']:>9} {row['p99_ms']:>9} "
+                  f"{row['errors']:>7} {row['idle_rss_mb']:>9} {row['peak_rss_mb']:>9} {row['kb_per_connection']:>9}")
+        return rows
+    finally:
+        process.terminate()
+        process.wait()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync (gunicorn) and async (uvicorn) apps")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--cocktails', type=int, default=5000)
+    parser.add_argument('--reviews', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--connections', default='16,64,256',
+                        help="comma-separated concurrent connection counts")
+    parser.add_argument('--duration', type=float, default=15, help="seconds of load per connection count")
+    parser.add_argument('--workers', type=int, default=2, help="worker processes for both servers")
+    parser.add_argument('--threads', type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument('--timeout', type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument('--servers', default='sync,async')
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+    args.connections = [int(n) for n in args.connections.split(',')]
+
+    args.workdir = tempfile.mkdtemp(prefix='cocktail-async-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(args.workdir, 'bench.db')}"
+    # Routes are driven far past the production rate limits; set
+    # RATELIMIT_ENABLED=true to measure the limiter's own cost
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    os.environ.setdefault('RATELIMIT_STORAGE_URL', f"sqlite:///{os.path.join(args.workdir, 'ratelimit.db')}")
+    os.environ['CACHE_ENABLED'] = 'false'
+    os.environ.setdefault('JWT_ACCESS_TOKEN_MINUTES', '1440')
+    # The seeding process only logs in once; the servers keep the default
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    logging.disable(logging.INFO)
+    from app import create_app
+    import seed
+
+    app = create_app()
+    with app.app_context():
+        seed.generate_data(app, args.users, args.cocktails, args.reviews, seed=args.seed)
+        seed.refresh_derived_data(app)
+    token = app.test_client().post(
+        '/api/login', json={'username': 'user1', 'password': seed.SEED_PASSWORD}
+    ).get_json()['token']
+    print(f"Seeded {args.users} users, {args.cocktails} cocktails, {args.reviews} reviews; "
+          f"{args.workers} workers, {args.duration:.0f}s per run, logs in {args.workdir}")
+
+    print(f"{'server':<6} {'conns':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} "
+          f"{'idle MB':>9} {'peak MB':>9} {'KB/conn':>9}")
+    rows = []
+    for server in args.servers.split(','):
+        rows += measure(server, args, token)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': {k: v for k, v in vars(args).items() if k != 'workdir'}, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
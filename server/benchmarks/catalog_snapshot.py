@@ -0,0 +1,145 @@
+# benchmarks/catalog_snapshot.py
+#
+# Memory of the in-process catalog snapshot (catalog.py) per 10k cocktails,
+# its full build and incremental refresh times, and latency of the routes it
+# serves with the snapshot against the ORM path, through the Flask test
+# client with the response cache off. Run from the server directory:
+#
+#   python -m benchmarks.catalog_snapshot --cocktails 20000 --reviews 200000
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+ROUTES = [
+    ('list cocktails', lambda rng, n: '/api/cocktails?limit=50'),
+    ('list top rated', lambda rng, n: '/api/cocktails?sort=top_rated&limit=50'),
+    ('list, fields=id,name', lambda rng, n: '/api/cocktails?limit=50&fields=id,name'),
+    ('cocktail detail', lambda rng, n: f'/api/cocktails/{rng.randint(1, n)}'),
+    ('ingredients', lambda rng, n: '/api/ingredients'),
+]
+
+
+def timed(client, path, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path() if callable(path) else path)
+        response.get_data()
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog snapshot memory and latency against the ORM path")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--cocktails', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=200, help="requests per route and mode")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cocktail-catalog-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    os.environ.setdefault('RATELIMIT_STORAGE_URL', f"sqlite:///{os.path.join(workdir, 'ratelimit.db')}")
+    os.environ['CACHE_ENABLED'] = 'false'
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    logging.disable(logging.INFO)
+    from app import create_app
+    from catalog import CatalogCache
+    import seed
+
+    app = create_app()
+    with app.app_context():
+        seed.generate_data(app, args.users, args.cocktails, args.reviews, seed=args.seed)
+        seed.refresh_derived_data(app)
+    catalog = app.extensions['catalog']
+    catalog.enabled = True
+
+    probe = CatalogCache()
+    probe.enabled = True
+    with app.app_context():
+        started = time.perf_counter()
+        probe.load()
+        build_s = time.perf_counter() - started
+
+    # Memory: what a freshly built snapshot keeps alive once the rows it was
+    # built from are gone
+    probe = CatalogCache()
+    probe.enabled = True
+    gc.collect()
+    tracemalloc.start()
+    with app.app_context():
+        probe.load()
+    gc.collect()
+    snapshot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    with app.app_context():
+        records = probe.current().records
+    json_bytes = sum(len(r.json) for r in records.values())
+    per_10k = snapshot_bytes / len(records) * 10000 if records else 0
+    del probe, records
+
+    client = app.test_client()
+    client.post('/api/register', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'bench'})
+    token = client.post('/api/login', json={'username': 'bench', 'password': 'bench'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Incremental refresh after one review write. Refreshes re-read every
+    # cocktail written within the slack, so wait until the seeded rows are
+    # past it, as they would be on a running server
+    time.sleep(catalog.slack.total_seconds() + 1)
+    with app.app_context():
+        catalog.current()
+    refreshes = []
+    for n in range(20):
+        client.post(f'/api/cocktails/{n + 1}/reviews', json={'content': 'Benchmark', 'rating': 4}, headers=headers)
+        with app.app_context():
+            started = time.perf_counter()
+            catalog.current()
+            refreshes.append(time.perf_counter() - started)
+
+    with app.app_context():
+        cocktails = len(catalog.current().records)
+    print(f"{cocktails} cocktails: snapshot {snapshot_bytes / 2 ** 20:.1f} MB "
+          f"({per_10k / 2 ** 20:.1f} MB per 10k cocktails, {json_bytes / 2 ** 20:.1f} MB of it pre-serialized JSON); "
+          f"full build {build_s * 1000:.0f} ms, refresh after a write {statistics.median(refreshes) * 1000:.1f} ms")
+
+    rng = random.Random(args.seed)
+    print(f"{'route':<22} {'orm p50':>9} {'orm p95':>9} {'snap p50':>9} {'snap p95':>9} {'speedup':>8}")
+    rows = []
+    for name, path in ROUTES:
+        row = {'route': name}
+        for mode, enabled in (('orm', False), ('snapshot', True)):
+            catalog.enabled = enabled
+            timed(client, lambda: path(rng, args.cocktails), 10)
+            row[f'{mode}_p50_ms'], row[f'{mode}_p95_ms'] = timed(client, lambda: path(rng, args.cocktails), args.repeat)
+        rows.append(row)
+        print(f"{name:<22} {row['orm_p50_ms']:>9.2f} {row['orm_p95_ms']:>9.2f} {row['snapshot_p50_ms']:>9.2f} "
+              f"{row['snapshot_p95_ms']:>9.2f} {row['orm_p50_ms'] / row['snapshot_p50_ms']:>7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': vars(args),
+                'snapshot_bytes': snapshot_bytes,
+                'bytes_per_10k_cocktails': per_10k,
+                'json_bytes': json_bytes,
+                'build_ms': build_s * 1000,
+                'refresh_ms': statistics.median(refreshes) * 1000,
+                'routes': rows,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/cocktail_writes.py
+#
+# SQL statements and latency per POST/PUT /api/cocktails for a 12-ingredient
+# cocktail. Run from the server directory:
+#
+#   python -m benchmarks.cocktail_writes --repeat 50
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import event
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--ingredients', type=int, default=12)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cocktail-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Routes are driven far past the production rate limits; set
+    # RATELIMIT_ENABLED=true to measure the limiter's own cost
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    os.environ.setdefault('RATELIMIT_STORAGE_URL', f"sqlite:///{os.path.join(workdir, 'ratelimit.db')}")
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    client = app.test_client()
+    client.post('/api/register', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'bench'})
+    token = client.post('/api/login', json={'username': 'bench', 'password': 'bench'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    statements = [0]
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+    def measure(label, send):
+        counts, timings = [], []
+        for n in range(args.repeat):
+            statements[0] = 0
+            started = time.perf_counter()
+            response = send(n)
+            timings.append((time.perf_counter() - started) * 1000)
+            counts.append(statements[0])
+            assert response.status_code in (200, 201), response.get_json()
+        print(f"{label:<40} {statistics.median(counts):>6.0f} stmts {statistics.median(timings):>8.2f} ms")
+
+    def recipe(n, prefix):
+        return [{'name': f'{prefix} ingredient {n}-{i}', 'amount': '1 oz'} for i in range(args.ingredients)]
+
+    shared = recipe(0, 'shared')
+    payload = {'name': 'Bench', 'instructions': 'Stir', 'glass_type': 'Coupe'}
+
+    print(f"{args.ingredients} ingredients per cocktail, median of {args.repeat} requests")
+    measure('create, all ingredients new', lambda n: client.post(
+        '/api/cocktails', json={**payload, 'ingredients': recipe(n, 'new')}, headers=headers))
+    measure('create, all ingredients existing', lambda n: client.post(
+        '/api/cocktails', json={**payload, 'ingredients': shared}, headers=headers))
+    measure('update, one ingredient swapped', lambda n: client.put(
+        '/api/cocktails/1', json={'ingredients': shared[:-1] + [{'name': f'swap {n}', 'amount': '1 dash'}]},
+        headers=headers))
+    measure('update, unchanged ingredients', lambda n: client.put(
+        '/api/cocktails/1', json={'ingredients': shared}, headers=headers))
+
+
+if __name__ == '__main__':
+    main()
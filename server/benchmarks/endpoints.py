@@ -0,0 +1,430 @@
+# benchmarks/endpoints.py
+#
+# Latency, throughput and SQL statements per request for every route in
+# app.py, against a catalog generated by seed.generate_data(). Each route is
+# driven through the Flask test client and through a real WSGI server
+# (werkzeug's threaded server in-process, or gunicorn with --server gunicorn).
+# Run from the server directory:
+#
+#   python -m benchmarks.endpoints --cocktails 20000 --reviews 200000 --json before.json
+#   python -m benchmarks.endpoints --cocktails 20000 --reviews 200000 --compare before.json
+#
+# Same sizes and --seed give the same database, so two runs are comparable.
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, quote_plus
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_WORDS = ['sour', 'martini', 'smoky', 'gin', 'velvet fizz', 'margarita', 'spritz', 'julep']
+INGREDIENT_WORDS = ['gin', 'lime', 'rum', 'vermouth', 'bitters', 'syrup']
+
+
+class Context:
+    # Shared state for the request factories: ids to pick from, tokens, and
+    # what earlier write routes created (so delete routes have targets)
+
+    def __init__(self, args, rng, zipf_cum_weights):
+        self.rng = rng
+        self.users = args.users
+        self.cocktail_ids = list(range(1, args.cocktails + 1))
+        self.cocktail_weights = zipf_cum_weights(args.cocktails, 0.8)
+        self.token = None
+        self.refresh_token = None
+        self.page_cursor = ''
+        self.login = None
+        self.run = 0
+        self.registered = []
+        self.created_cocktails = []
+        self.created_reviews = []
+        self.ingredient_names = []
+
+    def cocktail(self):
+        return self.rng.choices(self.cocktail_ids, cum_weights=self.cocktail_weights)[0]
+
+    def auth(self, token=None):
+        return {'Authorization': f'Bearer {token or self.token}'}
+
+
+def recipe(ctx, n):
+    return {
+        'name': f'Bench {ctx.run}-{n}',
+        'instructions': 'Shake with ice and strain into a chilled coupe.',
+        'glass_type': 'Coupe',
+        'ingredients': [{'name': name, 'amount': '1 oz'} for name in ctx.rng.sample(ctx.ingredient_names, 4)]
+    }
+
+
+def remember_registered(ctx, request, status, body):
+    if status == 201:
+        ctx.registered.append(request[1]['username'])
+
+
+def remember(attribute, key='id'):
+    def after(ctx, request, status, body):
+        if status in (200, 201):
+            getattr(ctx, attribute).append(json.loads(body)[key])
+    return after
+
+
+# (name, method, request factory, after-response hook, share of --requests,
+# Context list the route consumes). A factory returns (path, json body or raw
+# bytes, headers). Routes run in this order: writes come after reads, and
+# update/delete routes run at most once per item an earlier route created.
+ROUTES = [
+    ('home', 'GET', lambda ctx, n: ('/', None, {}), None, 1, None),
+    ('health check', 'GET', lambda ctx, n: ('/api/health-check', None, {}), None, 1, None),
+    ('cache stats', 'GET', lambda ctx, n: ('/api/cache/stats', None, {}), None, 1, None),
+    ('list', 'GET', lambda ctx, n: ('/api/cocktails', None, {}), None, 1, None),
+    ('list, page 5', 'GET', lambda ctx, n: ('/api/cocktails?limit=50&cursor=' + ctx.page_cursor, None, {}), None, 1, None),
+    ('list, top rated', 'GET', lambda ctx, n: ('/api/cocktails?sort=top_rated', None, {}), None, 1, None),
+    ('list, id+name', 'GET', lambda ctx, n: ('/api/cocktails?fields=id,name&limit=200', None, {}), None, 1, None),
+    ('detail', 'GET', lambda ctx, n: (f'/api/cocktails/{ctx.cocktail()}', None, {}), None, 1, None),
+    ('cocktail reviews', 'GET', lambda ctx, n: (f'/api/cocktails/{ctx.cocktail()}/reviews', None, {}), None, 1, None),
+    ('search', 'GET', lambda ctx, n: (
+        f'/api/cocktails/search?q={quote_plus(ctx.rng.choice(SEARCH_WORDS))}', None, {}), None, 1, None),
+    ('search, ingredient', 'GET', lambda ctx, n: (
+        f'/api/cocktails/search?ingredient={ctx.rng.choice(INGREDIENT_WORDS)}', None, {}), None, 1, None),
+    ('makeable', 'GET', lambda ctx, n: (
+        '/api/cocktails/makeable?max_missing=1&ingredients=' + quote(','.join(ctx.rng.sample(ctx.ingredient_names, 8))),
+        None, {}), None, 1, None),
+    ('ingredients', 'GET', lambda ctx, n: ('/api/ingredients', None, {}), None, 1, None),
+    ('ingredient autocomplete', 'GET', lambda ctx, n: (
+        f'/api/ingredients/autocomplete?prefix={quote(ctx.rng.choice(ctx.ingredient_names)[:ctx.rng.randint(1, 4)])}',
+        None, {}), None, 1, None),
+    ('export', 'GET', lambda ctx, n: ('/api/cocktails/export', None, ctx.auth()), None, 0.02, None),
+    ('verify token', 'POST', lambda ctx, n: ('/api/verify-token', None, ctx.auth()), None, 1, None),
+    ('refresh token', 'POST', lambda ctx, n: ('/api/token/refresh', None, ctx.auth(ctx.refresh_token)), None, 1, None),
+    ('profile', 'GET', lambda ctx, n: ('/api/user/profile', None, ctx.auth()), None, 1, None),
+    ('profile reviews', 'GET', lambda ctx, n: ('/api/user/profile/reviews', None, ctx.auth()), None, 1, None),
+    ('register', 'POST', lambda ctx, n: ('/api/register', {
+        'username': f'bench{ctx.run}-{n}', 'email': f'bench{ctx.run}-{n}@example.com', 'password': 'password'
+    }, {}), remember_registered, 0.1, None),
+    ('login', 'POST', lambda ctx, n: ('/api/login', {
+        'username': f'user{ctx.rng.randint(1, ctx.users)}', 'password': 'password'
+    }, {}), None, 0.1, None),
+    ('logout', 'POST', lambda ctx, n: ('/api/logout', None, ctx.auth(ctx.login(f'user{n % ctx.users + 1}'))),
+     None, 0.1, None),
+    ('update profile', 'PUT', lambda ctx, n: ('/api/user/profile', {
+        'email': f'user1+{ctx.run}-{n}@example.com'
+    }, ctx.auth()), None, 1, None),
+    ('create cocktail', 'POST', lambda ctx, n: ('/api/cocktails', recipe(ctx, n), ctx.auth()),
+     remember('created_cocktails'), 0.5, None),
+    ('bulk import, 100 lines', 'POST', lambda ctx, n: ('/api/cocktails/bulk', '\n'.join(
+        json.dumps(recipe(ctx, f'{n}-{i}')) for i in range(100)
+    ).encode(), ctx.auth()), None, 0.05, None),
+    ('update cocktail', 'PUT', lambda ctx, n: (
+        f'/api/cocktails/{ctx.rng.choice(ctx.created_cocktails)}', recipe(ctx, n), ctx.auth()), None, 0.5,
+     'created_cocktails'),
+    ('create review', 'POST', lambda ctx, n: (f'/api/cocktails/{ctx.cocktail()}/reviews', {
+        'content': 'Benchmark review', 'rating': ctx.rng.randint(1, 5)
+    }, ctx.auth()), remember('created_reviews'), 1, None),
+    ('update review', 'PUT', lambda ctx, n: (f'/api/reviews/{ctx.rng.choice(ctx.created_reviews)}', {
+        'content': 'Edited benchmark review', 'rating': ctx.rng.randint(1, 5)
+    }, ctx.auth()), None, 1, 'created_reviews'),
+    ('delete review', 'DELETE', lambda ctx, n: (f'/api/reviews/{ctx.created_reviews.pop()}', None, ctx.auth()),
+     None, 1, 'created_reviews'),
+    ('delete cocktail', 'DELETE', lambda ctx, n: (
+        f'/api/cocktails/{ctx.created_cocktails.pop()}', None, ctx.auth()), None, 0.5, 'created_cocktails'),
+    ('delete profile', 'DELETE', lambda ctx, n: (
+        '/api/user/profile', None, ctx.auth(ctx.login(ctx.registered.pop()))), None, 0.1, 'registered'),
+]
+
+
+class TestClientDriver:
+    name = 'test_client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, body, headers):
+        if isinstance(body, bytes):
+            headers = {**headers, 'Content-Type': 'application/x-ndjson'}
+            response = self.client.open(path, method=method, data=body, headers=headers)
+        else:
+            response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class WSGIServerDriver:
+    # Real HTTP requests, one connection each, against werkzeug's threaded
+    # server in this process or a gunicorn subprocess on the same database
+    name = 'wsgi_server'
+
+    def __init__(self, app, server='werkzeug', workers=4, log_path=None):
+        self.server = self.process = None
+        if server == 'gunicorn':
+            self.port = free_port()
+            self.log = open(log_path or os.devnull, 'w')
+            self.process = subprocess.Popen(
+                ['gunicorn', '--workers', str(workers), '--threads', '4', '--bind', f'127.0.0.1:{self.port}',
+                 '--log-level', 'warning', '--chdir', SERVER_DIR, 'app:create_app()'],
+                env=os.environ.copy(), stdout=self.log, stderr=subprocess.STDOUT
+            )
+            wait_for_port(self.port)
+        else:
+            from werkzeug.serving import make_server
+            self.server = make_server('127.0.0.1', 0, app, threaded=True)
+            self.port = self.server.server_port
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.name = f'wsgi_{server}'
+
+    def send(self, method, path, body, headers):
+        if isinstance(body, bytes):
+            headers = {**headers, 'Content-Type': 'application/x-ndjson'}
+        elif body is not None:
+            body = json.dumps(body).encode()
+            headers = {**headers, 'Content-Type': 'application/json'}
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.log.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def percentile(samples, p):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def run_route(driver, ctx, route, count, concurrency, statements):
+    name, method, factory, after = route[:4]
+    # Requests are built up front on one thread: the factories share an rng
+    requests = [factory(ctx, n) for n in range(count)]
+    timings, statuses = [], {}
+
+    def send(request):
+        path, body, headers = request
+        started = time.perf_counter()
+        status, data = driver.send(method, path, body, headers)
+        return (time.perf_counter() - started) * 1000, status, data
+
+    before = statements.count if statements else 0
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(send, requests))
+    else:
+        results = [send(request) for request in requests]
+    elapsed = time.perf_counter() - started
+
+    for request, (duration, status, data) in zip(requests, results):
+        timings.append(duration)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if after:
+            after(ctx, request, status, data)
+    return {
+        'requests': count,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'throughput_rps': round(count / elapsed, 1),
+        'statements_per_request': round((statements.count - before) / count, 2) if statements else None,
+        'statuses': statuses,
+    }
+
+
+def run_all(driver, ctx, args, statements):
+    ctx.run += 1
+    results = {}
+    for route in ROUTES:
+        count = max(args.min_requests, int(args.requests * route[4]))
+        if route[5]:
+            count = min(count, len(getattr(ctx, route[5])))
+        if count == 0:
+            continue
+        concurrency = 1 if isinstance(driver, TestClientDriver) else args.concurrency
+        results[route[0]] = result = run_route(driver, ctx, route, count, concurrency, statements)
+        print(
+            f"{route[0]:<24} {result['requests']:>6} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['throughput_rps']:>9.1f} "
+            f"{'' if result['statements_per_request'] is None else result['statements_per_request']:>7} "
+            f"{','.join(f'{k}x{v}' for k, v in sorted(result['statuses'].items()))}"
+        )
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\nChange in p50 / p95 against {baseline_path} (negative is faster)")
+    for mode, routes in results.items():
+        if mode not in baseline:
+            print(f"{mode:<14} not in baseline (has {', '.join(baseline)})")
+            continue
+        for name, result in routes.items():
+            old = baseline[mode].get(name)
+            if not old:
+                continue
+            deltas = [
+                f"{(result[key] - old[key]) / old[key] * 100:+7.1f}%" if old[key] else '    n/a'
+                for key in ('p50_ms', 'p95_ms')
+            ]
+            print(f"{mode:<14} {name:<24} {deltas[0]} {deltas[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API route")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--cocktails', type=int, default=5000)
+    parser.add_argument('--reviews', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help="requests per route (heavy routes run fewer)")
+    parser.add_argument('--min-requests', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8, help="parallel clients against the WSGI server")
+    parser.add_argument('--mode', choices=['test_client', 'wsgi_server', 'both'], default='both')
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug',
+                        help="WSGI server; gunicorn runs in worker processes, so SQL counts are not available")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="print p50/p95 changes against an earlier --json file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cocktail-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Routes are driven far past the production rate limits; set
+    # RATELIMIT_ENABLED=true to measure the limiter's own cost
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    os.environ.setdefault('RATELIMIT_STORAGE_URL', f"sqlite:///{os.path.join(workdir, 'ratelimit.db')}")
+    # Tokens are issued once up front and must outlive a long run
+    os.environ.setdefault('JWT_ACCESS_TOKEN_MINUTES', '1440')
+    logging.disable(logging.INFO)
+    from sqlalchemy import event
+    from app import create_app
+    from models import db, Ingredient
+    import seed
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    ctx = Context(args, rng, seed.zipf_cum_weights)
+    with app.app_context():
+        started = time.perf_counter()
+        seed.generate_data(app, args.users, args.cocktails, args.reviews, seed=args.seed)
+        seed.refresh_derived_data(app)
+        app.extensions['pantry'].load()
+        print(f"Seeded {args.users} users, {args.cocktails} cocktails, {args.reviews} reviews "
+              f"in {time.perf_counter() - started:.1f}s")
+        ctx.ingredient_names = [name for (name,) in db.session.query(Ingredient.name)]
+        statements = StatementCounter()
+        event.listen(db.engine, 'before_cursor_execute', statements)
+
+    client = app.test_client()
+    ctx.login = lambda username: client.post(
+        '/api/login', json={'username': username, 'password': 'password'}
+    ).get_json()['token']
+    ctx.token = ctx.login('user1')
+    ctx.refresh_token = client.post(
+        '/api/login', json={'username': 'user1', 'password': 'password'}
+    ).get_json()['refresh_token']
+    ctx.page_cursor = client.get('/api/cocktails?limit=200').headers.get('X-Next-Cursor', '')
+
+    # Servers start only when their turn comes, so starting gunicorn's
+    # workers does not skew the test client numbers
+    drivers = []
+    if args.mode in ('test_client', 'both'):
+        drivers.append(lambda: TestClientDriver(app))
+    if args.mode in ('wsgi_server', 'both'):
+        log_path = os.path.join(workdir, 'gunicorn.log')
+        drivers.append(lambda: WSGIServerDriver(app, args.server, args.workers, log_path))
+        if args.server == 'gunicorn':
+            print(f"gunicorn output goes to {log_path}")
+
+    results = {}
+    for start in drivers:
+        driver = start()
+        concurrent = not isinstance(driver, TestClientDriver)
+        print(f"\n{driver.name}" + (f", {args.concurrency} concurrent clients" if concurrent else ''))
+        print(f"{'route':<24} {'reqs':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'stmts':>7} statuses")
+        # Statements issued by gunicorn's worker processes are not visible here
+        counted = None if getattr(driver, 'process', None) else statements
+        try:
+            results[driver.name] = run_all(driver, ctx, args, counted)
+        finally:
+            if concurrent:
+                driver.close()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {
+                    'revision': git_revision(),
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': platform.python_version(),
+                    'sqlite': sqlite3.sqlite_version,
+                    'users': args.users,
+                    'cocktails': args.cocktails,
+                    'reviews': args.reviews,
+                    'seed': args.seed,
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'server': args.server,
+                },
+                'results': results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
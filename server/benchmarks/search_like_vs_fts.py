@@ -0,0 +1,95 @@
+# benchmarks/search_like_vs_fts.py
+#
+# Compares GET /api/cocktails/search served by the LIKE fallback against the
+# FTS5 index on a synthetic catalog. Run from the server directory:
+#
+#   python -m benchmarks.search_like_vs_fts --cocktails 100000
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+WORDS = [
+    'classic', 'smoky', 'tropical', 'frozen', 'spiced', 'royal', 'midnight', 'golden',
+    'velvet', 'dark', 'sour', 'fizz', 'punch', 'mule', 'sling', 'julep', 'smash', 'flip',
+    'cobbler', 'collins', 'martini', 'negroni', 'daiquiri', 'margarita', 'spritz', 'toddy',
+]
+# Instructions use bartending verbs rather than the name vocabulary, so a
+# name query does not trivially match every row
+METHOD = [
+    'shake', 'stir', 'strain', 'muddle', 'build', 'top', 'garnish', 'with', 'ice', 'over',
+    'into', 'chilled', 'glass', 'double', 'fine', 'gently', 'hard', 'and', 'the', 'a',
+]
+SPIRITS = ['gin', 'vodka', 'white rum', 'dark rum', 'tequila', 'mezcal', 'bourbon', 'rye', 'cognac', 'pisco']
+GLASSES = ['Rocks', 'Highball', 'Coupe', 'Martini', 'Collins', 'Hurricane', 'Copper Mug']
+QUERIES = [('mar', ''), ('smoky sour', ''), ('absinthe', ''), ('', 'rum'), ('fizz', 'gin'), ('velvet', 'mezcal')]
+
+
+def build_catalog(app, cocktails, rng):
+    from models import db, Cocktail, Ingredient, CocktailIngredient
+    import search
+
+    ingredient_names = SPIRITS + [f'{rng.choice(WORDS)} syrup {n}' for n in range(500)]
+    with app.app_context():
+        db.session.execute(Ingredient.__table__.insert(), [{'name': n} for n in dict.fromkeys(ingredient_names)])
+        ingredient_ids = [row.id for row in db.session.query(Ingredient.id)]
+        chunk = 5000
+        for start in range(1, cocktails + 1, chunk):
+            ids = range(start, min(start + chunk, cocktails + 1))
+            db.session.execute(Cocktail.__table__.insert(), [{
+                'id': i,
+                'name': ' '.join(rng.sample(WORDS, 2)).title(),
+                'instructions': ' '.join(rng.choices(METHOD, k=30)),
+                'glass_type': rng.choice(GLASSES),
+                'image_url': '',
+            } for i in ids])
+            db.session.execute(CocktailIngredient.__table__.insert(), [{
+                'cocktail_id': i, 'ingredient_id': ingredient_id, 'amount': '1 oz'
+            } for i in ids for ingredient_id in rng.sample(ingredient_ids, rng.randint(3, 6))])
+        search.rebuild()
+        db.session.commit()
+
+
+def time_search(client, q, ingredient, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get('/api/cocktails/search', query_string={'q': q, 'ingredient': ingredient})
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_json()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cocktails', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cocktail-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Routes are driven far past the production rate limits; set
+    # RATELIMIT_ENABLED=true to measure the limiter's own cost
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    os.environ.setdefault('RATELIMIT_STORAGE_URL', f"sqlite:///{os.path.join(workdir, 'ratelimit.db')}")
+    from app import create_app
+
+    app = create_app()
+    build_catalog(app, args.cocktails, random.Random(args.seed))
+    client = app.test_client()
+
+    print(f"{args.cocktails} cocktails, median of {args.repeat} requests")
+    print(f"{'q':<12} {'ingredient':<12} {'LIKE ms':>10} {'FTS5 ms':>10} {'speedup':>8}")
+    for q, ingredient in QUERIES:
+        app.extensions['cocktail_search'] = False
+        like_ms = time_search(client, q, ingredient, args.repeat)
+        app.extensions['cocktail_search'] = True
+        fts_ms = time_search(client, q, ingredient, args.repeat)
+        print(f"{q:<12} {ingredient:<12} {like_ms:>10.2f} {fts_ms:>10.2f} {like_ms / fts_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# bulk.py
+import io
+import json
+from sqlalchemy import insert, select
+from models import db, Cocktail, CocktailIngredient, Ingredient, resolve_ingredients
+from serializers import COCKTAIL_FIELDS
+import search
+
+REQUIRED_FIELDS = ('name', 'instructions', 'glass_type', 'ingredients')
+RECORD_FIELDS = ('name', 'image_url', 'instructions', 'glass_type')
+
+
+def ingredient_amounts(items):
+    # {name: amount} in request order; a repeated ingredient keeps its
+    # first amount. Types are checked here rather than by the database, where
+    # a bad value would fail the whole statement (or bulk chunk)
+    if not isinstance(items, list):
+        raise ValueError('ingredients must be a list')
+    amounts = {}
+    for ingredient_data in items:
+        if not isinstance(ingredient_data, dict) or not ingredient_data.get('name'):
+            raise ValueError('Ingredient name is required')
+        if not isinstance(ingredient_data['name'], str):
+            raise ValueError('Ingredient name must be a string')
+        amount = ingredient_data.get('amount', '')
+        if not isinstance(amount, (str, type(None))):
+            raise ValueError('Ingredient amount must be a string')
+        amounts.setdefault(ingredient_data['name'], amount)
+    return amounts
+
+
+def iter_lines(stream, buffer_size=1 << 16):
+    # werkzeug's input stream is unbuffered, so iterating it directly reads
+    # one byte per call while looking for newlines. Servers that declare
+    # wsgi.input_terminated (gunicorn) hand over their own body object
+    # instead, which buffers by itself and is not an io stream.
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream, buffer_size)
+    return enumerate(stream, 1)
+
+
+def parse_record(line):
+    # One NDJSON line -> (cocktail column values, {ingredient: amount});
+    # raises ValueError with a client-facing message
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise ValueError('Invalid JSON')
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ValueError(f'{field} is required')
+    # Caught here rather than by the database, which would fail the whole
+    # chunk; ingredient_amounts() checks the ingredients the same way
+    if not isinstance(data['name'], str) or not data['name']:
+        raise ValueError('name must be a non-empty string')
+    for field in ('image_url', 'instructions', 'glass_type'):
+        if not isinstance(data.get(field, ''), (str, type(None))):
+            raise ValueError(f'{field} must be a string')
+    return {
+        'name': data['name'],
+        'image_url': data.get('image_url', ''),
+        'instructions': data['instructions'],
+        'glass_type': data['glass_type'],
+    }, ingredient_amounts(data['ingredients'])
+
+
+def insert_chunk(records):
+    # Inserts [(cocktail values, amounts)] with a constant number of
+    # statements per chunk and returns [(cocktail id, [ingredient ids])] plus
+    # the {id: name} of ingredients created along the way
+    #
+    # RETURNING order is not guaranteed to follow the VALUES order, and
+    # asking SQLAlchemy to sort it falls back to one INSERT per row on
+    # SQLite. Rows are matched back to their records by value instead; rows
+    # with identical values are interchangeable, so any pairing is correct.
+    returned = db.session.execute(
+        insert(Cocktail.__table__).returning(Cocktail.id, *(Cocktail.__table__.c[f] for f in RECORD_FIELDS)),
+        [values for values, _ in records]
+    ).all()
+    ids_by_values = {}
+    for row in returned:
+        ids_by_values.setdefault(tuple(row[1:]), []).append(row[0])
+    ids = [ids_by_values[tuple(values[f] for f in RECORD_FIELDS)].pop() for values, _ in records]
+
+    ingredient_ids, created = resolve_ingredients(
+        name for _, amounts in records for name in amounts
+    )
+    links = [{
+        'cocktail_id': cocktail_id,
+        'ingredient_id': ingredient_ids[name],
+        'amount': amount
+    } for cocktail_id, (_, amounts) in zip(ids, records) for name, amount in amounts.items()]
+    if links:
+        db.session.execute(insert(CocktailIngredient.__table__), links)
+
+    search.index_cocktails(ids)
+    return [
+        (cocktail_id, [ingredient_ids[name] for name in amounts])
+        for cocktail_id, (_, amounts) in zip(ids, records)
+    ], created
+
+
+def export_lines(batch_size=1000):
+    # Streams the catalog as NDJSON. The cocktail query is fetched
+    # batch_size rows at a time (yield_per) and each batch pulls its own
+    # ingredient rows, so memory stays flat however large the catalog is.
+    # Plain rows rather than ORM objects: hydration dominated the export time.
+    columns = [Cocktail.__table__.c[f] for f in COCKTAIL_FIELDS if f != 'ingredients']
+    cocktails = db.session.execute(
+        select(*columns).order_by(Cocktail.id).execution_options(yield_per=batch_size)
+    )
+    for batch in cocktails.partitions():
+        ingredients = {}
+        rows = db.session.execute(
+            select(CocktailIngredient.cocktail_id, Ingredient.name, CocktailIngredient.amount)
+            .join(Ingredient, Ingredient.id == CocktailIngredient.ingredient_id)
+            .where(CocktailIngredient.cocktail_id.in_([row.id for row in batch]))
+            .order_by(CocktailIngredient.id)
+        )
+        for cocktail_id, name, amount in rows:
+            ingredients.setdefault(cocktail_id, []).append({'name': name, 'amount': amount})
+        for row in batch:
+            values = row._asdict()
+            values['ingredients'] = ingredients.get(row.id, [])
+            data = {field: values[field] for field in COCKTAIL_FIELDS}
+            yield json.dumps(data, separators=(',', ':')) + '\n'
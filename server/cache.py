@@ -0,0 +1,247 @@
+# cache.py
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request
+
+
+class CacheBackend(ABC):
+    # Minimal key/value interface, deliberately shaped like the Redis
+    # commands it maps to (GET, SET EX, DEL, INCR) so a Redis client can
+    # stand in for the in-process store
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def incr(self, key):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    # In-process LRU with per-entry TTL
+
+    def __init__(self, max_entries=2048, default_ttl=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._counters.pop(key, None)
+
+    def incr(self, key):
+        # Counters live outside the LRU so they are never evicted ahead of
+        # the entries they version
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+    def stats(self):
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class RedisCache(CacheBackend):
+    # Adapter for a redis-py compatible client; values are stored as JSON
+
+    def __init__(self, client, prefix='cocktails:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+
+def create_backend(config):
+    url = config['CACHE_URL']
+    if url.startswith('redis://'):
+        import redis
+        return RedisCache(redis.Redis.from_url(url))
+    return MemoryCache(max_entries=config['CACHE_MAX_ENTRIES'], default_ttl=config['CACHE_DEFAULT_TTL'])
+
+
+class ResponseCache:
+    # Caches successful GET responses keyed on path + query string.
+    #
+    # Each cached route declares the namespaces its output depends on, e.g.
+    # 'cocktails' or 'cocktail:12'. The key embeds the current version of
+    # each namespace, so invalidate('cocktail:12') just bumps a counter and
+    # every dependent entry becomes unreachable; stale entries then age out
+    # of the LRU. This works unchanged on backends without key scanning.
+    #
+    # Namespace counters only see invalidations made through this backend;
+    # with the in-process store another worker's writes never reach them. So
+    # under @conditional the resource's database version (the same one its
+    # ETag is built from) is part of the key as well, and a cached body can
+    # never be served for a newer version than the one it was rendered at.
+
+    def __init__(self, backend=None, enabled=True, ttl=None, max_body_bytes=None):
+        self.backend = backend
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_body_bytes = max_body_bytes
+        self.hits = 0
+        self.misses = 0
+        # Called with True on a hit and False on a miss (e.g. to feed metrics
+        # shared across worker processes)
+        self.observers = []
+
+    def init_app(self, app):
+        self.enabled = app.config['CACHE_ENABLED']
+        self.ttl = app.config['CACHE_DEFAULT_TTL']
+        self.max_body_bytes = app.config['CACHE_MAX_BODY_BYTES']
+        if self.backend is None:
+            self.backend = create_backend(app.config)
+        app.extensions['response_cache'] = self
+
+    def cached(self, namespaces):
+        # `namespaces` is a list, or a callable receiving the view's kwargs
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                names = namespaces(**kwargs) if callable(namespaces) else namespaces
+                key = self.make_key(
+                    request.path, request.args.items(multi=True), names, g.get('resource_version')
+                )
+                entry = self.lookup(key)
+                if entry is not None:
+                    body, status, headers = entry
+                    return current_app.response_class(body, status=status, headers=headers)
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    headers = [[k, v] for k, v in response.headers.items() if k != 'Content-Length']
+                    if response.is_streamed:
+                        response.response = self._store_streamed(key, headers, response.response)
+                    else:
+                        self.store(key, response.get_data(as_text=True), headers)
+                return response
+            return wrapper
+        return decorator
+
+    def lookup(self, key):
+        # (body, status, headers) or None, counted as a hit or a miss
+        entry = self.backend.get(key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._notify(entry is not None)
+        return entry
+
+    def store(self, key, body, headers):
+        if self.cacheable_size(len(body)):
+            self.backend.set(key, (body, 200, headers), self.ttl)
+
+    def cacheable_size(self, size):
+        return self.max_body_bytes is None or size <= self.max_body_bytes
+
+    def _notify(self, hit):
+        for observer in self.observers:
+            observer(hit)
+
+    def _store_streamed(self, key, headers, chunks):
+        # Passes a streamed body through untouched and caches it once it has
+        # been sent in full; a body abandoned halfway is not cached, and one
+        # outgrowing max_body_bytes stops being buffered
+        body, size = [], 0
+        try:
+            for chunk in chunks:
+                if body is not None:
+                    data = chunk if isinstance(chunk, bytes) else chunk.encode()
+                    size += len(data)
+                    body.append(data)
+                    if not self.cacheable_size(size):
+                        body = None
+                yield chunk
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        if body is not None:
+            self.store(key, b''.join(body).decode(), headers)
+
+    def invalidate(self, *namespaces):
+        if not self.enabled:
+            return
+        for namespace in namespaces:
+            self.backend.incr(f'ns:{namespace}')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            **self.backend.stats(),
+        }
+
+    def make_key(self, path, args, namespaces, resource_version=None):
+        # `resource_version` is the validator @conditional computed, if any
+        versions = ','.join(f'{ns}={self.backend.get(f"ns:{ns}") or 0}' for ns in namespaces)
+        args = '&'.join(f'{k}={v}' for k, v in sorted(args))
+        key = f'{path}?{args}|{versions}'
+        return key if resource_version is None else f'{key}|v={resource_version}'
@@ -0,0 +1,231 @@
+# catalog.py
+import bisect
+import logging
+import threading
+from array import array
+from datetime import timedelta
+from sqlalchemy import func, select
+from models import db, CatalogState, Cocktail, CocktailIngredient, Ingredient
+from pagination import cursor_number
+from serializers import COCKTAIL_FIELDS
+from streaming import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Cocktails are loaded in chunks of this many ids
+LOAD_CHUNK = 500
+
+# Cocktail columns a record is built from
+LOADED_COLUMNS = [getattr(Cocktail, f) for f in COCKTAIL_FIELDS if f != 'ingredients'] + [
+    Cocktail.version, Cocktail.updated_at
+]
+
+
+class CocktailRecord:
+    # One cocktail: the keys the list orders need and its serialized form
+    # (every COCKTAIL_FIELDS key). Nothing else is kept; field subsets are
+    # decoded from the JSON.
+    __slots__ = ('id', 'rating_avg', 'version', 'updated_at', 'json')
+
+    def __init__(self, row, ingredients):
+        # `row` has the LOADED_COLUMNS, `ingredients` the serialized list
+        self.id = row.id
+        self.rating_avg = row.rating_avg
+        self.version = row.version
+        self.updated_at = row.updated_at
+        data = {field: getattr(row, field) for field in COCKTAIL_FIELDS if field != 'ingredients'}
+        data['ingredients'] = ingredients
+        # orjson over-allocates its output; a copy is sized exactly
+        self.json = bytes(memoryview(dumps(data)))
+
+    def as_dict(self, fields=COCKTAIL_FIELDS):
+        data = loads(self.json)
+        return {field: data[field] for field in fields}
+
+
+class CatalogSnapshot:
+    # Immutable view of the catalog at one CatalogState.version. Refreshes
+    # build a new snapshot (sharing the unchanged records) and swap it in.
+    #
+    #   records:     cocktail id -> CocktailRecord
+    #   ids:         sorted ids, for sort=id pages
+    #   top_rated:   sorted (-rating_avg, -id), for sort=top_rated pages
+    #   ingredients: sorted (name, id), served as one pre-built JSON body
+
+    __slots__ = ('version', 'records', 'ids', 'top_rated', 'ingredients', 'ingredients_json', 'updated_at')
+
+    def __init__(self, version, records, ids, top_rated, ingredients, updated_at, ingredients_json=None):
+        self.version = version
+        self.records = records
+        self.ids = ids
+        self.top_rated = top_rated
+        self.ingredients = ingredients
+        if ingredients_json is None:
+            ingredients_json = dumps([{'id': i, 'name': name} for name, i in ingredients])
+        self.ingredients_json = ingredients_json
+        self.updated_at = updated_at
+
+    def page(self, sort, cursor, limit):
+        # (records, has_more) for GET /api/cocktails, as queries.list_args()
+        # parsed it
+        return self.page_top_rated(cursor, limit) if sort == 'top_rated' else self.page_by_id(cursor, limit)
+
+    def page_by_id(self, cursor, limit):
+        start = bisect.bisect_right(self.ids, cursor_number(cursor[0])) if cursor else 0
+        ids = self.ids[start:start + limit + 1]
+        return [self.records[i] for i in ids[:limit]], len(ids) > limit
+
+    def page_top_rated(self, cursor, limit):
+        # Same order and keyset as ix_cocktail_rating_avg_id walked backwards
+        start = bisect.bisect_right(self.top_rated, (-cursor_number(cursor[0]), -cursor_number(cursor[1]))) if cursor else 0
+        keys = self.top_rated[start:start + limit + 1]
+        return [self.records[-i] for _, i in keys[:limit]], len(keys) > limit
+
+    def cocktails_json(self, records, fields=COCKTAIL_FIELDS):
+        if tuple(fields) == COCKTAIL_FIELDS:
+            return b'[' + b','.join(r.json for r in records) + b']'
+        return dumps([r.as_dict(fields) for r in records])
+
+    def cocktail_json(self, record, reviews, reviews_next_cursor):
+        # Keys are sorted and "reviews" / "reviews_next_cursor" sort last, so
+        # the detail body is the stored object with the two keys appended
+        return (record.json[:-1] + b',"reviews":' + dumps(reviews)
+                + b',"reviews_next_cursor":' + dumps(reviews_next_cursor) + b'}')
+
+
+def _top_rated_key(record):
+    return (-record.rating_avg, -record.id)
+
+
+class CatalogCache:
+    # Serves the catalog read endpoints from a CatalogSnapshot.
+    #
+    # Every catalog write bumps CatalogState.version in its own transaction,
+    # so a request reads the version first and, if the snapshot is older,
+    # refreshes it before answering; responses (and their ETags) never run
+    # behind the database. Refreshes are incremental: cocktails whose
+    # updated_at moved (found through ix_cocktail_updated_at) and whose
+    # version differs are reloaded, deletions are detected by row count and
+    # ingredients, which are only ever added, by id. One thread refreshes
+    # while the others wait for its result.
+
+    def __init__(self):
+        self.enabled = False
+        self.slack = timedelta(0)
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config['CATALOG_SNAPSHOT_ENABLED']
+        self.slack = timedelta(seconds=app.config['CATALOG_SNAPSHOT_SLACK_SECONDS'])
+        app.extensions['catalog'] = self
+
+    def load(self):
+        # Full build; called once the tables exist
+        if self.enabled:
+            with self._lock:
+                self._snapshot = self._build(CatalogState.current())
+                logger.info(f"Catalog snapshot loaded: {len(self._snapshot.records)} cocktails")
+
+    def fresh(self, version):
+        # The snapshot if it is at least at `version`, without any query;
+        # None when it has to be refreshed through current()
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.version >= version else None
+
+    def current(self):
+        state = CatalogState.current()
+        snapshot = self.fresh(state.version)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            # A newer snapshot than this request's view is still consistent
+            if snapshot is None:
+                snapshot = self._snapshot = self._build(state)
+            elif snapshot.version < state.version:
+                snapshot = self._snapshot = self._refresh(state, snapshot)
+            return snapshot
+
+    def _load(self, cocktail_ids):
+        # {id: CocktailRecord} for those of `cocktail_ids` that exist. Plain
+        # rows rather than ORM objects; the ingredient query is the one the
+        # ORM's selectinload issues, so ingredients come in the same order.
+        records = {}
+        for start in range(0, len(cocktail_ids), LOAD_CHUNK):
+            chunk = cocktail_ids[start:start + LOAD_CHUNK]
+            ingredients = {}
+            for cocktail_id, name, amount in db.session.execute(
+                select(CocktailIngredient.cocktail_id, Ingredient.name, CocktailIngredient.amount)
+                .outerjoin(Ingredient, CocktailIngredient.ingredient_id == Ingredient.id)
+                .where(CocktailIngredient.cocktail_id.in_(chunk))
+            ):
+                ingredients.setdefault(cocktail_id, []).append({'name': name, 'amount': amount})
+            for row in db.session.execute(select(*LOADED_COLUMNS).where(Cocktail.id.in_(chunk))):
+                records[row.id] = CocktailRecord(row, ingredients.get(row.id, []))
+        return records
+
+    def _build(self, state):
+        records = self._load(list(db.session.scalars(select(Cocktail.id))))
+        return CatalogSnapshot(
+            state.version if state else 0,
+            records,
+            array('l', sorted(records)),
+            sorted(_top_rated_key(r) for r in records.values()),
+            sorted(tuple(row) for row in db.session.execute(select(Ingredient.name, Ingredient.id))),
+            db.session.scalar(select(func.max(Cocktail.updated_at))),
+        )
+
+    def _refresh(self, state, previous):
+        # updated_at is stamped before a writer commits (it may first wait
+        # out another writer's lock), so cocktails are looked up from `slack`
+        # before the newest timestamp already seen. updated_at is compared as
+        # well as version because a reseeded catalog starts versions over.
+        query = select(Cocktail.id, Cocktail.version, Cocktail.updated_at)
+        if previous.updated_at is not None:
+            query = query.where(Cocktail.updated_at >= previous.updated_at - self.slack)
+        rows = db.session.execute(query).all()
+        records = previous.records
+        changed = [
+            i for i, version, updated_at in rows
+            if i not in records or (records[i].version, records[i].updated_at) != (version, updated_at)
+        ]
+        loaded = self._load(changed)
+        # Changed ids that did not load were deleted meanwhile; other
+        # deletions show up in the row count
+        removed = [i for i in changed if i in records and i not in loaded]
+        expected = len(records) + sum(1 for i in loaded if i not in records) - len(removed)
+        if db.session.scalar(select(func.count(Cocktail.id))) != expected:
+            live = set(db.session.scalars(select(Cocktail.id)))
+            removed += [i for i in records if i not in live and i not in loaded and i not in removed]
+
+        ids, top_rated = previous.ids, previous.top_rated
+        if loaded or removed:
+            records = dict(records)
+            ids, top_rated = array('l', ids), list(top_rated)
+            for i in removed:
+                del ids[bisect.bisect_left(ids, i)]
+                del top_rated[bisect.bisect_left(top_rated, _top_rated_key(records.pop(i)))]
+            for i, record in loaded.items():
+                old = records.get(i)
+                if old is None:
+                    ids.insert(bisect.bisect_left(ids, i), i)
+                    bisect.insort(top_rated, _top_rated_key(record))
+                elif old.rating_avg != record.rating_avg:
+                    del top_rated[bisect.bisect_left(top_rated, _top_rated_key(old))]
+                    bisect.insort(top_rated, _top_rated_key(record))
+                records[i] = record
+
+        ingredients, ingredients_json = previous.ingredients, previous.ingredients_json
+        newest = max((i for _, i in ingredients), default=0)
+        added = db.session.execute(select(Ingredient.name, Ingredient.id).where(Ingredient.id > newest)).all()
+        if added:
+            ingredients = sorted(ingredients + [tuple(row) for row in added])
+            ingredients_json = None
+
+        seen = [updated_at for _, _, updated_at in rows if updated_at is not None]
+        if previous.updated_at is not None:
+            seen.append(previous.updated_at)
+        return CatalogSnapshot(
+            state.version, records, ids, top_rated, ingredients, max(seen, default=None), ingredients_json
+        )
@@ -0,0 +1,53 @@
+# conditional.py
+import hashlib
+from functools import wraps
+from flask import current_app, g, request
+
+
+def conditional(validator):
+    # Adds strong ETag / Last-Modified headers to GET responses and answers
+    # If-None-Match / If-Modified-Since with 304 before the view runs.
+    #
+    # `validator(**view_kwargs)` must be cheap (no relationship loading) and
+    # returns (version, last_modified) for the resource, or None to let the
+    # view handle it (e.g. to produce a 404). The version is left in
+    # g.resource_version for ResponseCache.cached to key on.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = validator(**kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+
+            version, last_modified = state
+            g.resource_version = version
+            etag = make_etag(request.path, request.args.items(multi=True), version)
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def make_etag(path, args, version):
+    # The query string is part of the representation (pages, fields)
+    query = '&'.join(f'{k}={v}' for k, v in sorted(args))
+    return hashlib.sha1(f'{path}?{query}|{version}'.encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since.replace(tzinfo=None)
+    return False
@@ -2,6 +2,18 @@
 import os
 from datetime import timedelta
 
+def pool_options(url, size, overflow):
+    # QueuePool sizing; in-memory SQLite runs on a StaticPool, which takes none
+    if url.startswith('sqlite') and (url in ('sqlite://', 'sqlite:///:memory:') or ':memory:' in url):
+        return {}
+    return {
+        'pool_size': size,
+        'max_overflow': overflow,
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    }
+
+
 class Config:
     # Basic Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-change-in-production'
@@ -11,14 +23,59 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///cocktails.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = DEBUG
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    SQLALCHEMY_ENGINE_OPTIONS = pool_options(SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+    # Optional read-only bind for GET/HEAD requests, e.g. the same SQLite
+    # file opened read-only (sqlite:///file:cocktails.db?mode=ro&uri=true)
+    # or a replica
+    DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+    SQLALCHEMY_BINDS = {
+        'read': {'url': DATABASE_READ_URL, **pool_options(DATABASE_READ_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW)}
+    } if DATABASE_READ_URL else {}
+    # Applied to every new SQLite connection, busy_timeout first so the
+    # others wait out a writer instead of failing with "database is locked".
+    # WAL lets readers run alongside the single writer.
+    SQLITE_PRAGMAS = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    }
+    # Engine for the async handlers in asgi.py; by default the database URL
+    # with its driver swapped for an asyncio one (aiosqlite, asyncpg)
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    SEARCH_FTS_ENABLED = os.environ.get('SEARCH_FTS_ENABLED', 'True').lower() in ('true', '1', 't')
     
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-change-in-production'
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
-    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Access tokens are short-lived; clients renew them at
+    # /api/token/refresh with the refresh token issued at login
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS', 30)))
+    # Seconds before a logout handled by one worker is seen by the others
+    REVOCATION_SYNC_INTERVAL = int(os.environ.get('REVOCATION_SYNC_INTERVAL', 5))
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
+    # Embed the username in access tokens for clients to read
+    JWT_USERNAME_CLAIM = os.environ.get('JWT_USERNAME_CLAIM', 'True').lower() in ('true', '1', 't')
+    # In-process user id -> identity cache behind token-authenticated
+    # requests; the TTL bounds how long other workers miss a deleted account
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    
+    # Password hashing: werkzeug method string with its cost parameters
+    # (e.g. "scrypt:32768:8:1", "pbkdf2:sha256:600000"); users are rehashed
+    # on their next login when it changes. Hashes run in a process pool of
+    # PASSWORD_HASH_WORKERS (0 = inline); past QUEUE_LIMIT waiting requests
+    # the auth endpoints answer 429 with Retry-After
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 4))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 1))
     
     # CORS Configuration
     CORS_ORIGINS = [
@@ -29,7 +86,66 @@ class Config:
     # API Configuration
     API_TITLE = 'Cocktail API'
     API_VERSION = 'v1'
+    API_DEFAULT_PAGE_SIZE = int(os.environ.get('API_DEFAULT_PAGE_SIZE', 50))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+    # Suggestions per /api/ingredients/autocomplete response
+    AUTOCOMPLETE_DEFAULT_LIMIT = int(os.environ.get('AUTOCOMPLETE_DEFAULT_LIMIT', 10))
+    AUTOCOMPLETE_MAX_LIMIT = int(os.environ.get('AUTOCOMPLETE_MAX_LIMIT', 50))
+    # Reviews embedded in cocktail detail / profile responses; the rest are
+    # paged through the dedicated review endpoints
+    EMBEDDED_REVIEWS_LIMIT = int(os.environ.get('EMBEDDED_REVIEWS_LIMIT', 10))
+    # NDJSON bulk import/export: rows per transaction / per fetched batch,
+    # and how many per-line errors an import response lists
+    BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 1000))
+    BULK_MAX_ERRORS = int(os.environ.get('BULK_MAX_ERRORS', 1000))
+    
+    # Per-request SQL statement count / DB time (Server-Timing header and
+    # request log) and the slow-query log; nothing is hooked up when off
+    SQL_STATS_ENABLED = os.environ.get('SQL_STATS_ENABLED', 'False').lower() in ('true', '1', 't')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'True').lower() in ('true', '1', 't')
+    
+    # Prometheus metrics at /metrics; set PROMETHEUS_MULTIPROC_DIR when
+    # running several gunicorn workers
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    
+    # Response cache for read endpoints ("memory://" or a redis:// URL)
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    CACHE_URL = os.environ.get('CACHE_URL', 'memory://')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 2048))
+    # Larger bodies are sent but not cached (nor buffered, when streamed)
+    CACHE_MAX_BODY_BYTES = int(os.environ.get('CACHE_MAX_BODY_BYTES', 512 * 1024))
+    
+    # In-process catalog snapshot behind the cocktail list/detail and
+    # ingredient endpoints (catalog.py); off serves them from the ORM. The
+    # slack must exceed the longest a write can wait between stamping
+    # updated_at and committing (SQLite: busy_timeout)
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'True').lower() in ('true', '1', 't')
+    CATALOG_SNAPSHOT_SLACK_SECONDS = int(os.environ.get('CATALOG_SNAPSHOT_SLACK_SECONDS', 10))
+    
+    # Reverse proxies in front of the app that append to X-Forwarded-For
+    # (and set -Proto, -Host, -Prefix). 0 trusts none of these headers;
+    # anything else must match the actual number of proxies, or clients can
+    # spoof their address.
+    PROXY_FIX = {
+        'x_for': int(os.environ.get('PROXY_FIX_X_FOR', 0)),
+        'x_proto': int(os.environ.get('PROXY_FIX_X_PROTO', 0)),
+        'x_host': int(os.environ.get('PROXY_FIX_X_HOST', 0)),
+        'x_prefix': int(os.environ.get('PROXY_FIX_X_PREFIX', 0)),
+    }
     
-    # Rate Limiting
-    RATELIMIT_DEFAULT = "200 per day;50 per hour"
-    RATELIMIT_STORAGE_URL = "memory://"
\ No newline at end of file
+    # Rate Limiting. Limits are "N per [M] second|minute|hour|day" joined
+    # with ';'. RATELIMIT_DEFAULT applies to each route separately, per user
+    # (valid access token) or client IP; RATELIMIT_AUTH replaces it on the
+    # password-hashing routes and RATELIMIT_READ on the catalog/profile reads
+    # and token verification, which a browsing client calls on every page.
+    # memory:// counts per process; sqlite:/// (relative to the instance
+    # folder) and redis:// are shared by all gunicorn workers.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True').lower() in ('true', '1', 't')
+    RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', "200 per day;50 per hour")
+    RATELIMIT_AUTH = os.environ.get('RATELIMIT_AUTH', "10 per minute;50 per hour")
+    RATELIMIT_READ = os.environ.get('RATELIMIT_READ', "300 per minute;5000 per hour")
+    # Ingredient autocomplete is called per keystroke
+    RATELIMIT_AUTOCOMPLETE = os.environ.get('RATELIMIT_AUTOCOMPLETE', "120 per minute;2000 per hour")
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', "sqlite:///ratelimit.db")
\ No newline at end of file
@@ -0,0 +1,57 @@
+# database.py
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_BIND = 'read'
+READ_METHODS = ('GET', 'HEAD')
+
+
+class RoutingSession(Session):
+    # Sends GET/HEAD requests to the optional read-only bind (a second pool
+    # on the same SQLite file, or a replica); everything else, and anything
+    # being flushed, goes to the primary. Without a 'read' bind configured
+    # this is the stock Flask-SQLAlchemy session.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read_request():
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_read_request():
+    return has_request_context() and request.method in READ_METHODS
+
+
+def init_app(app, db):
+    # Applies SQLITE_PRAGMAS to every new DB-API connection of the app's
+    # SQLite engines. journal_mode is a property of the database file, so
+    # the read bind leaves it alone and is made query-only instead.
+    pragmas = app.config['SQLITE_PRAGMAS']
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            settings = dict(pragmas)
+            if bind_key == READ_BIND:
+                settings.pop('journal_mode', None)
+                settings['query_only'] = 'ON'
+            apply_pragmas(engine, settings)
+
+
+def apply_pragmas(engine, settings):
+    # `engine` may also be the sync_engine of an AsyncEngine (asgi.py)
+    event.listen(engine, 'connect', _pragma_listener(settings))
+
+
+def _pragma_listener(settings):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+    return set_pragmas
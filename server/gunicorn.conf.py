@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+#
+# Picked up automatically when gunicorn is started from this directory:
+#
+#   PROMETHEUS_MULTIPROC_DIR=/tmp/cocktail-metrics gunicorn -w 4 'app:create_app()'
+import os
+import shutil
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to this one's
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    # Drops the dead worker's in-flight / pool gauges from the aggregate;
+    # its counters and histograms are kept
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
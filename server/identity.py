@@ -0,0 +1,58 @@
+# identity.py
+from collections import namedtuple
+from sqlalchemy import select
+from cache import MemoryCache
+from models import db, User
+
+# What token-authenticated views need to know about the caller; the full
+# User row is only loaded by the profile endpoints
+UserIdentity = namedtuple('UserIdentity', ['id', 'username'])
+
+# Cached for ids with no user (deleted accounts), so a token outliving its
+# account does not cost a query per request either
+MISSING = ()
+
+
+def identity_query(user_id):
+    return select(User.id, User.username).where(User.id == user_id)
+
+
+class IdentityCache:
+    # user id -> UserIdentity, in a bounded in-process LRU with a TTL.
+    #
+    # Profile updates and deletions invalidate their entry straight away in
+    # the process that handled them; other gunicorn workers pick the change
+    # up when their entry expires, so USER_CACHE_TTL bounds how long a
+    # deleted account's tokens keep working there.
+
+    def __init__(self):
+        self.store = None
+
+    def init_app(self, app):
+        self.store = MemoryCache(
+            max_entries=app.config['USER_CACHE_MAX_ENTRIES'], default_ttl=app.config['USER_CACHE_TTL']
+        )
+        app.extensions['identity_cache'] = self
+
+    def get(self, user_id):
+        entry = self.store.get(user_id)
+        if entry is None:
+            return self.put(user_id, db.session.execute(identity_query(user_id)).first())
+        return entry or None
+
+    def cached(self, user_id):
+        # UserIdentity, MISSING for a known deleted account, or None when
+        # the caller has to run identity_query() and put() the row itself
+        return self.store.get(user_id)
+
+    def put(self, user_id, row):
+        entry = UserIdentity(*row) if row else MISSING
+        self.store.set(user_id, entry)
+        return entry or None
+
+    def remember(self, user):
+        # Primes the entry from a row the caller already loaded (login)
+        self.store.set(user.id, UserIdentity(user.id, user.username))
+
+    def invalidate(self, user_id):
+        self.store.delete(user_id)
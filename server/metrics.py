@@ -0,0 +1,120 @@
+# metrics.py
+#
+# Prometheus metrics served at /metrics. Under gunicorn, set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory before the workers start:
+# each worker then writes its samples to its own mmap'd file and a scrape,
+# whichever worker answers it, aggregates all of them (gunicorn.conf.py
+# cleans up after dead workers). Without it the values are per process.
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from models import db
+
+# Metrics live in the process-wide registry, so they are defined once here
+# rather than per create_app() call
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ['route', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency, including streamed bodies', ['route', 'method'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'HTTP requests being handled', multiprocess_mode='livesum'
+)
+ERRORS = Counter(
+    'http_errors_total', 'Responses produced by the error handlers', ['status', 'exception']
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled database connection',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use', 'Database connections checked out of the pool', multiprocess_mode='livesum'
+)
+CACHE_LOOKUPS = Counter(
+    'response_cache_lookups_total', 'Response cache lookups; hit ratio is hit / (hit + miss)', ['result']
+)
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = False
+
+    def init_app(self, app, response_cache=None):
+        self.enabled = app.config['METRICS_ENABLED']
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_pool(engine.pool)
+        if response_cache is not None:
+            response_cache.observers.append(
+                lambda hit: CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+            )
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    def instrument_pool(self, pool):
+        # Pools have no "checkout requested" event, so the public connect()
+        # is wrapped instead; engine.connect() goes through it. Also called
+        # for the async engine's pool (asgi.py).
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+        pool.connect = timed_connect
+        event.listen(pool, 'checkout', lambda *args: POOL_IN_USE.inc())
+        event.listen(pool, 'checkin', lambda *args: POOL_IN_USE.dec())
+
+    def count_error(self, status, error):
+        if self.enabled:
+            ERRORS.labels(str(status), type(error).__name__).inc()
+
+    def start_request(self):
+        # Returns the start time to hand to finish_request(); the Flask hooks
+        # below and the async handlers of asgi.py both report through these
+        IN_FLIGHT.inc()
+        return time.perf_counter()
+
+    def finish_request(self, started, route, method, status):
+        IN_FLIGHT.dec()
+        REQUESTS.labels(route, method, str(status)).inc()
+        REQUEST_LATENCY.labels(route, method).observe(time.perf_counter() - started)
+
+    def _start_request(self):
+        g.metrics_started = self.start_request()
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, error=None):
+        # teardown_request runs once a streamed body has been sent, so the
+        # latency covers the whole response
+        if 'metrics_started' not in g:
+            return
+        # The rule, not the path, keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.finish_request(g.metrics_started, route, request.method, g.get('metrics_status', 500))
+
+    def render(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
@@ -0,0 +1,202 @@
+# migrations.py
+#
+# Brings databases created by older versions of models.py up to date.
+# db.create_all() only creates missing tables, so columns and indexes added
+# to existing tables are applied here. Every step is idempotent and runs on
+# startup from create_app(); it can also be run by hand:
+#
+#   python migrations.py            # apply pending steps
+#   python migrations.py --check    # ...then verify the hot queries use their indexes
+#   python migrations.py --reconcile-ratings   # recompute review aggregates
+import logging
+import sys
+from sqlalchemy import case, func, inspect, or_, select, text, update
+from models import db, CatalogState, Cocktail, Review
+
+logger = logging.getLogger(__name__)
+
+# (description, SQL, index the plan must mention)
+HOT_QUERIES = [
+    ("cocktail ingredients by cocktail",
+     "SELECT * FROM cocktail_ingredient WHERE cocktail_id IN (1, 2, 3)",
+     'ix_cocktail_ingredient_cocktail_ingredient'),
+    ("cocktails using an ingredient",
+     "SELECT cocktail_id FROM cocktail_ingredient WHERE ingredient_id = 1",
+     'ix_cocktail_ingredient_ingredient_id'),
+    ("delete cocktail ingredients",
+     "DELETE FROM cocktail_ingredient WHERE cocktail_id = 1",
+     'ix_cocktail_ingredient_cocktail_ingredient'),
+    ("reviews of a cocktail, newest first",
+     "SELECT * FROM review WHERE cocktail_id = 1 ORDER BY created_at DESC",
+     'ix_review_cocktail_created'),
+    ("delete reviews of a cocktail",
+     "DELETE FROM review WHERE cocktail_id = 1",
+     'ix_review_cocktail_created'),
+    ("top rated cocktails",
+     "SELECT id FROM cocktail ORDER BY rating_avg DESC, id DESC LIMIT 50",
+     'ix_cocktail_rating_avg_id'),
+    ("recently written cocktails",
+     "SELECT id, version, updated_at FROM cocktail WHERE updated_at >= '2024-01-01'",
+     'ix_cocktail_updated_at'),
+    ("reviews by a user",
+     "SELECT * FROM review WHERE user_id = 1 ORDER BY created_at DESC",
+     'ix_review_user_created'),
+]
+
+
+def upgrade():
+    added = _add_missing_columns()
+    _dedupe_cocktail_ingredients()
+    _ensure_autoincrement()
+    _create_missing_indexes()
+    _ensure_catalog_state()
+    if 'cocktail.review_count' in added:
+        reconcile_rating_aggregates()
+
+
+def _add_missing_columns():
+    # New columns must be nullable or carry a server_default, as ALTER TABLE
+    # ADD COLUMN cannot backfill them otherwise
+    added = []
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            db.session.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+            logger.info(f"Added column {table.name}.{column.name}")
+    db.session.commit()
+    return added
+
+
+def _ensure_catalog_state():
+    if db.session.get(CatalogState, 1) is None:
+        db.session.add(CatalogState(id=1, version=0))
+        db.session.commit()
+
+
+def _dedupe_cocktail_ingredients():
+    # The unique (cocktail_id, ingredient_id) index cannot be built while
+    # duplicate pairs exist; keep the oldest row of each pair
+    if 'ix_cocktail_ingredient_cocktail_ingredient' in _index_names('cocktail_ingredient'):
+        return
+    result = db.session.execute(text(
+        "DELETE FROM cocktail_ingredient WHERE id NOT IN ("
+        "  SELECT MIN(id) FROM cocktail_ingredient GROUP BY cocktail_id, ingredient_id"
+        ")"
+    ))
+    db.session.commit()
+    if result.rowcount:
+        logger.info(f"Removed {result.rowcount} duplicate cocktail ingredient rows")
+
+
+def _ensure_autoincrement():
+    # SQLite only honours AUTOINCREMENT from CREATE TABLE, so tables created
+    # without it are rebuilt: renamed aside, recreated, copied and dropped
+    if db.engine.dialect.name != 'sqlite':
+        return
+    for table in db.metadata.sorted_tables:
+        if not table.dialect_options['sqlite'].get('autoincrement'):
+            continue
+        ddl = db.session.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table.name}
+        ).scalar()
+        if ddl is None or 'AUTOINCREMENT' in ddl.upper():
+            continue
+        old = f'{table.name}_old'
+        db.session.execute(text(f'ALTER TABLE {table.name} RENAME TO {old}'))
+        # The indexes moved with it and their names are needed again;
+        # automatic ones (UNIQUE constraints) have no SQL and go with the table
+        indexes = db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"
+        ), {'name': old}).scalars().all()
+        for name in indexes:
+            db.session.execute(text(f'DROP INDEX {name}'))
+        table.create(db.session.connection())
+        columns = ', '.join(column.name for column in table.columns)
+        db.session.execute(text(f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}'))
+        db.session.execute(text(f'DROP TABLE {old}'))
+        db.session.commit()
+        logger.info(f"Rebuilt {table.name} with AUTOINCREMENT ids")
+
+
+def _create_missing_indexes():
+    for table in db.metadata.sorted_tables:
+        existing = _index_names(table.name)
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                logger.info(f"Created index {index.name}")
+
+
+def _index_names(table_name):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table_name)}
+
+
+def reconcile_rating_aggregates():
+    # Recomputes review_count / rating_sum / rating_avg for every cocktail in
+    # one set-based UPDATE (each subquery is an index range scan on
+    # ix_review_cocktail_created) and only rewrites rows that drifted
+    count = select(func.count(Review.id)).where(Review.cocktail_id == Cocktail.id).scalar_subquery()
+    total = select(func.coalesce(func.sum(Review.rating), 0)).where(Review.cocktail_id == Cocktail.id).scalar_subquery()
+    result = db.session.execute(
+        update(Cocktail)
+        .where(or_(Cocktail.review_count != count, Cocktail.rating_sum != total))
+        .values(
+            review_count=count,
+            rating_sum=total,
+            rating_avg=case((count == 0, 0.0), else_=total * 1.0 / count),
+            version=Cocktail.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        CatalogState.bump()
+    db.session.commit()
+    logger.info(f"Reconciled rating aggregates for {result.rowcount} cocktails")
+    return result.rowcount
+
+
+def explain_hot_queries():
+    # Returns [(description, plan text, expected index)] for SQLite databases
+    plans = []
+    with db.engine.connect() as conn:
+        for description, sql, index_name in HOT_QUERIES:
+            rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+            plans.append((description, ' | '.join(row[-1] for row in rows), index_name))
+    return plans
+
+
+def check_hot_queries():
+    failures = [
+        (description, plan, index_name)
+        for description, plan, index_name in explain_hot_queries()
+        if index_name not in plan
+    ]
+    for description, plan, index_name in failures:
+        logger.error(f"{description}: expected {index_name}, got plan: {plan}")
+    return not failures
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    # create_app() runs upgrade() itself
+    app = create_app()
+    if '--reconcile-ratings' in sys.argv[1:]:
+        with app.app_context():
+            reconcile_rating_aggregates()
+    if '--check' in sys.argv[1:]:
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                sys.exit("--check only supports SQLite query plans")
+            for description, plan, _ in explain_hot_queries():
+                print(f"{description}: {plan}")
+            sys.exit(0 if check_hot_queries() else 1)
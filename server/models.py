@@ -1,15 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import case, insert, update
 from flask_cors import CORS
+from database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    # scrypt hashes are ~160 characters
+    password_hash = db.Column(db.String(255))
     reviews = db.relationship('Review', backref='user', lazy=True)
 
     def set_password(self, password):
@@ -19,11 +22,26 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
 class Cocktail(db.Model):
+    __table_args__ = (
+        db.Index('ix_cocktail_rating_avg_id', 'rating_avg', 'id'),
+        # Catalog snapshot refreshes look up recently written cocktails
+        db.Index('ix_cocktail_updated_at', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     image_url = db.Column(db.String(200))
     instructions = db.Column(db.Text)
     glass_type = db.Column(db.String(50))
+    # Bumped whenever the cocktail's API representation changes (including
+    # its reviews); drives ETags
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Review aggregates, maintained by the review write paths (see
+    # update_rating_aggregates) so listings never aggregate reviews
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_avg = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
     ingredients = db.relationship('CocktailIngredient', backref='cocktail', lazy=True)
     reviews = db.relationship('Review', backref='cocktail', lazy=True)
 
@@ -33,15 +51,124 @@ class Ingredient(db.Model):
     cocktails = db.relationship('CocktailIngredient', backref='ingredient', lazy=True)
 
 class CocktailIngredient(db.Model):
+    __table_args__ = (
+        # Leading cocktail_id column also serves per-cocktail loads and deletes
+        db.Index('ix_cocktail_ingredient_cocktail_ingredient', 'cocktail_id', 'ingredient_id', unique=True),
+        db.Index('ix_cocktail_ingredient_ingredient_id', 'ingredient_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     cocktail_id = db.Column(db.Integer, db.ForeignKey('cocktail.id'), nullable=False)
     ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredient.id'), nullable=False)
     amount = db.Column(db.String(50))
 
 class Review(db.Model):
+    __table_args__ = (
+        db.Index('ix_review_cocktail_created', 'cocktail_id', 'created_at'),
+        db.Index('ix_review_user_created', 'user_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    cocktail_id = db.Column(db.Integer, db.ForeignKey('cocktail.id'), nullable=False)
\ No newline at end of file
+    cocktail_id = db.Column(db.Integer, db.ForeignKey('cocktail.id'), nullable=False)
+
+class CatalogState(db.Model):
+    # Single row whose version is bumped by every catalog write, giving list
+    # endpoints a one-row validator instead of aggregating the whole table
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def current(cls):
+        return db.session.query(cls.version, cls.updated_at).filter_by(id=1).first()
+
+    @classmethod
+    def bump(cls):
+        db.session.execute(cls.bump_statement())
+
+    @classmethod
+    def bump_statement(cls):
+        # Also executed by the async handlers in asgi.py
+        return update(cls).where(cls.id == 1).values(
+            {cls.version: cls.version + 1, cls.updated_at: datetime.utcnow()}
+        ).execution_options(synchronize_session=False)
+
+
+class RevokedToken(db.Model):
+    # Revoked JWTs (logout), kept until the token would have expired anyway.
+    # Workers hold the live set in memory and poll for rows past the highest
+    # id they have seen, so ids must never be reused once expired rows are
+    # deleted (AUTOINCREMENT on SQLite; migrations.py rebuilds older tables).
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def touch_cocktails(cocktail_ids):
+    # Version bump for cocktails whose serialized form changed without the
+    # cocktail row itself being edited (e.g. a new review). Done in SQL so
+    # concurrent writers never hand out the same version twice.
+    if cocktail_ids:
+        db.session.execute(touch_cocktails_statement(cocktail_ids))
+
+
+def touch_cocktails_statement(cocktail_ids):
+    return update(Cocktail).where(Cocktail.id.in_(list(cocktail_ids))).values(
+        {Cocktail.version: Cocktail.version + 1, Cocktail.updated_at: datetime.utcnow()}
+    ).execution_options(synchronize_session=False)
+
+
+def update_rating_aggregates(cocktail_id, count_delta, sum_delta):
+    db.session.execute(rating_aggregates_statement(cocktail_id, count_delta, sum_delta))
+
+
+def rating_aggregates_statement(cocktail_id, count_delta, sum_delta):
+    # Applies a review insert/update/delete to the cocktail's aggregates in
+    # one UPDATE; SET expressions see the pre-update row, so concurrent
+    # writers cannot lose each other's deltas
+    new_count = Cocktail.review_count + count_delta
+    new_sum = Cocktail.rating_sum + sum_delta
+    return update(Cocktail).where(Cocktail.id == cocktail_id).values({
+        Cocktail.review_count: new_count,
+        Cocktail.rating_sum: new_sum,
+        Cocktail.rating_avg: case((new_count <= 0, 0.0), else_=new_sum * 1.0 / new_count),
+        Cocktail.version: Cocktail.version + 1,
+        Cocktail.updated_at: datetime.utcnow(),
+    }).execution_options(synchronize_session=False)
+
+
+def insert_ignoring_conflicts(model):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with('IGNORE')
+
+
+def resolve_ingredients(names):
+    # Maps every name to an Ingredient id with one IN lookup, creating the
+    # missing ones in a single INSERT that ignores unique-name conflicts, so
+    # a concurrent request creating the same ingredient cannot fail this one.
+    # Returns ({name: id}, {id: name} of ingredients that were missing).
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}, {}
+    ids = dict(db.session.query(Ingredient.name, Ingredient.id).filter(Ingredient.name.in_(names)))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        db.session.execute(insert_ignoring_conflicts(Ingredient), [{'name': name} for name in missing])
+        ids.update(db.session.query(Ingredient.name, Ingredient.id).filter(Ingredient.name.in_(missing)))
+    return ids, {ids[name]: name for name in missing}
@@ -0,0 +1,62 @@
+# pagination.py
+import base64
+import binascii
+import json
+from flask import current_app, request, url_for
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, arity):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != arity:
+        raise PaginationError('Invalid cursor')
+    return tuple(values)
+
+
+def cursor_number(value):
+    # Cursors come from the client; only numbers compare against the keys
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise PaginationError('Invalid cursor')
+    return value
+
+
+def get_page_args(arity=1):
+    # Returns (limit, cursor values or None) from the query string
+    return parse_page_args(request.args, current_app.config, arity)
+
+
+def parse_page_args(args, config, arity=1):
+    default = config['API_DEFAULT_PAGE_SIZE']
+    maximum = config['API_MAX_PAGE_SIZE']
+    try:
+        limit = int(args.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1 or limit > maximum:
+        raise PaginationError(f'limit must be between 1 and {maximum}')
+
+    cursor = args.get('cursor')
+    return limit, decode_cursor(cursor, arity) if cursor else None
+
+
+def set_next_cursor(response, cursor):
+    if cursor is None:
+        return response
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    next_url = url_for(request.endpoint, **(request.view_args or {}), **args)
+    response.headers['X-Next-Cursor'] = cursor
+    response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
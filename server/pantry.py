@@ -0,0 +1,199 @@
+# pantry.py
+import threading
+from array import array
+from bisect import insort
+from collections import Counter
+from datetime import timedelta
+from sqlalchemy import func
+from models import db, CatalogState, Cocktail, Ingredient, CocktailIngredient
+
+# Recipes of changed cocktails are loaded in chunks of this many ids
+LOAD_CHUNK = 500
+
+
+class PantryIndex:
+    # In-memory inverted index answering "what can I make with these
+    # ingredients?" without touching the database.
+    #
+    #   postings: ingredient id -> sorted array of cocktail ids using it
+    #   recipes:  cocktail id -> frozenset of ingredient ids it needs
+    #
+    # Writers rebuild the affected posting arrays and swap them in under a
+    # lock; readers only ever see complete arrays, so queries take no lock.
+    #
+    # Handlers apply this worker's own writes directly. Other workers' writes
+    # are picked up by sync() once CatalogState.version moves: like the
+    # catalog snapshot, it reloads the recipes of cocktails whose
+    # (version, updated_at) changed and finds deletions by row count.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.slack = timedelta(0)
+        self.version = 0
+        # cocktail id -> (version, updated_at) the recipe was loaded at
+        self._stamps = {}
+        self._updated_at = None
+        self._postings = {}
+        self._recipes = {}
+        self._names = {}
+        self._ingredient_names = {}
+        # Highest ingredient id read from the database; ids this worker
+        # created itself may be higher while others' lower ones are unseen
+        self._newest_ingredient = 0
+        # Bumped whenever postings change, for caches of usage counts
+        self.generation = 0
+
+    def init_app(self, app):
+        # Same updated_at slack as the catalog snapshot's refreshes
+        self.slack = timedelta(seconds=app.config['CATALOG_SNAPSHOT_SLACK_SECONDS'])
+        app.extensions['pantry'] = self
+
+    def load(self):
+        # The version is read first: a write landing during the load bumps it
+        # again and is picked up by the next sync()
+        state = CatalogState.current()
+        stamps = {i: (version, updated_at) for i, version, updated_at in db.session.query(
+            Cocktail.id, Cocktail.version, Cocktail.updated_at
+        )}
+        postings, recipes = {}, {}
+        rows = db.session.query(
+            CocktailIngredient.cocktail_id, CocktailIngredient.ingredient_id
+        ).order_by(CocktailIngredient.cocktail_id)
+        for cocktail_id, ingredient_id in rows:
+            postings.setdefault(ingredient_id, []).append(cocktail_id)
+            recipes.setdefault(cocktail_id, set()).add(ingredient_id)
+        ingredient_names = dict(db.session.query(Ingredient.id, Ingredient.name))
+
+        with self._lock:
+            self._postings = {i: array('l', sorted(set(ids))) for i, ids in postings.items()}
+            self._recipes = {c: frozenset(ids) for c, ids in recipes.items()}
+            self._ingredient_names = ingredient_names
+            self._newest_ingredient = max(ingredient_names, default=0)
+            self._names = {name.lower(): i for i, name in ingredient_names.items()}
+            self._stamps = stamps
+            self._updated_at = max((u for _, u in stamps.values() if u is not None), default=None)
+            self.version = state.version if state else 0
+            self.generation += 1
+
+    def sync(self):
+        # Brings the index up to CatalogState.version; one thread refreshes
+        # while the others wait for it
+        state = CatalogState.current()
+        if state is None or state.version <= self.version:
+            return
+        with self._refresh_lock:
+            if state.version > self.version:
+                self._refresh(state.version)
+
+    def _refresh(self, version):
+        query = db.session.query(Cocktail.id, Cocktail.version, Cocktail.updated_at)
+        if self._updated_at is not None:
+            query = query.filter(Cocktail.updated_at >= self._updated_at - self.slack)
+        rows = query.all()
+        stamps = self._stamps
+        changed = {i: (v, u) for i, v, u in rows if stamps.get(i) != (v, u)}
+        expected = len(stamps) + sum(1 for i in changed if i not in stamps)
+        removed = set()
+        if db.session.query(func.count(Cocktail.id)).scalar() != expected:
+            live = {i for i, in db.session.query(Cocktail.id)}
+            removed = {i for i in stamps if i not in live and i not in changed}
+
+        recipes = {i: set() for i in changed}
+        ids = list(changed)
+        for start in range(0, len(ids), LOAD_CHUNK):
+            for cocktail_id, ingredient_id in db.session.query(
+                CocktailIngredient.cocktail_id, CocktailIngredient.ingredient_id
+            ).filter(CocktailIngredient.cocktail_id.in_(ids[start:start + LOAD_CHUNK])):
+                recipes[cocktail_id].add(ingredient_id)
+        # Ingredients are only ever added
+        for ingredient_id, name in db.session.query(Ingredient.id, Ingredient.name).filter(
+            Ingredient.id > self._newest_ingredient
+        ):
+            self.add_ingredient(ingredient_id, name)
+            self._newest_ingredient = max(self._newest_ingredient, ingredient_id)
+
+        for cocktail_id, ingredient_ids in recipes.items():
+            self.set_cocktail(cocktail_id, ingredient_ids)
+        for cocktail_id in removed:
+            self.remove_cocktail(cocktail_id)
+        stamps = {i: stamp for i, stamp in stamps.items() if i not in removed} if removed else dict(stamps)
+        stamps.update(changed)
+        self._stamps = stamps
+        seen = [u for _, _, u in rows if u is not None]
+        if self._updated_at is not None:
+            seen.append(self._updated_at)
+        self._updated_at = max(seen, default=None)
+        self.version = version
+
+    def add_ingredient(self, ingredient_id, name):
+        self._ingredient_names[ingredient_id] = name
+        self._names[name.lower()] = ingredient_id
+
+    def ingredient_name(self, ingredient_id):
+        return self._ingredient_names.get(ingredient_id)
+
+    def ingredient_count(self):
+        return len(self._ingredient_names)
+
+    def ingredient_names(self):
+        # A copy; {id: name}
+        return dict(self._ingredient_names)
+
+    def usage_count(self, ingredient_id):
+        # Number of cocktails using the ingredient
+        return len(self._postings.get(ingredient_id, ()))
+
+    def set_cocktail(self, cocktail_id, ingredient_ids):
+        ingredient_ids = frozenset(ingredient_ids)
+        with self._lock:
+            previous = self._recipes.get(cocktail_id, frozenset())
+            for ingredient_id in previous - ingredient_ids:
+                self._postings[ingredient_id] = array(
+                    'l', (c for c in self._postings[ingredient_id] if c != cocktail_id)
+                )
+            for ingredient_id in ingredient_ids - previous:
+                ids = array('l', self._postings.get(ingredient_id, ()))
+                insort(ids, cocktail_id)
+                self._postings[ingredient_id] = ids
+            if ingredient_ids:
+                self._recipes[cocktail_id] = ingredient_ids
+            else:
+                self._recipes.pop(cocktail_id, None)
+            self.generation += 1
+
+    def remove_cocktail(self, cocktail_id):
+        self.set_cocktail(cocktail_id, ())
+
+    def resolve(self, values):
+        # Accepts ingredient ids or names (case-insensitive); unknown names
+        # are ignored since nothing in the catalog can use them
+        ids = set()
+        for value in values:
+            value = str(value).strip()
+            if value.isdigit():
+                ids.add(int(value))
+            elif value.lower() in self._names:
+                ids.add(self._names[value.lower()])
+        return ids
+
+    def makeable(self, have_ids, max_missing=0, limit=50):
+        # Returns [(cocktail_id, missing ingredient ids)] ordered by fewest
+        # missing ingredients, then most matched, then id. Only cocktails
+        # sharing at least one ingredient with the pantry are considered.
+        postings, recipes = self._postings, self._recipes
+        matched = Counter()
+        for ingredient_id in have_ids:
+            matched.update(postings.get(ingredient_id, ()))
+
+        candidates = []
+        for cocktail_id, count in matched.items():
+            missing = len(recipes.get(cocktail_id, ())) - count
+            if missing <= max_missing:
+                candidates.append((missing, -count, cocktail_id))
+        candidates.sort()
+
+        return [
+            (cocktail_id, sorted(recipes.get(cocktail_id, frozenset()) - have_ids))
+            for _, _, cocktail_id in candidates[:limit]
+        ]
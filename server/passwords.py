@@ -0,0 +1,120 @@
+# passwords.py
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    # Raised instead of queueing when every hashing slot is taken; the views
+    # answer 429 with Retry-After
+    pass
+
+
+class PasswordHasher:
+    # Runs werkzeug's hash/verify in a small process pool so a burst of
+    # logins cannot take every core away from the request threads.
+    #
+    # At most PASSWORD_HASH_WORKERS hashes run at once and at most
+    # PASSWORD_HASH_QUEUE_LIMIT more may wait; past that, callers get
+    # HasherBusy straight away rather than piling up behind the pool. The
+    # pool is started on first use, so under gunicorn each worker process
+    # gets its own after the fork. With 0 workers hashing runs inline.
+
+    def __init__(self):
+        self.method = None
+        self.workers = 0
+        self.timeout = None
+        self._slots = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._prefix = None
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        # Hashes are "method$salt$hash" and the method carries the cost
+        # parameters, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    @property
+    def prefix(self):
+        # werkzeug expands a bare method name ("scrypt") to its defaults;
+        # hashing once is the reliable way to learn the full prefix
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def _run(self, function, *args):
+        if self.workers == 0:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        pool = None
+        try:
+            pool = self._get_pool()
+            future = pool.submit(function, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            return self._recover(pool, function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A running hash cannot be cancelled, so its slot is only given back
+        # once it has finished, not when a caller stops waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy()
+        except BrokenProcessPool:
+            return self._recover(pool, function, *args)
+
+    def _recover(self, pool, function, *args):
+        # A pool process died (e.g. OOM-killed) and the executor is unusable
+        # for good: drop it so the next call starts a new one, and hash this
+        # one inline
+        with self._pool_lock:
+            if pool is not None and self._pool is pool:
+                self._pool = None
+                logger.warning("Password hashing pool broke; restarting it on next use")
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return function(*args)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that runs request threads can copy
+                # locks held by other threads. Like any spawn pool, it needs
+                # scripts that create the app to guard their entry point with
+                # `if __name__ == '__main__'` (or set PASSWORD_HASH_WORKERS=0)
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                logger.info(f"Started password hashing pool with {self.workers} processes")
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,203 @@
+# queries.py
+#
+# Statements and response bodies shared by the sync views (app.py) and the
+# async handlers (asgi.py). Everything here builds statements or shapes
+# rows; executing them is left to the caller's session, sync or async, so
+# both entry points run the same SQL and answer with the same JSON.
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import joinedload
+from models import (
+    CatalogState, Cocktail, CocktailIngredient, Ingredient, Review, User, rating_aggregates_statement,
+    touch_cocktails_statement
+)
+from pagination import PaginationError, cursor_number, encode_cursor, parse_page_args
+from serializers import LIST_FIELDS, cocktail_query_options, parse_fields, serialize_ingredients
+
+SORTS = ('id', 'top_rated')
+MIN_RATING, MAX_RATING = 1, 5
+
+
+def page_statement(statement, limit):
+    # One extra row tells whether another page exists
+    return statement.limit(limit + 1)
+
+
+def split_page(rows, limit):
+    return rows[:limit], len(rows) > limit
+
+
+# Cheap validators for conditional GETs: one indexed row, no relationships
+def catalog_state_statement():
+    return select(CatalogState.version, CatalogState.updated_at).where(CatalogState.id == 1)
+
+
+def cocktail_state_statement(cocktail_id):
+    return select(Cocktail.version, Cocktail.updated_at).where(Cocktail.id == cocktail_id)
+
+
+def list_args(args, config):
+    # (fields, sort, limit, cursor) for GET /api/cocktails; ValueError (a
+    # 400) for anything malformed
+    fields = parse_fields(args.get('fields'), LIST_FIELDS)
+    sort = args.get('sort', 'id')
+    if sort not in SORTS:
+        raise ValueError('sort must be id or top_rated')
+    limit, cursor = parse_page_args(args, config, arity=2 if sort == 'top_rated' else 1)
+    # Checked here so the snapshot and the ORM query reject the same cursors
+    if cursor:
+        cursor = tuple(cursor_number(value) for value in cursor)
+    return fields, sort, limit, cursor
+
+
+def cocktail_list_statement(fields, sort, cursor):
+    if sort == 'top_rated':
+        # Walks ix_cocktail_rating_avg_id backwards; keyset (rating_avg, id).
+        # The keyset column is loaded even when it is not a requested field
+        statement = select(Cocktail).options(*cocktail_query_options(fields + ('rating_avg',)))
+        if cursor:
+            statement = statement.where(tuple_(Cocktail.rating_avg, Cocktail.id) < tuple_(*cursor))
+        return statement.order_by(Cocktail.rating_avg.desc(), Cocktail.id.desc())
+    statement = select(Cocktail).options(*cocktail_query_options(fields))
+    if cursor:
+        statement = statement.where(Cocktail.id > cursor[0])
+    return statement.order_by(Cocktail.id)
+
+
+def list_next_cursor(cocktails, sort, has_more):
+    # Works on ORM rows and on catalog snapshot records alike
+    if not has_more:
+        return None
+    last = cocktails[-1]
+    return encode_cursor(last.rating_avg, last.id) if sort == 'top_rated' else encode_cursor(last.id)
+
+
+def cocktail_detail_statement(cocktail_id, fields):
+    return select(Cocktail).options(*cocktail_query_options(fields)).where(Cocktail.id == cocktail_id)
+
+
+def serialize_cocktail_detail(cocktail, reviews, reviews_next_cursor):
+    # `reviews` are already serialized
+    return {
+        'id': cocktail.id,
+        'name': cocktail.name,
+        'image_url': cocktail.image_url,
+        'instructions': cocktail.instructions,
+        'glass_type': cocktail.glass_type,
+        'ingredients': serialize_ingredients(cocktail),
+        'review_count': cocktail.review_count,
+        'rating_avg': cocktail.rating_avg,
+        'reviews': reviews,
+        'reviews_next_cursor': reviews_next_cursor
+    }
+
+
+def cocktail_reviews_statement(cocktail_id, cursor=None):
+    return _review_page_statement(
+        select(Review).options(joinedload(Review.user).load_only(User.username))
+        .where(Review.cocktail_id == cocktail_id),
+        cursor
+    )
+
+
+def user_reviews_statement(user_id, cursor=None):
+    return _review_page_statement(
+        select(Review).options(joinedload(Review.cocktail).load_only(Cocktail.name))
+        .where(Review.user_id == user_id),
+        cursor
+    )
+
+
+def _review_page_statement(statement, cursor):
+    # Newest first, keyed on (created_at, id); served by the
+    # (cocktail_id|user_id, created_at) indexes
+    if cursor:
+        try:
+            created_at = datetime.fromisoformat(cursor[0])
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        statement = statement.where(tuple_(Review.created_at, Review.id) < (created_at, cursor_number(cursor[1])))
+    return statement.order_by(Review.created_at.desc(), Review.id.desc())
+
+
+def review_next_cursor(reviews, has_more):
+    return encode_cursor(reviews[-1].created_at.isoformat(), reviews[-1].id) if has_more else None
+
+
+def cocktails_by_id_statement(fields, cocktail_ids):
+    return select(Cocktail).options(*cocktail_query_options(fields)).where(Cocktail.id.in_(cocktail_ids))
+
+
+def in_hit_order(hits, cocktails):
+    # `hits` are (cocktail id, score) best-first; ids deleted since the
+    # search index was read are skipped
+    by_id = {c.id: c for c in cocktails}
+    return [by_id[cocktail_id] for cocktail_id, _ in hits if cocktail_id in by_id]
+
+
+def search_hits_next_cursor(hits, has_more):
+    return encode_cursor(hits[-1][1], hits[-1][0]) if has_more else None
+
+
+def substring_search_statement(query, ingredient, fields, cursor):
+    # Fallback when the full-text index is unavailable; pages keyed on id
+    statement = select(Cocktail).options(*cocktail_query_options(fields))
+    if query:
+        statement = statement.where(Cocktail.name.ilike(f'%{query}%'))
+    if ingredient:
+        # EXISTS rather than a join so a cocktail matching several
+        # ingredients is returned (and paginated) once
+        statement = statement.where(Cocktail.ingredients.any(
+            CocktailIngredient.ingredient.has(Ingredient.name.ilike(f'%{ingredient}%'))
+        ))
+    if cursor:
+        statement = statement.where(Cocktail.id > cursor_number(cursor[0]))
+    return statement.order_by(Cocktail.id)
+
+
+def ingredients_statement():
+    # Plain rows off a server-side cursor; the unique index on name supplies
+    # the order
+    return select(Ingredient.id, Ingredient.name).order_by(Ingredient.name).execution_options(yield_per=1000)
+
+
+# Review writes. Each returns the statements to run in the writer's
+# transaction besides the review row itself, and the response cache
+# namespaces to invalidate once it commits.
+
+def review_rating(value):
+    # Whole stars, as a number or a numeric string; ValueError (a 400)
+    # otherwise, before it can reach the cocktail's aggregates
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not MIN_RATING <= value <= MAX_RATING:
+        raise ValueError(f'rating must be an integer from {MIN_RATING} to {MAX_RATING}')
+    return value
+
+
+def review_created(review):
+    return [
+        rating_aggregates_statement(review.cocktail_id, 1, review.rating),
+        CatalogState.bump_statement(),
+    ], ('cocktails', f'cocktail:{review.cocktail_id}')
+
+
+def review_updated(review, data):
+    # Applies `data` to the review; a content-only edit still changes the
+    # cocktail's serialized form, so its version is bumped either way
+    rating = review_rating(data['rating']) if 'rating' in data else None
+    if 'content' in data:
+        review.content = data['content']
+    if rating is not None:
+        statements = [rating_aggregates_statement(review.cocktail_id, 0, rating - review.rating)]
+        review.rating = rating
+    else:
+        statements = [touch_cocktails_statement([review.cocktail_id])]
+    return statements + [CatalogState.bump_statement()], ('cocktails', f'cocktail:{review.cocktail_id}')
+
+
+def review_deleted(review):
+    return [
+        rating_aggregates_statement(review.cocktail_id, -1, -review.rating),
+        CatalogState.bump_statement(),
+    ], ('cocktails', f'cocktail:{review.cocktail_id}')
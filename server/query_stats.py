@@ -0,0 +1,177 @@
+# query_stats.py
+import logging
+import time
+from contextvars import ContextVar
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Statements worth an EXPLAIN; anything else (PRAGMA, DDL, COMMIT, EXPLAIN
+# itself) is logged without a plan
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+MAX_PARAMETERS_LENGTH = 1000
+REDACTED = '<redacted>'
+
+# Counts of the async request being served (asgi.py); Flask requests keep
+# theirs in g. SQLAlchemy runs the cursor events of an async session in the
+# awaiting task's context, so the events find the right request.
+_async_stats = ContextVar('sql_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('method', 'path', 'endpoint', 'started', 'statements', 'ms')
+
+    def __init__(self, method, path, endpoint=None):
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.ms = 0.0
+
+
+class QueryStats:
+    # Per-request SQL statement count and database time, reported as a
+    # Server-Timing header and as fields on one log line per request, plus a
+    # slow-query log carrying each slow statement's parameters and plan.
+    #
+    # When SQL_STATS_ENABLED is off nothing is registered at all: no engine
+    # listeners and no request hooks, so the cost is zero.
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = None
+        self.explain = False
+
+    def init_app(self, app):
+        self.enabled = app.config['SQL_STATS_ENABLED']
+        self.slow_query_ms = app.config['SLOW_QUERY_MS']
+        self.explain = app.config['SLOW_QUERY_EXPLAIN']
+        app.extensions['query_stats'] = self
+        if not self.enabled:
+            return
+        with app.app_context():
+            for engine in db.engines.values():
+                self.watch(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._add_server_timing)
+        app.teardown_request(self._log_request)
+
+    def watch(self, engine):
+        # Also used for the async engine of asgi.py (its sync_engine)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def begin(self, method, path, endpoint=None):
+        # Starts counting for an async request; returns its RequestStats
+        stats = RequestStats(method, path, endpoint)
+        _async_stats.set(stats)
+        return stats
+
+    def server_timing(self, stats):
+        total = (time.perf_counter() - stats.started) * 1000
+        return f'db;dur={stats.ms:.2f};desc="{stats.statements} statements", app;dur={total:.2f}'
+
+    def log(self, stats):
+        total = (time.perf_counter() - stats.started) * 1000
+        logger.info(
+            f"{stats.method} {stats.path} sql_statements={stats.statements} "
+            f"sql_ms={stats.ms:.2f} duration_ms={total:.2f}",
+            extra={
+                'method': stats.method,
+                'path': stats.path,
+                'endpoint': stats.endpoint,
+                'sql_statements': stats.statements,
+                'sql_ms': round(stats.ms, 3),
+                'duration_ms': round(total, 3),
+            }
+        )
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # A connection is only used by one thread at a time, so its info dict
+        # is a safe place for the start time
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+        stats = _current_stats()
+        if stats is not None:
+            stats.statements += 1
+            stats.ms += elapsed
+        if elapsed >= self.slow_query_ms:
+            self._log_slow_query(conn, statement, parameters, context, executemany, elapsed)
+
+    def _log_slow_query(self, conn, statement, parameters, context, executemany, elapsed):
+        plan = None
+        if self.explain and not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            plan = explain(conn, statement, parameters)
+        stats = _current_stats()
+        path = f"{stats.method} {stats.path}" if stats is not None else None
+        logged_parameters = _truncate(_redact(parameters, context, executemany))
+        logger.warning(
+            f"Slow query ({elapsed:.1f} ms) in {path or 'no request'}: {' '.join(statement.split())} "
+            f"parameters={logged_parameters} plan={plan}",
+            extra={
+                'sql_ms': round(elapsed, 3),
+                'sql_statement': statement,
+                'sql_parameters': logged_parameters,
+                'sql_plan': plan,
+                'path': path,
+            }
+        )
+
+    def _start_request(self):
+        g.sql_stats = RequestStats(request.method, request.path, request.endpoint)
+
+    def _add_server_timing(self, response):
+        # Statements run while a streamed body is sent come after the headers,
+        # so they only show up in the log line
+        if 'sql_stats' in g:
+            response.headers.add('Server-Timing', self.server_timing(g.sql_stats))
+        return response
+
+    def _log_request(self, error=None):
+        if 'sql_stats' in g:
+            self.log(g.sql_stats)
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get('sql_stats')
+    return _async_stats.get()
+
+
+def explain(conn, statement, parameters):
+    # Runs on the raw DB-API connection so the EXPLAIN neither fires the
+    # cursor events again nor goes through the session
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return ' | '.join(str(row[-1]) for row in cursor.fetchall()) or None
+    except Exception as e:
+        return f'unavailable: {e}'
+    finally:
+        cursor.close()
+
+
+def _redact(parameters, context, executemany):
+    # Password hashes stay out of the log. Positional parameters are matched
+    # to their bind names through the compiled statement, when there is one.
+    if executemany:
+        return [_redact(row, context, False) for row in parameters]
+    if isinstance(parameters, dict):
+        return {k: REDACTED if 'password' in k else v for k, v in parameters.items()}
+    names = getattr(getattr(context, 'compiled', None), 'positiontup', None)
+    if names and len(names) == len(parameters):
+        return tuple(REDACTED if 'password' in name else v for name, v in zip(names, parameters))
+    return parameters
+
+
+def _truncate(parameters):
+    text = repr(parameters)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        return text[:MAX_PARAMETERS_LENGTH] + '...'
+    return text
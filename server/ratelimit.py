@@ -0,0 +1,255 @@
+# ratelimit.py
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from flask import jsonify, request
+from flask_jwt_extended import decode_token
+from cache import MemoryCache
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+_LIMIT_RE = re.compile(r'^\s*(\d+)\s*(?:per|/)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$')
+
+# Expired counters are deleted at most this often per process
+PURGE_INTERVAL = 60
+
+TOO_MANY_REQUESTS = {'error': 'Too many requests, please retry later', 'status_code': 429}
+
+
+def parse_limits(value):
+    # "200 per day;50 per hour" -> [(200, 86400), (50, 3600)]; also takes
+    # "10/minute" and "5 per 30 seconds"
+    limits = []
+    for part in (value or '').split(';'):
+        if not part.strip():
+            continue
+        match = _LIMIT_RE.match(part.lower())
+        if not match:
+            raise ValueError(f"Invalid rate limit: {part!r}")
+        amount, multiple, unit = match.groups()
+        limits.append((int(amount), int(multiple or 1) * PERIODS[unit]))
+    return limits
+
+
+class CounterStorage(ABC):
+    # Expiring counters, shaped like the Redis commands they map to (INCR +
+    # EXPIRE, GET) so every backend gives the same answers
+
+    @abstractmethod
+    def incr(self, key, ttl):
+        pass
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+
+class MemoryStorage(CounterStorage):
+    # Per process: under gunicorn each worker counts on its own, so a limit
+    # is effectively multiplied by the number of workers
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            if now >= self._next_purge:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+                self._next_purge = now + PURGE_INTERVAL
+            count, expires_at = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                count = 0
+            self._counters[key] = (count + 1, now + ttl)
+            return count + 1
+
+    def get(self, key):
+        count, expires_at = self._counters.get(key, (0, 0))
+        return count if expires_at > time.time() else 0
+
+
+class SQLiteStorage(CounterStorage):
+    # Counters in a small SQLite file of their own, shared by every worker
+    # process on the host. Each increment is one autocommitted UPSERT, so
+    # concurrent workers never lose a hit; the file is WAL with
+    # synchronous=OFF, since losing the last few counts in a crash is
+    # harmless.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_purge = 0.0
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_expires_at ON rate_limit (expires_at)")
+
+    def _connection(self):
+        # sqlite3 connections stay on the thread that opened them
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = OFF")
+            self._local.connection = connection
+        return connection
+
+    def incr(self, key, ttl):
+        now = time.time()
+        connection = self._connection()
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL
+            connection.execute("DELETE FROM rate_limit WHERE expires_at <= ?", (now,))
+        return connection.execute(
+            "INSERT INTO rate_limit (key, count, expires_at) VALUES (:key, 1, :expires_at) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "count = CASE WHEN expires_at <= :now THEN 1 ELSE count + 1 END, expires_at = :expires_at "
+            "RETURNING count",
+            {'key': key, 'now': now, 'expires_at': now + ttl}
+        ).fetchone()[0]
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT count FROM rate_limit WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+
+class RedisStorage(CounterStorage):
+
+    def __init__(self, client, prefix='cocktails:ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    def incr(self, key, ttl):
+        pipeline = self.client.pipeline()
+        pipeline.incr(self.prefix + key)
+        pipeline.expire(self.prefix + key, ttl)
+        return pipeline.execute()[0]
+
+    def get(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+
+def create_storage(url, instance_path):
+    if url.startswith('redis://'):
+        import redis
+        return RedisStorage(redis.Redis.from_url(url))
+    if url.startswith('sqlite:///'):
+        # Relative paths live in the instance folder, like the app database
+        path = os.path.join(instance_path, url[len('sqlite:///'):])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteStorage(path)
+    if url == 'memory://':
+        return MemoryStorage()
+    raise ValueError(f"Unsupported RATELIMIT_STORAGE_URL: {url}")
+
+
+class RateLimiter:
+    # Sliding-window rate limits per route and per caller.
+    #
+    # Every route gets RATELIMIT_DEFAULT on its own counters unless it is
+    # decorated with limit() or exempt(). The caller is the user id of a
+    # valid access token (checked by signature only) or else the client IP,
+    # so the check runs in before_request, ahead of any database or password
+    # hashing work. Each limit keeps a counter for the current and the
+    # previous fixed window and weights the previous one by how much of it
+    # still overlaps the sliding window. Rejected requests are counted too,
+    # so a client that keeps hammering stays limited.
+
+    def __init__(self):
+        self.enabled = False
+        self.storage = None
+        self.default_limits = []
+        self._route_limits = {}
+        self._token_users = MemoryCache(max_entries=10000)
+
+    def init_app(self, app):
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        self.default_limits = parse_limits(app.config['RATELIMIT_DEFAULT'])
+        app.extensions['rate_limiter'] = self
+        if not self.enabled:
+            return
+        self.storage = create_storage(app.config['RATELIMIT_STORAGE_URL'], app.instance_path)
+        app.before_request(self._check_request)
+
+    def limit(self, value):
+        # Decorator replacing the default limits of a view
+        def decorator(view):
+            self._route_limits[view.__name__] = parse_limits(value)
+            return view
+        return decorator
+
+    def exempt(self, view):
+        # Takes a view function or an endpoint name
+        self._route_limits[view if isinstance(view, str) else view.__name__] = []
+        return view
+
+    def limits_for(self, endpoint):
+        return self._route_limits.get(endpoint, self.default_limits)
+
+    def client_key(self, authorization, remote_addr):
+        # Needs an app context (decode_token reads the JWT settings). Clients
+        # send the same token for its whole life, so verified tokens are
+        # remembered until they expire rather than decoded on every request.
+        scheme, _, token = (authorization or '').partition(' ')
+        if scheme == 'Bearer' and token:
+            user = self._token_users.get(token)
+            if user is None:
+                try:
+                    claims = decode_token(token)
+                except Exception:
+                    claims = {}
+                if claims.get('type') == 'access':
+                    user = f"user:{claims['sub']}"
+                    self._token_users.set(token, user, ttl=max(1, min(claims['exp'] - time.time(), 300)))
+            if user is not None:
+                return user
+        return f'ip:{remote_addr}'
+
+    def hit(self, endpoint, client):
+        # Counts one request; returns None, or the seconds to wait
+        retry_after = 0
+        now = time.time()
+        try:
+            for amount, period in self.limits_for(endpoint):
+                window = int(now // period)
+                elapsed = now - window * period
+                key = f'{endpoint}:{client}:{amount}/{period}'
+                current = self.storage.incr(f'{key}:{window}', 2 * period)
+                previous = self.storage.get(f'{key}:{window - 1}') if current <= amount else 0
+                if current > amount:
+                    retry_after = max(retry_after, period - elapsed)
+                elif previous * (1 - elapsed / period) + current > amount:
+                    # When the previous window's weight has fallen far enough
+                    retry_after = max(retry_after, period * (1 - (amount - current) / previous) - elapsed)
+        except Exception as e:
+            # Fail open: an unavailable counter store must not take the API down
+            logger.error(f"Rate limit check failed: {e}")
+            return None
+        return max(1, math.ceil(retry_after)) if retry_after > 0 else None
+
+    def _check_request(self):
+        if request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        if not self.limits_for(request.endpoint):
+            return None
+        client = self.client_key(request.headers.get('Authorization'), request.remote_addr)
+        retry_after = self.hit(request.endpoint, client)
+        if retry_after is None:
+            return None
+        response = jsonify(TOO_MANY_REQUESTS)
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
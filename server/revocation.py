@@ -0,0 +1,95 @@
+# revocation.py
+import logging
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import delete, select
+from models import db, RevokedToken, insert_ignoring_conflicts
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    # Revoked token ids, checked on every authenticated request.
+    #
+    # Each worker keeps {jti: expiry} in memory, so a check is one dict
+    # lookup. The table is the shared record: revoke() writes a row, and the
+    # other workers pull rows past the highest id they have seen, at most
+    # once per REVOCATION_SYNC_INTERVAL seconds, so a logout reaches every
+    # worker within that interval. Expired entries are dropped on sync, which
+    # keeps the set no larger than the tokens revoked within their lifetime.
+
+    def __init__(self):
+        self.sync_interval = 5
+        self._revoked = {}
+        self._last_id = 0
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.sync_interval = app.config['REVOCATION_SYNC_INTERVAL']
+        app.extensions['revocation_list'] = self
+
+    def load(self):
+        # Called once the tables exist; rows already past their expiry are
+        # deleted rather than loaded
+        db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow()))
+        db.session.commit()
+        with self._lock:
+            self._revoked = {}
+            self._last_id = 0
+            self._apply(self._fetch_since(0))
+            self._next_sync = time.monotonic() + self.sync_interval
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        return jti in self._revoked
+
+    def revoke(self, tokens):
+        # `tokens` are decoded JWTs. Commits the session, and only then adds
+        # them to the in-memory set, so a failed commit revokes nothing. A
+        # token another worker revoked first (not synced here yet) is
+        # already in the table and left as it is.
+        rows = [{
+            'jti': token['jti'],
+            'token_type': token['type'],
+            'user_id': token.get('sub'),
+            'expires_at': datetime.utcfromtimestamp(token['exp']),
+        } for token in tokens]
+        if rows:
+            db.session.execute(insert_ignoring_conflicts(RevokedToken), rows)
+        db.session.commit()
+        for row in rows:
+            self._revoked[row['jti']] = row['expires_at']
+
+    def sync(self):
+        # Only one thread polls; the others keep answering from the current
+        # set rather than queueing behind the query
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sync = time.monotonic() + self.sync_interval
+            self._apply(self._fetch_since(self._last_id))
+            now = datetime.utcnow()
+            expired = [jti for jti, expires_at in list(self._revoked.items()) if expires_at < now]
+            for jti in expired:
+                del self._revoked[jti]
+        except Exception as e:
+            logger.error(f"Revocation list sync failed: {e}")
+        finally:
+            self._lock.release()
+
+    def _fetch_since(self, last_id):
+        # Ids are handed out in commit order on SQLite, where writes are
+        # serialized
+        return db.session.execute(
+            select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.id > last_id)
+            .order_by(RevokedToken.id)
+        ).all()
+
+    def _apply(self, rows):
+        for row_id, jti, expires_at in rows:
+            self._revoked[jti] = expires_at
+            self._last_id = row_id
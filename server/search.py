@@ -0,0 +1,117 @@
+# search.py
+import logging
+import re
+from flask import current_app
+from sqlalchemy import bindparam, text
+from models import db
+from pagination import cursor_number
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'cocktail_search'
+
+# bm25 weights for (name, instructions, glass_type, ingredients): a hit in the
+# cocktail name outranks one buried in the instructions
+BM25_WEIGHTS = '10.0, 1.0, 2.0, 5.0'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_SOURCE_SELECT = """
+    SELECT c.id, c.name, COALESCE(c.instructions, ''), COALESCE(c.glass_type, ''),
+           COALESCE(group_concat(i.name, ' '), '')
+    FROM cocktail c
+    LEFT JOIN cocktail_ingredient ci ON ci.cocktail_id = c.id
+    LEFT JOIN ingredient i ON i.id = ci.ingredient_id
+"""
+
+_INSERT = f"INSERT INTO {FTS_TABLE} (rowid, name, instructions, glass_type, ingredients) {_SOURCE_SELECT}"
+
+
+def init_app(app):
+    # Create (and on first run, populate) the FTS5 table. Falls back to the
+    # LIKE-based search when the database is not SQLite or lacks FTS5.
+    enabled = app.config.get('SEARCH_FTS_ENABLED', True) and db.engine.dialect.name == 'sqlite'
+    if enabled:
+        try:
+            with db.engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': FTS_TABLE}
+                ).first()
+                if not exists:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "name, instructions, glass_type, ingredients, "
+                        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                    ))
+                    conn.execute(text(f"{_INSERT} GROUP BY c.id"))
+                    logger.info("Cocktail search index built")
+        except Exception as e:
+            logger.error(f"Full-text search unavailable, using LIKE search: {e}")
+            enabled = False
+    app.extensions['cocktail_search'] = enabled
+
+
+def is_enabled():
+    return current_app.extensions.get('cocktail_search', False)
+
+
+def index_cocktails(cocktail_ids):
+    # Re-index the given cocktails inside the current session's transaction,
+    # so the index commits (or rolls back) together with the cocktail rows
+    if not is_enabled() or not cocktail_ids:
+        return
+    remove_cocktails(cocktail_ids)
+    db.session.execute(text(
+        f"{_INSERT} WHERE c.id IN :ids GROUP BY c.id"
+    ).bindparams(bindparam('ids', expanding=True)), {'ids': list(cocktail_ids)})
+
+
+def remove_cocktails(cocktail_ids):
+    if not is_enabled() or not cocktail_ids:
+        return
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(cocktail_ids)}
+    )
+
+
+def rebuild():
+    if not is_enabled():
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(text(f"{_INSERT} GROUP BY c.id"))
+
+
+def build_match(query, ingredient):
+    # Every word becomes a quoted prefix term; user input never reaches the
+    # FTS5 query syntax unescaped
+    terms = ' '.join(f'"{t}"*' for t in _TOKEN_RE.findall(query))
+    ingredient_terms = ' '.join(f'"{t}"*' for t in _TOKEN_RE.findall(ingredient))
+    parts = []
+    if terms:
+        parts.append(f'({terms})')
+    if ingredient_terms:
+        parts.append(f'{{ingredients}} : ({ingredient_terms})')
+    return ' AND '.join(parts)
+
+
+def search_ids(match, limit, cursor=None):
+    # Returns [(cocktail_id, score)] best-first; (score, id) is the keyset
+    return [tuple(row) for row in db.session.execute(*search_statement(match, limit, cursor))]
+
+
+def search_statement(match, limit, cursor=None):
+    # (statement, params) for search_ids, shared with the async handlers
+    sql = (
+        f"SELECT id, score FROM ("
+        f"  SELECT rowid AS id, bm25({FTS_TABLE}, {BM25_WEIGHTS}) AS score"
+        f"  FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        f")"
+    )
+    params = {'match': match, 'limit': limit}
+    if cursor:
+        sql += " WHERE score > :score OR (score = :score AND id > :id)"
+        params['score'], params['id'] = cursor_number(cursor[0]), cursor_number(cursor[1])
+    sql += " ORDER BY score, id LIMIT :limit"
+    return text(sql), params
@@ -1,355 +1,527 @@
 # seed.py
+import argparse
 import logging
-from datetime import datetime
-from models import db, User, Cocktail, Ingredient, CocktailIngredient, Review
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, inspect, or_
+from models import db, User, Cocktail, Ingredient, CocktailIngredient, Review, CatalogState, touch_cocktails
 from flask import Flask
 from config import Config
 from flask_cors import CORS
+import migrations
+import search
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SAMPLE_COCKTAILS = [
+    {
+        "id": 1,
+        "name": "Classic Mojito",
+        "image": "https://images.unsplash.com/photo-1551538827-9c037cb4f32a",
+        "directions": "Muddle mint leaves with sugar and lime juice. Add rum and fill glass with crushed ice. Top with club soda and garnish with mint sprig.",
+        "glass_type": "Highball",
+        "ingredients": [
+            "2 oz White rum",
+            "1 oz Fresh lime juice",
+            "0.75 oz Simple syrup",
+            "6-8 Fresh mint leaves",
+            "2 oz Club soda",
+            "1 Mint sprig for garnish"
+        ]
+    },
+    {
+        "id": 2,
+        "name": "Espresso Martini",
+        "image": "https://images.unsplash.com/photo-1545438102-799c3991ffb2",
+        "directions": "Shake vodka, coffee liqueur, and fresh espresso with ice. Strain into chilled martini glass. Garnish with coffee beans.",
+        "glass_type": "Martini",
+        "ingredients": [
+            "2 oz Vodka",
+            "1 oz Coffee liqueur",
+            "1 oz Fresh espresso",
+            "0.5 oz Simple syrup",
+            "3 Coffee beans for garnish"
+        ]
+    },
+    {
+        "id": 3,
+        "name": "Negroni",
+        "image": "https://images.unsplash.com/photo-1570598912132-0ba1dc952b7d",
+        "directions": "Stir gin, Campari, and sweet vermouth with ice. Strain into rocks glass over large ice cube. Garnish with orange peel.",
+        "glass_type": "Rocks",
+        "ingredients": [
+            "1 oz Gin",
+            "1 oz Campari",
+            "1 oz Sweet vermouth",
+            "1 Orange peel for garnish"
+        ]
+    },
+    {
+        "id": 4,
+        "name": "Passion Fruit Margarita",
+        "image": "https://images.unsplash.com/photo-1556855810-ac404aa91e85",
+        "directions": "Shake tequila, passion fruit puree, lime juice, and triple sec with ice. Strain into salt-rimmed glass. Garnish with lime wheel.",
+        "glass_type": "Margarita",
+        "ingredients": [
+            "2 oz Tequila",
+            "1 oz Passion fruit puree",
+            "0.75 oz Fresh lime juice",
+            "0.5 oz Triple sec",
+            "Salt for rim",
+            "1 Lime wheel for garnish"
+        ]
+    },
+    {
+        "id": 5,
+        "name": "Old Fashioned",
+        "image": "https://images.unsplash.com/photo-1470337458703-46ad1756a187",
+        "directions": "Muddle sugar cube with bitters and splash of water. Add bourbon and stir with ice. Garnish with orange peel and cherry.",
+        "glass_type": "Rocks",
+        "ingredients": [
+            "2 oz Bourbon",
+            "1 Sugar cube",
+            "2-3 dashes Angostura bitters",
+            "1 Orange peel",
+            "1 Maraschino cherry"
+        ]
+    },
+    {
+        "id": 6,
+        "name": "French 75",
+        "image": "https://images.unsplash.com/photo-1556679343-c7306c1976bc",
+        "directions": "Shake gin, lemon juice, and simple syrup with ice. Strain into champagne flute and top with champagne. Garnish with lemon twist.",
+        "glass_type": "Champagne Flute",
+        "ingredients": [
+            "1.5 oz Gin",
+            "0.75 oz Fresh lemon juice",
+            "0.5 oz Simple syrup",
+            "3 oz Champagne",
+            "1 Lemon twist for garnish"
+        ]
+    },
+    {
+        "id": 7,
+        "name": "Piña Colada",
+        "image": "https://images.unsplash.com/photo-1582633987110-6b4ca43e9a49",
+        "directions": "Blend rum, coconut cream, pineapple juice, and ice until smooth. Pour into glass and garnish with pineapple wedge and cherry.",
+        "glass_type": "Hurricane",
+        "ingredients": [
+            "2 oz White rum",
+            "2 oz Coconut cream",
+            "2 oz Pineapple juice",
+            "1.5 cups Crushed ice",
+            "1 Pineapple wedge",
+            "1 Maraschino cherry"
+        ]
+    },
+    {
+        "id": 8,
+        "name": "Moscow Mule",
+        "image": "https://images.unsplash.com/photo-1514362545857-3bc16c4c7d1b",
+        "directions": "Combine vodka and lime juice in copper mug with ice. Top with ginger beer and garnish with lime wheel and mint sprig.",
+        "glass_type": "Copper Mug",
+        "ingredients": [
+            "2 oz Vodka",
+            "0.5 oz Fresh lime juice",
+            "4 oz Ginger beer",
+            "1 Lime wheel",
+            "1 Mint sprig"
+        ]
+    },
+    {
+        "id": 9,
+        "name": "Cosmopolitan",
+        "image": "https://images.unsplash.com/photo-1560512823-829485b8bf24",
+        "directions": "Shake vodka, cranberry juice, lime juice, and triple sec with ice. Strain into martini glass and garnish with lime wheel.",
+        "glass_type": "Martini",
+        "ingredients": [
+            "1.5 oz Citrus vodka",
+            "1 oz Cranberry juice",
+            "0.5 oz Fresh lime juice",
+            "0.5 oz Triple sec",
+            "1 Lime wheel for garnish"
+        ]
+    },
+    {
+        "id": 10,
+        "name": "Mai Tai",
+        "image": "https://images.unsplash.com/photo-1549746423-e5fe9cafded8",
+        "directions": "Shake rums, orange curacao, orgeat, and lime juice with ice. Strain into glass filled with crushed ice. Float dark rum on top.",
+        "glass_type": "Rocks",
+        "ingredients": [
+            "2 oz White rum",
+            "0.5 oz Orange curacao",
+            "0.5 oz Orgeat syrup",
+            "1 oz Fresh lime juice",
+            "0.5 oz Dark rum float",
+            "1 Mint sprig for garnish"
+        ]
+    },
+    {
+        "id": 11,
+        "name": "Aviation",
+        "image": "https://images.unsplash.com/photo-1527761939622-9119e4eec134",
+        "directions": "Shake gin, maraschino liqueur, creme de violette, and lemon juice with ice. Strain into cocktail glass. Garnish with cherry.",
+        "glass_type": "Coupe",
+        "ingredients": [
+            "2 oz Gin",
+            "0.5 oz Maraschino liqueur",
+            "0.25 oz Creme de violette",
+            "0.75 oz Fresh lemon juice",
+            "1 Maraschino cherry for garnish"
+        ]
+    },
+    {
+        "id": 12,
+        "name": "Whiskey Sour",
+        "image": "https://images.unsplash.com/photo-1514362453360-8f2671dd9802",
+        "directions": "Shake whiskey, lemon juice, simple syrup, and optional egg white with ice. Strain into rocks glass over ice. Garnish with orange slice and cherry.",
+        "glass_type": "Rocks",
+        "ingredients": [
+            "2 oz Bourbon",
+            "1 oz Fresh lemon juice",
+            "0.75 oz Simple syrup",
+            "1 Egg white (optional)",
+            "1 Orange slice",
+            "1 Maraschino cherry"
+        ]
+    },
+    {
+        "id": 13,
+        "name": "Gin Basil Smash",
+        "image": "https://images.unsplash.com/photo-1558950334-8d04704332f8",
+        "directions": "Muddle basil leaves with simple syrup. Add gin and lemon juice, shake with ice. Double strain into rocks glass over ice. Garnish with basil leaf.",
+        "glass_type": "Rocks",
+        "ingredients": [
+            "2 oz Gin",
+            "1 oz Fresh lemon juice",
+            "0.75 oz Simple syrup",
+            "8-10 Fresh basil leaves",
+            "1 Basil leaf for garnish"
+        ]
+    }
+]
+
+SAMPLE_USERS = [
+    {
+        "username": "cocktail_lover",
+        "email": "cocktail@example.com",
+        "password": "mixology123"
+    },
+    {
+        "username": "bar_enthusiast",
+        "email": "bar@example.com",
+        "password": "cheers456"
+    },
+    {
+        "username": "drink_master",
+        "email": "master@example.com",
+        "password": "spirits789"
+    }
+]
+
+# Reviewers are referenced by index into SAMPLE_USERS
+SAMPLE_REVIEWS = [
+    {
+        "id": 1,
+        "cocktail_id": 1,
+        "content": "Perfect summer drink! The mint makes it so refreshing.",
+        "rating": 5,
+        "user": 0
+    },
+    {
+        "id": 2,
+        "cocktail_id": 2,
+        "content": "Best espresso martini I've ever made at home. Perfect balance!",
+        "rating": 5,
+        "user": 1
+    },
+    {
+        "id": 3,
+        "cocktail_id": 3,
+        "content": "A classic for a reason. Perfect balance of bitter and sweet.",
+        "rating": 4,
+        "user": 2
+    },
+    {
+        "id": 4,
+        "cocktail_id": 4,
+        "content": "The passion fruit adds an amazing tropical twist!",
+        "rating": 5,
+        "user": 0
+    },
+    {
+        "id": 5,
+        "cocktail_id": 5,
+        "content": "You can't go wrong with a well-made Old Fashioned.",
+        "rating": 5,
+        "user": 1
+    }
+]
+
+# Applied to the loading connection for the duration of a seed: no fsync
+# at commit, and a page cache large enough that index pages are not spilled
+# to disk mid-transaction
+SQLITE_LOAD_PRAGMAS = {'synchronous': 'OFF', 'cache_size': -262144, 'temp_store': 'MEMORY'}
+
+# Ids per IN list when reading back or deleting seeded rows
+ID_CHUNK = 500
+
+# Vocabulary for generate_data(). Ingredients are written the way the
+# sample recipes are ("1.5 oz Gin") and go through parse_ingredient(), so
+# generated rows look exactly like seeded ones.
+SPIRITS = [
+    'Gin', 'Vodka', 'White rum', 'Dark rum', 'Tequila', 'Mezcal', 'Bourbon', 'Rye whiskey',
+    'Scotch', 'Cognac', 'Pisco', 'Cachaça', 'Aquavit', 'Genever'
+]
+SPIRIT_STYLES = ['Aged', 'Overproof', 'Spiced', 'Smoked', 'Barrel-proof', 'Navy strength']
+MODIFIERS = [
+    'Sweet vermouth', 'Dry vermouth', 'Campari', 'Aperol', 'Triple sec', 'Maraschino liqueur',
+    'Coffee liqueur', 'Green Chartreuse', 'Yellow Chartreuse', 'Bénédictine', 'Amaro', 'Absinthe',
+    'Falernum', 'Orgeat syrup', 'Simple syrup', 'Honey syrup', 'Grenadine', 'Coconut cream'
+]
+FLAVOURS = [
+    'lime', 'lemon', 'orange', 'grapefruit', 'pineapple', 'passion fruit', 'cranberry', 'blood orange',
+    'yuzu', 'mango', 'watermelon', 'cherry', 'raspberry', 'blackberry', 'pear', 'apple', 'cucumber',
+    'ginger', 'cinnamon', 'vanilla', 'rosemary', 'basil', 'mint', 'lavender', 'hibiscus', 'coconut'
+]
+FLAVOUR_FORMS = ['juice', 'syrup', 'puree', 'liqueur', 'shrub', 'cordial', 'soda']
+BITTERS = ['Angostura bitters', 'Orange bitters', "Peychaud's bitters", 'Chocolate bitters', 'Celery bitters']
+GARNISHES = ['Lime wheel', 'Lemon twist', 'Orange peel', 'Mint sprig', 'Maraschino cherry', 'Basil leaf', 'Pineapple wedge']
+NAME_WORDS = [
+    'Classic', 'Smoky', 'Tropical', 'Frozen', 'Spiced', 'Royal', 'Midnight', 'Golden', 'Velvet',
+    'Dark', 'Southern', 'Island', 'Garden', 'Winter', 'Bitter', 'Dirty', 'Naked', 'Lost'
+]
+NAME_STYLES = [
+    'Sour', 'Fizz', 'Punch', 'Mule', 'Sling', 'Julep', 'Smash', 'Flip', 'Cobbler', 'Collins',
+    'Martini', 'Negroni', 'Daiquiri', 'Margarita', 'Spritz', 'Toddy', 'Old Fashioned', 'Highball'
+]
+METHODS = ['Shake', 'Stir', 'Build', 'Muddle', 'Blend', 'Whip shake']
+REVIEW_PHRASES = [
+    'Perfectly balanced.', 'A bit too sweet for me.', 'Will make this again!', 'Great with a big ice cube.',
+    'Needs more citrus.', 'My new favourite.', 'Strong but smooth.', 'Too bitter.', 'Crowd pleaser at our party.',
+    'Tastes even better with fresh juice.', 'Not for me.', 'Beautiful colour and aroma.'
+]
+SEED_PASSWORD = 'password'
+# Generated timestamps are spread over two years from a fixed start, so the
+# same --seed always produces the same database
+EPOCH = datetime(2024, 1, 1)
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     db.init_app(app)
     return app
 
-def seed_data(app):
+def parse_ingredient(ingredient_str):
+    # "2 oz White rum" -> ("2", "oz White rum"); a single word has no amount
+    parts = ingredient_str.split(' ', 1)
+    amount = parts[0] if len(parts) > 1 else ''
+    name = parts[1] if len(parts) > 1 else parts[0]
+    return amount, name
+
+def clear_data():
+    # Clear existing data in the correct order; committed together with the
+    # data that replaces it
+    logger.info("Clearing existing data...")
+    Review.query.delete()
+    CocktailIngredient.query.delete()
+    Cocktail.query.delete()
+    Ingredient.query.delete()
+    User.query.delete()
+    logger.info("Existing data cleared successfully!")
+
+@contextmanager
+def load_pragmas():
+    # SQLITE_LOAD_PRAGMAS on the session's connection, restored afterwards.
+    # The connection outlives the commit (it goes back to the pool), so the
+    # previous values are put back on it directly.
+    if db.engine.dialect.name != 'sqlite':
+        yield
+        return
+    connection = db.session.connection().connection.driver_connection
+    saved = {name: connection.execute(f"PRAGMA {name}").fetchone()[0] for name in SQLITE_LOAD_PRAGMAS}
+    for name, value in SQLITE_LOAD_PRAGMAS.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+
+def write_statement(table, upsert=False, key=(), update=()):
+    # Plain INSERT, or with upsert=True an INSERT ... ON CONFLICT on the
+    # natural key that only rewrites rows whose `update` columns changed
+    # (bumping their version), so reseeding unchanged data writes nothing
+    if not upsert:
+        return insert(table)
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert_insert
+    else:
+        raise RuntimeError(f"Upsert seeding is not supported on {dialect}")
+    statement = upsert_insert(table)
+    if not update:
+        return statement.on_conflict_do_nothing(index_elements=key)
+    changes = {column: statement.excluded[column] for column in update}
+    if 'version' in table.c:
+        changes['version'] = table.c.version + 1
+    if 'updated_at' in table.c:
+        # ON CONFLICT DO UPDATE skips the column's onupdate
+        changes['updated_at'] = datetime.utcnow()
+    return statement.on_conflict_do_update(
+        index_elements=key,
+        set_=changes,
+        where=or_(*(table.c[column].is_distinct_from(statement.excluded[column]) for column in update))
+    )
+
+def insert_chunked(statement, rows, chunk_size, after_chunk=None):
+    # Core executemany in chunks, so neither the ORM nor the full row list
+    # is ever held in memory. after_chunk() runs once each chunk is in, e.g.
+    # to write rows that reference it
+    chunk, count = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(statement, chunk)
+            count += len(chunk)
+            chunk = []
+            if after_chunk is not None:
+                after_chunk()
+    if chunk:
+        db.session.execute(statement, chunk)
+        count += len(chunk)
+        if after_chunk is not None:
+            after_chunk()
+    return count
+
+def write_users(rows, upsert, chunk_size):
+    # Returns {username: id}; ids are assigned by the database in both modes
+    insert_chunked(write_statement(User.__table__, upsert, ['username'], ['email']), rows, chunk_size)
+    return dict(db.session.query(User.username, User.id))
+
+def write_ingredients(names, upsert, chunk_size):
+    # Returns {name: id}
+    insert_chunked(write_statement(Ingredient.__table__, upsert, ['name']), ({'name': name} for name in names), chunk_size)
+    return dict(db.session.query(Ingredient.name, Ingredient.id).filter(Ingredient.name.in_(names)))
+
+def cocktail_statement(upsert):
+    return write_statement(Cocktail.__table__, upsert, ['id'], ['name', 'image_url', 'instructions', 'glass_type'])
+
+def cocktail_ingredient_statement(upsert):
+    return write_statement(CocktailIngredient.__table__, upsert, ['cocktail_id', 'ingredient_id'], ['amount'])
+
+def write_cocktail_ingredients(links, upsert, chunk_size):
+    # With upsert the seeded links replace those of each seeded cocktail:
+    # links missing from the seed set are deleted, and cocktails whose
+    # ingredients changed get a version bump, since ON CONFLICT only rewrites
+    # the link rows themselves
+    if not upsert:
+        return insert_chunked(cocktail_ingredient_statement(False), links, chunk_size)
+    links = list(links)
+    seeded = {(link['cocktail_id'], link['ingredient_id']): link['amount'] for link in links}
+    cocktail_ids = sorted({cocktail_id for cocktail_id, _ in seeded})
+    existing, stale, changed = set(), [], set()
+    for start in range(0, len(cocktail_ids), ID_CHUNK):
+        for link_id, cocktail_id, ingredient_id, amount in db.session.query(
+            CocktailIngredient.id, CocktailIngredient.cocktail_id,
+            CocktailIngredient.ingredient_id, CocktailIngredient.amount
+        ).filter(CocktailIngredient.cocktail_id.in_(cocktail_ids[start:start + ID_CHUNK])):
+            key = (cocktail_id, ingredient_id)
+            existing.add(key)
+            if key not in seeded:
+                stale.append(link_id)
+                changed.add(cocktail_id)
+            elif seeded[key] != amount:
+                changed.add(cocktail_id)
+    changed.update(cocktail_id for cocktail_id, ingredient_id in seeded if (cocktail_id, ingredient_id) not in existing)
+
+    for start in range(0, len(stale), ID_CHUNK):
+        db.session.execute(delete(CocktailIngredient).where(
+            CocktailIngredient.id.in_(stale[start:start + ID_CHUNK])
+        ).execution_options(synchronize_session=False))
+    count = insert_chunked(cocktail_ingredient_statement(True), links, chunk_size)
+    changed = sorted(changed)
+    for start in range(0, len(changed), ID_CHUNK):
+        touch_cocktails(changed[start:start + ID_CHUNK])
+    return count
+
+def review_statement(upsert):
+    # Reviews have no natural key; seeded ones keep fixed ids instead
+    return write_statement(Review.__table__, upsert, ['id'])
+
+def seed_data(app, upsert=False, chunk_size=10000):
+    # upsert=False wipes the tables first; upsert=True merges the sample
+    # data into whatever is there, keyed on username, ingredient name and
+    # cocktail id. Either way everything is written in one transaction.
     try:
         logger.info("Starting the seeding process...")
 
-        # Clear existing data in the correct order
-        logger.info("Clearing existing data...")
-        Review.query.delete()
-        CocktailIngredient.query.delete()
-        Cocktail.query.delete()
-        Ingredient.query.delete()
-        User.query.delete()
-        
-        db.session.commit()
-        logger.info("Existing data cleared successfully!")
-
-        # Create test users
-        logger.info("Creating test users...")
-        users = [
-            {
-                "username": "cocktail_lover",
-                "email": "cocktail@example.com",
-                "password": "mixology123"
-            },
-            {
-                "username": "bar_enthusiast",
-                "email": "bar@example.com",
-                "password": "cheers456"
-            },
-            {
-                "username": "drink_master",
-                "email": "master@example.com",
-                "password": "spirits789"
-            }
-        ]
+        with load_pragmas():
+            if not upsert:
+                clear_data()
 
-        created_users = []
-        for user_data in users:
-            user = User(
-                username=user_data["username"],
-                email=user_data["email"]
-            )
-            user.set_password(user_data["password"])
-            db.session.add(user)
-            created_users.append(user)
-
-        db.session.commit()
-        logger.info("Test users created successfully!")
-
-        cocktails = [
-            {
-                "id": 1,
-                "name": "Classic Mojito",
-                "image": "https://images.unsplash.com/photo-1551538827-9c037cb4f32a",
-                "directions": "Muddle mint leaves with sugar and lime juice. Add rum and fill glass with crushed ice. Top with club soda and garnish with mint sprig.",
-                "glass_type": "Highball",
-                "ingredients": [
-                    "2 oz White rum",
-                    "1 oz Fresh lime juice",
-                    "0.75 oz Simple syrup",
-                    "6-8 Fresh mint leaves",
-                    "2 oz Club soda",
-                    "1 Mint sprig for garnish"
-                ]
-            },
-            {
-                "id": 2,
-                "name": "Espresso Martini",
-                "image": "https://images.unsplash.com/photo-1545438102-799c3991ffb2",
-                "directions": "Shake vodka, coffee liqueur, and fresh espresso with ice. Strain into chilled martini glass. Garnish with coffee beans.",
-                "glass_type": "Martini",
-                "ingredients": [
-                    "2 oz Vodka",
-                    "1 oz Coffee liqueur",
-                    "1 oz Fresh espresso",
-                    "0.5 oz Simple syrup",
-                    "3 Coffee beans for garnish"
-                ]
-            },
-            {
-                "id": 3,
-                "name": "Negroni",
-                "image": "https://images.unsplash.com/photo-1570598912132-0ba1dc952b7d",
-                "directions": "Stir gin, Campari, and sweet vermouth with ice. Strain into rocks glass over large ice cube. Garnish with orange peel.",
-                "glass_type": "Rocks",
-                "ingredients": [
-                    "1 oz Gin",
-                    "1 oz Campari",
-                    "1 oz Sweet vermouth",
-                    "1 Orange peel for garnish"
-                ]
-            },
-            {
-                "id": 4,
-                "name": "Passion Fruit Margarita",
-                "image": "https://images.unsplash.com/photo-1556855810-ac404aa91e85",
-                "directions": "Shake tequila, passion fruit puree, lime juice, and triple sec with ice. Strain into salt-rimmed glass. Garnish with lime wheel.",
-                "glass_type": "Margarita",
-                "ingredients": [
-                    "2 oz Tequila",
-                    "1 oz Passion fruit puree",
-                    "0.75 oz Fresh lime juice",
-                    "0.5 oz Triple sec",
-                    "Salt for rim",
-                    "1 Lime wheel for garnish"
-                ]
-            },
-            {
-                "id": 5,
-                "name": "Old Fashioned",
-                "image": "https://images.unsplash.com/photo-1470337458703-46ad1756a187",
-                "directions": "Muddle sugar cube with bitters and splash of water. Add bourbon and stir with ice. Garnish with orange peel and cherry.",
-                "glass_type": "Rocks",
-                "ingredients": [
-                    "2 oz Bourbon",
-                    "1 Sugar cube",
-                    "2-3 dashes Angostura bitters",
-                    "1 Orange peel",
-                    "1 Maraschino cherry"
-                ]
-            },
-            {
-                "id": 6,
-                "name": "French 75",
-                "image": "https://images.unsplash.com/photo-1556679343-c7306c1976bc",
-                "directions": "Shake gin, lemon juice, and simple syrup with ice. Strain into champagne flute and top with champagne. Garnish with lemon twist.",
-                "glass_type": "Champagne Flute",
-                "ingredients": [
-                    "1.5 oz Gin",
-                    "0.75 oz Fresh lemon juice",
-                    "0.5 oz Simple syrup",
-                    "3 oz Champagne",
-                    "1 Lemon twist for garnish"
-                ]
-            },
-            {
-                "id": 7,
-                "name": "Piña Colada",
-                "image": "https://images.unsplash.com/photo-1582633987110-6b4ca43e9a49",
-                "directions": "Blend rum, coconut cream, pineapple juice, and ice until smooth. Pour into glass and garnish with pineapple wedge and cherry.",
-                "glass_type": "Hurricane",
-                "ingredients": [
-                    "2 oz White rum",
-                    "2 oz Coconut cream",
-                    "2 oz Pineapple juice",
-                    "1.5 cups Crushed ice",
-                    "1 Pineapple wedge",
-                    "1 Maraschino cherry"
-                ]
-            },
-            {
-                "id": 8,
-                "name": "Moscow Mule",
-                "image": "https://images.unsplash.com/photo-1514362545857-3bc16c4c7d1b",
-                "directions": "Combine vodka and lime juice in copper mug with ice. Top with ginger beer and garnish with lime wheel and mint sprig.",
-                "glass_type": "Copper Mug",
-                "ingredients": [
-                    "2 oz Vodka",
-                    "0.5 oz Fresh lime juice",
-                    "4 oz Ginger beer",
-                    "1 Lime wheel",
-                    "1 Mint sprig"
-                ]
-            },
-            {
-                "id": 9,
-                "name": "Cosmopolitan",
-                "image": "https://images.unsplash.com/photo-1560512823-829485b8bf24",
-                "directions": "Shake vodka, cranberry juice, lime juice, and triple sec with ice. Strain into martini glass and garnish with lime wheel.",
-                "glass_type": "Martini",
-                "ingredients": [
-                    "1.5 oz Citrus vodka",
-                    "1 oz Cranberry juice",
-                    "0.5 oz Fresh lime juice",
-                    "0.5 oz Triple sec",
-                    "1 Lime wheel for garnish"
-                ]
-            },
-            {
-                "id": 10,
-                "name": "Mai Tai",
-                "image": "https://images.unsplash.com/photo-1549746423-e5fe9cafded8",
-                "directions": "Shake rums, orange curacao, orgeat, and lime juice with ice. Strain into glass filled with crushed ice. Float dark rum on top.",
-                "glass_type": "Rocks",
-                "ingredients": [
-                    "2 oz White rum",
-                    "0.5 oz Orange curacao",
-                    "0.5 oz Orgeat syrup",
-                    "1 oz Fresh lime juice",
-                    "0.5 oz Dark rum float",
-                    "1 Mint sprig for garnish"
-                ]
-            },
-            {
-                "id": 11,
-                "name": "Aviation",
-                "image": "https://images.unsplash.com/photo-1527761939622-9119e4eec134",
-                "directions": "Shake gin, maraschino liqueur, creme de violette, and lemon juice with ice. Strain into cocktail glass. Garnish with cherry.",
-                "glass_type": "Coupe",
-                "ingredients": [
-                    "2 oz Gin",
-                    "0.5 oz Maraschino liqueur",
-                    "0.25 oz Creme de violette",
-                    "0.75 oz Fresh lemon juice",
-                    "1 Maraschino cherry for garnish"
-                ]
-            },
-            {
-                "id": 12,
-                "name": "Whiskey Sour",
-                "image": "https://images.unsplash.com/photo-1514362453360-8f2671dd9802",
-                "directions": "Shake whiskey, lemon juice, simple syrup, and optional egg white with ice. Strain into rocks glass over ice. Garnish with orange slice and cherry.",
-                "glass_type": "Rocks",
-                "ingredients": [
-                    "2 oz Bourbon",
-                    "1 oz Fresh lemon juice",
-                    "0.75 oz Simple syrup",
-                    "1 Egg white (optional)",
-                    "1 Orange slice",
-                    "1 Maraschino cherry"
-                ]
-            },
-            {
-                "id": 13,
-                "name": "Gin Basil Smash",
-                "image": "https://images.unsplash.com/photo-1558950334-8d04704332f8",
-                "directions": "Muddle basil leaves with simple syrup. Add gin and lemon juice, shake with ice. Double strain into rocks glass over ice. Garnish with basil leaf.",
-                "glass_type": "Rocks",
-                "ingredients": [
-                    "2 oz Gin",
-                    "1 oz Fresh lemon juice",
-                    "0.75 oz Simple syrup",
-                    "8-10 Fresh basil leaves",
-                    "1 Basil leaf for garnish"
-                ]
-            }
-        ]
+            # Create test users
+            logger.info("Creating test users...")
+            rows = []
+            for user_data in SAMPLE_USERS:
+                user = User(username=user_data["username"], email=user_data["email"])
+                user.set_password(user_data["password"])
+                rows.append({'username': user.username, 'email': user.email, 'password_hash': user.password_hash})
+            user_ids = write_users(rows, upsert, chunk_size)
 
-        # Create ingredients
-        logger.info("Creating ingredients...")
-        ingredient_dict = {}
-        for cocktail_data in cocktails:
-            for ingredient_str in cocktail_data['ingredients']:
-                parts = ingredient_str.split(' ', 1)
-                name = parts[1] if len(parts) > 1 else parts[0]
-                
-                if name not in ingredient_dict:
-                    ingredient = Ingredient(name=name)
-                    db.session.add(ingredient)
-                    ingredient_dict[name] = ingredient
-
-        db.session.commit()
-        logger.info("Ingredients created successfully!")
-
-        # Create cocktails and their relationships
-        logger.info("Creating cocktails and relationships...")
-        created_cocktails = {}
-        for cocktail_data in cocktails:
-            cocktail = Cocktail(
-                id=cocktail_data['id'],
-                name=cocktail_data['name'],
-                image_url=cocktail_data['image'],
-                instructions=cocktail_data['directions'],
-                glass_type=cocktail_data['glass_type']
-            )
-            db.session.add(cocktail)
-            created_cocktails[cocktail_data['id']] = cocktail
-
-            for ingredient_str in cocktail_data['ingredients']:
-                parts = ingredient_str.split(' ', 1)
-                amount = parts[0] if len(parts) > 1 else ''
-                name = parts[1] if len(parts) > 1 else parts[0]
-                
-                ingredient = ingredient_dict[name]
-                
-                cocktail_ingredient = CocktailIngredient(
-                    cocktail=cocktail,
-                    ingredient=ingredient,
-                    amount=amount
-                )
-                db.session.add(cocktail_ingredient)
-
-        db.session.commit()
-        logger.info("Cocktails and relationships created successfully!")
-
-        # Add sample reviews
-        logger.info("Creating sample reviews...")
-        sample_reviews = [
-            {
-                "cocktail_id": 1,
-                "content": "Perfect summer drink! The mint makes it so refreshing.",
-                "rating": 5,
-                "user_id": created_users[0].id
-            },
-            {
-                "cocktail_id": 2,
-                "content": "Best espresso martini I've ever made at home. Perfect balance!",
-                "rating": 5,
-                "user_id": created_users[1].id
-            },
-            {
-                "cocktail_id": 3,
-                "content": "A classic for a reason. Perfect balance of bitter and sweet.",
-                "rating": 4,
-                "user_id": created_users[2].id
-            },
-            {
-                "cocktail_id": 4,
-                "content": "The passion fruit adds an amazing tropical twist!",
-                "rating": 5,
-                "user_id": created_users[0].id
-            },
-            {
-                "cocktail_id": 5,
-                "content": "You can't go wrong with a well-made Old Fashioned.",
-                "rating": 5,
-                "user_id": created_users[1].id
-            }
-        ]
+            # Create ingredients
+            logger.info("Creating ingredients...")
+            names = list(dict.fromkeys(
+                parse_ingredient(ingredient_str)[1]
+                for cocktail_data in SAMPLE_COCKTAILS
+                for ingredient_str in cocktail_data['ingredients']
+            ))
+            ingredient_ids = write_ingredients(names, upsert, chunk_size)
 
-        for review_data in sample_reviews:
-            review = Review(
-                content=review_data["content"],
-                rating=review_data["rating"],
-                user_id=review_data["user_id"],
-                cocktail_id=review_data["cocktail_id"],
-                created_at=datetime.utcnow()
-            )
-            db.session.add(review)
+            # Create cocktails and their relationships
+            logger.info("Creating cocktails and relationships...")
+            insert_chunked(cocktail_statement(upsert), [{
+                'id': cocktail_data['id'],
+                'name': cocktail_data['name'],
+                'image_url': cocktail_data['image'],
+                'instructions': cocktail_data['directions'],
+                'glass_type': cocktail_data['glass_type']
+            } for cocktail_data in SAMPLE_COCKTAILS], chunk_size)
+
+            links = {}
+            for cocktail_data in SAMPLE_COCKTAILS:
+                for ingredient_str in cocktail_data['ingredients']:
+                    amount, name = parse_ingredient(ingredient_str)
+                    links.setdefault((cocktail_data['id'], ingredient_ids[name]), amount)
+            write_cocktail_ingredients([{
+                'cocktail_id': cocktail_id,
+                'ingredient_id': ingredient_id,
+                'amount': amount
+            } for (cocktail_id, ingredient_id), amount in links.items()], upsert, chunk_size)
 
-        db.session.commit()
-        logger.info("Sample reviews created successfully!")
+            # Add sample reviews
+            logger.info("Creating sample reviews...")
+            now = datetime.utcnow()
+            insert_chunked(review_statement(upsert), [{
+                'id': review_data['id'],
+                'content': review_data['content'],
+                'rating': review_data['rating'],
+                'user_id': user_ids[SAMPLE_USERS[review_data['user']]['username']],
+                'cocktail_id': review_data['cocktail_id'],
+                'created_at': now,
+                'updated_at': now
+            } for review_data in SAMPLE_REVIEWS], chunk_size)
+
+            db.session.commit()
 
         logger.info("Database seeding completed successfully!")
         logger.info("Test user credentials created:")
-        for user in users:
+        for user in SAMPLE_USERS:
             logger.info(f"Username: {user['username']}, Password: {user['password']}")
 
     except Exception as e:
@@ -357,8 +529,181 @@ def seed_data(app):
         logger.error(f"An error occurred while seeding data: {str(e)}")
         raise e
 
+def zipf_cum_weights(n, exponent):
+    # Cumulative Zipf weights for random.choices(): rank 1 is the most popular
+    total, weights = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** exponent
+        weights.append(total)
+    return weights
+
+def ingredient_vocabulary():
+    # (unit, name) pairs ordered roughly by how common they are in real
+    # recipes; Zipfian usage follows this order
+    vocabulary = [('oz', spirit) for spirit in SPIRITS]
+    vocabulary += [('oz', f'Fresh {flavour} juice') for flavour in FLAVOURS[:6]]
+    vocabulary += [('oz', modifier) for modifier in MODIFIERS]
+    vocabulary += [('dashes', bitters) for bitters in BITTERS]
+    vocabulary += [('', garnish) for garnish in GARNISHES]
+    vocabulary += [('oz', f'{flavour.capitalize()} {form}') for form in FLAVOUR_FORMS for flavour in FLAVOURS]
+    vocabulary += [('oz', f'{style} {spirit.lower()}') for style in SPIRIT_STYLES for spirit in SPIRITS]
+    vocabulary += [('oz', f'{flavour.capitalize()}-infused {spirit.lower()}') for flavour in FLAVOURS for spirit in SPIRITS]
+    return list(dict.fromkeys(vocabulary))
+
+def ingredient_string(rng, unit, name):
+    if unit == 'dashes':
+        return f"{rng.randint(1, 3)} {unit} {name}"
+    if unit:
+        return f"{rng.choice(['0.25', '0.5', '0.75', '1', '1.5', '2'])} {unit} {name}"
+    return f"1 {name}"
+
+def generate_data(app, users, cocktails, reviews, seed=42, upsert=False, chunk_size=10000):
+    # Synthetic catalog for capacity planning. Popularity is skewed the way
+    # real traffic is: a few cocktails collect most reviews, a few power
+    # reviewers write most of them, and common ingredients (spirits, citrus)
+    # appear in far more recipes than the long tail. upsert works as for
+    # seed_data().
+    try:
+        logger.info(f"Generating {users} users, {cocktails} cocktails and {reviews} reviews (seed {seed})...")
+        rng = random.Random(seed)
+        with load_pragmas():
+            if not upsert:
+                clear_data()
+
+            # One hash shared by every generated user; hashing per user would
+            # dominate the run time
+            template = User(username='', email='')
+            template.set_password(SEED_PASSWORD)
+            user_ids = write_users(({
+                'username': f'user{n}',
+                'email': f'user{n}@example.com',
+                'password_hash': template.password_hash
+            } for n in range(1, users + 1)), upsert, chunk_size)
+            logger.info("Users created")
+
+            # Stored names are whatever parse_ingredient() makes of the recipe
+            # line, unit included, as for the sample recipes
+            vocabulary = ingredient_vocabulary()
+            ingredient_ids = write_ingredients([
+                parse_ingredient(ingredient_string(rng, unit, name))[1] for unit, name in vocabulary
+            ], upsert, chunk_size)
+            logger.info(f"{len(ingredient_ids)} ingredients created")
+
+            ingredient_weights = zipf_cum_weights(len(vocabulary), 1.1)
+            glass_types = list(dict.fromkeys(c['glass_type'] for c in SAMPLE_COCKTAILS))
+            images = [c['image'] for c in SAMPLE_COCKTAILS]
+            links = []
+
+            def cocktail_rows():
+                for cocktail_id in range(1, cocktails + 1):
+                    wanted = rng.randint(3, 7)
+                    picked = {}
+                    while len(picked) < wanted:
+                        unit, name = rng.choices(vocabulary, cum_weights=ingredient_weights)[0]
+                        picked.setdefault(name, unit)
+                    described = list(picked)
+                    for name, unit in picked.items():
+                        amount, parsed = parse_ingredient(ingredient_string(rng, unit, name))
+                        links.append({'cocktail_id': cocktail_id, 'ingredient_id': ingredient_ids[parsed], 'amount': amount})
+                    glass_type = rng.choice(glass_types)
+                    yield {
+                        'id': cocktail_id,
+                        'name': f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_STYLES)}",
+                        'image_url': rng.choice(images),
+                        'instructions': (
+                            f"{rng.choice(METHODS)} {', '.join(n.lower() for n in described[:-1])} and "
+                            f"{described[-1].lower()} with ice. Strain into a {glass_type.lower()} glass. "
+                            f"Garnish with a {rng.choice(GARNISHES).lower()}."
+                        ),
+                        'glass_type': glass_type
+                    }
+
+            def write_links():
+                # The links of the cocktails just inserted; writing them any
+                # earlier breaks the foreign key where it is enforced
+                write_cocktail_ingredients(links, upsert, chunk_size)
+                links.clear()
+
+            insert_chunked(cocktail_statement(upsert), cocktail_rows(), chunk_size, write_links)
+            logger.info("Cocktails and relationships created")
+
+            if users and cocktails:
+                # Popularity ranks are shuffled so popular rows are not simply the
+                # lowest ids; each cocktail has an underlying quality its ratings
+                # scatter around
+                popular_cocktails = list(range(1, cocktails + 1))
+                rng.shuffle(popular_cocktails)
+                power_reviewers = [user_ids[f'user{n}'] for n in range(1, users + 1)]
+                rng.shuffle(power_reviewers)
+                cocktail_weights = zipf_cum_weights(cocktails, 0.8)
+                user_weights = zipf_cum_weights(users, 0.8)
+                quality = [rng.uniform(2.5, 4.8) for _ in range(cocktails + 1)]
+                span = int(timedelta(days=730).total_seconds())
+
+                def review_rows():
+                    for review_id in range(1, reviews + 1):
+                        cocktail_id = rng.choices(popular_cocktails, cum_weights=cocktail_weights)[0]
+                        created_at = EPOCH + timedelta(seconds=rng.randrange(span))
+                        yield {
+                            'id': review_id,
+                            'content': ' '.join(rng.sample(REVIEW_PHRASES, rng.randint(1, 3))),
+                            'rating': min(5, max(1, round(rng.gauss(quality[cocktail_id], 1.0)))),
+                            'user_id': rng.choices(power_reviewers, cum_weights=user_weights)[0],
+                            'cocktail_id': cocktail_id,
+                            'created_at': created_at,
+                            'updated_at': created_at
+                        }
+
+                insert_chunked(review_statement(upsert), review_rows(), chunk_size)
+                logger.info("Reviews created")
+
+            db.session.commit()
+        logger.info("Synthetic data generated successfully!")
+        logger.info(f"Every generated user (user1 .. user{users}) has the password '{SEED_PASSWORD}'")
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"An error occurred while generating data: {str(e)}")
+        raise e
+
+def refresh_derived_data(app):
+    # Seeding writes the tables directly, so bring the search index, rating
+    # aggregates and catalog version back in line with them
+    migrations.upgrade()
+    indexed = search.FTS_TABLE in inspect(db.engine).get_table_names()
+    search.init_app(app)
+    if indexed:
+        search.rebuild()
+    CatalogState.bump()
+    db.session.commit()
+    migrations.reconcile_rating_aggregates()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Seed the sample data, or generate a synthetic catalog when any size is given"
+    )
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--cocktails', type=int)
+    parser.add_argument('--reviews', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--upsert', action='store_true',
+                        help="merge into the existing data by natural key instead of wiping it")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+
     app = create_app()
     with app.app_context():
         db.create_all()
-        seed_data(app)
\ No newline at end of file
+        if args.users is None and args.cocktails is None and args.reviews is None:
+            seed_data(app, upsert=args.upsert, chunk_size=args.chunk_size)
+        else:
+            generate_data(
+                app,
+                users=args.users if args.users is not None else 1000,
+                cocktails=args.cocktails if args.cocktails is not None else 5000,
+                reviews=args.reviews if args.reviews is not None else 50000,
+                seed=args.seed,
+                upsert=args.upsert,
+                chunk_size=args.chunk_size
+            )
+        refresh_derived_data(app)
@@ -0,0 +1,73 @@
+# serializers.py
+from sqlalchemy.orm import load_only, selectinload
+from models import Cocktail, CocktailIngredient
+
+COCKTAIL_FIELDS = (
+    'id', 'name', 'image_url', 'instructions', 'glass_type', 'ingredients', 'review_count', 'rating_avg'
+)
+LIST_FIELDS = COCKTAIL_FIELDS
+SEARCH_FIELDS = ('id', 'name', 'image_url', 'glass_type', 'ingredients', 'review_count', 'rating_avg')
+
+
+def parse_fields(value, default):
+    # `fields=id,name` -> ('id', 'name'); unknown names are rejected
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in COCKTAIL_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields = ('id',) + fields
+    return fields
+
+
+def cocktail_query_options(fields):
+    # Only SELECT the requested columns and skip the ingredient load entirely
+    # when the caller did not ask for ingredients
+    columns = [getattr(Cocktail, f) for f in fields if f != 'ingredients']
+    options = [load_only(*columns)]
+    if 'ingredients' in fields:
+        options.append(
+            selectinload(Cocktail.ingredients).joinedload(CocktailIngredient.ingredient)
+        )
+    return options
+
+
+def serialize_ingredients(cocktail):
+    return [{
+        'name': ci.ingredient.name,
+        'amount': ci.amount
+    } for ci in cocktail.ingredients]
+
+
+def serialize_cocktail(cocktail, fields=COCKTAIL_FIELDS):
+    data = {}
+    for field in fields:
+        if field == 'ingredients':
+            data['ingredients'] = serialize_ingredients(cocktail)
+        else:
+            data[field] = getattr(cocktail, field)
+    return data
+
+
+def serialize_review(review, username=None):
+    # `username` spares the relationship load when the caller already knows
+    # the author (the async handlers cannot lazy-load)
+    return {
+        'id': review.id,
+        'content': review.content,
+        'rating': review.rating,
+        'user': username if username is not None else review.user.username,
+        'created_at': review.created_at.isoformat()
+    }
+
+
+def serialize_user_review(review):
+    return {
+        'id': review.id,
+        'cocktail_name': review.cocktail.name,
+        'content': review.content,
+        'rating': review.rating,
+        'created_at': review.created_at.isoformat()
+    }
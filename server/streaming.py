@@ -0,0 +1,64 @@
+# streaming.py
+import json
+from flask import current_app, stream_with_context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Elements are encoded one at a time but written in chunks of about this
+# size, so the server neither buffers the whole array nor issues one tiny
+# write per element
+CHUNK_SIZE = 64 * 1024
+
+
+def dumps(value):
+    # Compact, key-sorted UTF-8 bytes, matching what jsonify would produce
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_array(items, serialize=None):
+    buffer = bytearray(b'[')
+    for index, item in enumerate(items):
+        if index:
+            buffer += b','
+        buffer += dumps(serialize(item) if serialize else item)
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']'
+    yield bytes(buffer)
+
+
+async def async_json_array(items, serialize=None):
+    # json_array() for an async iterable, e.g. an AsyncResult
+    buffer = bytearray(b'[')
+    first = True
+    async for item in items:
+        if not first:
+            buffer += b','
+        first = False
+        buffer += dumps(serialize(item) if serialize else item)
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']'
+    yield bytes(buffer)
+
+
+def stream_json(items, serialize=None):
+    # `items` may be a list or a lazily fetched result (e.g. a yield_per
+    # query); it is only iterated while the body is being sent. Errors past
+    # that point can no longer change the status code, so views should only
+    # stream once the query itself has been validated.
+    return current_app.response_class(
+        stream_with_context(json_array(items, serialize)),
+        mimetype='application/json'
+    )
@@ -0,0 +1,53 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read when config.py is imported, so the environment is set up
+# before the app modules are
+_workdir = tempfile.mkdtemp(prefix='cocktail-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['RATELIMIT_STORAGE_URL'] = f"sqlite:///{os.path.join(_workdir, 'ratelimit.db')}"
+os.environ['RATELIMIT_ENABLED'] = 'false'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['SQL_STATS_ENABLED'] = 'true'
+os.environ['SLOW_QUERY_MS'] = '10000'
+os.environ['CACHE_ENABLED'] = 'false'
+os.environ['METRICS_ENABLED'] = 'false'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+import seed  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def catalog(app):
+    # Replaces the catalog with a generated one of the given size
+    def generate(cocktails, reviews=None):
+        with app.app_context():
+            seed.generate_data(app, max(cocktails // 5, 10), cocktails, reviews or cocktails * 5, seed=7)
+            seed.refresh_derived_data(app)
+    return generate
+
+
+@pytest.fixture
+def auth(client):
+    # Authorization headers for a newly registered user
+    def login(username='tester'):
+        client.post('/api/register', json={'username': username, 'email': f'{username}@example.com', 'password': 'secret'})
+        token = client.post('/api/login', json={'username': username, 'password': 'secret'}).get_json()['token']
+        return {'Authorization': f'Bearer {token}'}
+    return login
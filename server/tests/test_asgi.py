@@ -0,0 +1,88 @@
+# tests/test_asgi.py
+import threading
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+pytest.importorskip('aiosqlite')
+
+from starlette.testclient import TestClient  # noqa: E402
+
+from asgi import create_asgi_app  # noqa: E402
+from config import Config  # noqa: E402
+
+PATHS = [
+    '/api/cocktails?limit=20',
+    '/api/cocktails?sort=top_rated&limit=5&fields=name,rating_avg',
+    '/api/cocktails?sort=bad',
+    '/api/cocktails/3',
+    '/api/cocktails/99999',
+    '/api/cocktails/3/reviews?limit=2',
+    '/api/cocktails/search?ingredient=lime&limit=5',
+    '/api/ingredients',
+]
+
+
+@pytest.fixture(scope='module')
+def asgi(app):
+    with TestClient(create_asgi_app()) as client:
+        yield client
+
+
+@pytest.mark.parametrize('snapshot', [False, True], ids=['orm', 'snapshot'])
+def test_asgi_routes_answer_like_the_flask_views(app, client, catalog, asgi, snapshot):
+    catalog(40)
+    for flask_app in (app, asgi.app.routes[-1].app.app):
+        flask_app.extensions['catalog'].enabled = snapshot
+    for path in PATHS:
+        expected, actual = client.get(path), asgi.get(path)
+        assert (actual.status_code, actual.json()) == (expected.status_code, expected.get_json()), path
+        for header in ('ETag', 'Last-Modified', 'X-Next-Cursor'):
+            assert actual.headers.get(header) == expected.headers.get(header), (path, header)
+        assert 'Server-Timing' in actual.headers
+
+
+def test_asgi_review_write_refreshes_the_snapshot(app, client, catalog, asgi, auth):
+    catalog(40)
+    asgi.app.routes[-1].app.app.extensions['catalog'].enabled = True
+    before = asgi.get('/api/cocktails/5').json()
+    created = asgi.post('/api/cocktails/5/reviews', json={'content': 'Tart', 'rating': 2}, headers=auth('async'))
+    assert created.status_code == 201
+    after = asgi.get('/api/cocktails/5').json()
+    assert after['review_count'] == before['review_count'] + 1
+    assert after['reviews'][0]['content'] == 'Tart'
+    assert after == client.get('/api/cocktails/5').get_json()
+
+
+def test_asgi_review_errors_answer_like_the_flask_views(client, catalog, asgi, auth):
+    catalog(10)
+    headers = auth('async-errors')
+    for path, body in [
+        ('/api/cocktails/5/reviews', {'content': 'Odd', 'rating': 'abc'}),
+        ('/api/cocktails/5/reviews', {'content': 'Odd', 'rating': 99}),
+        ('/api/cocktails/999999/reviews', {'content': 'Ghost', 'rating': 5}),
+    ]:
+        expected, actual = client.post(path, json=body, headers=headers), asgi.post(path, json=body, headers=headers)
+        assert actual.status_code == expected.status_code, path
+        assert actual.json() == expected.get_json(), path
+
+
+def test_asgi_rate_limit_counts_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(Config, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(Config, 'RATELIMIT_STORAGE_URL', 'memory://')
+    monkeypatch.setattr(Config, 'RATELIMIT_READ', '2 per minute')
+    app = create_asgi_app()
+    limiter = app.routes[-1].app.app.extensions['rate_limiter']
+    hit, threads = limiter.hit, []
+
+    def recorded_hit(endpoint, client):
+        threads.append(threading.current_thread())
+        return hit(endpoint, client)
+
+    monkeypatch.setattr(limiter, 'hit', recorded_hit)
+    with TestClient(app) as client:
+        statuses = [client.get('/api/ingredients').status_code for _ in range(3)]
+        loop_thread = client.portal.call(threading.current_thread)
+    assert statuses == [200, 200, 429]
+    assert threads and loop_thread not in threads
@@ -0,0 +1,78 @@
+# tests/test_auth.py
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_refresh_token
+
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    client.post('/api/register', json={'username': 'leaver', 'email': 'leaver@example.com', 'password': 'secret'})
+    tokens = client.post('/api/login', json={'username': 'leaver', 'password': 'secret'}).get_json()
+    headers = {'Authorization': f"Bearer {tokens['token']}"}
+    response = client.post('/api/logout', json={'refresh_token': tokens['refresh_token']}, headers=headers)
+    assert response.status_code == 200
+    assert client.post('/api/verify-token', headers=headers).status_code == 401
+    refresh = {'Authorization': f"Bearer {tokens['refresh_token']}"}
+    assert client.post('/api/token/refresh', headers=refresh).status_code == 401
+
+
+@pytest.mark.parametrize('refresh_token, status', [
+    ('not-a-jwt', 400),
+    ('a.b.c', 400),
+    (12345, 400),
+    ('expired', 401),
+])
+def test_logout_rejects_bad_refresh_tokens(app, client, auth, refresh_token, status):
+    headers = auth('logout-errors')
+    if refresh_token == 'expired':
+        with app.app_context():
+            refresh_token = create_refresh_token(identity=1, expires_delta=timedelta(seconds=-1))
+    response = client.post('/api/logout', json={'refresh_token': refresh_token}, headers=headers)
+    assert response.status_code == status
+    # Nothing was revoked, the access token still works
+    assert client.post('/api/verify-token', headers=headers).status_code == 200
+
+
+def test_revoked_token_ids_are_not_reused(app):
+    from sqlalchemy import text
+
+    from models import db
+    with app.app_context():
+        ddl = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'revoked_token'")).scalar()
+    assert 'AUTOINCREMENT' in ddl
+
+
+def login(client, username):
+    client.post('/api/register', json={'username': username, 'email': f'{username}@example.com', 'password': 'secret'})
+    return client.post('/api/login', json={'username': username, 'password': 'secret'}).get_json()
+
+
+def test_logout_with_a_refresh_token_another_worker_revoked(client):
+    from app import create_app
+    # Started before the first logout, so its revocation list has not
+    # synced it yet
+    other = create_app().test_client()
+    tokens = login(client, 'twice')
+    headers = {'Authorization': f"Bearer {tokens['token']}"}
+    assert client.post('/api/logout', json={'refresh_token': tokens['refresh_token']}, headers=headers).status_code == 200
+
+    second = login(client, 'twice')
+    response = other.post('/api/logout', json={'refresh_token': tokens['refresh_token']}, headers={
+        'Authorization': f"Bearer {second['token']}"
+    })
+    assert response.status_code == 200
+    assert other.post('/api/verify-token', headers={'Authorization': f"Bearer {second['token']}"}).status_code == 401
+
+
+def test_failed_logout_commit_revokes_nothing(client, monkeypatch):
+    from models import db
+    tokens = login(client, 'unlucky')
+    headers = {'Authorization': f"Bearer {tokens['token']}"}
+
+    def fail():
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(db.session, 'commit', fail)
+    assert client.post('/api/logout', headers=headers).status_code == 500
+    monkeypatch.undo()
+    assert client.post('/api/verify-token', headers=headers).status_code == 200
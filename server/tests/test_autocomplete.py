@@ -0,0 +1,42 @@
+# tests/test_autocomplete.py
+import pytest
+
+import autocomplete
+from app import create_app
+
+
+def create_cocktail(client, headers, name, ingredients):
+    response = client.post('/api/cocktails', json={
+        'name': name, 'instructions': 'Build', 'glass_type': 'Rocks',
+        'ingredients': [{'name': ingredient, 'amount': '1 oz'} for ingredient in ingredients],
+    }, headers=headers)
+    assert response.status_code == 201
+
+
+def complete(client, prefix):
+    response = client.get('/api/ingredients/autocomplete', query_string={'prefix': prefix, 'limit': 50})
+    return {suggestion['name'] for suggestion in response.get_json()}
+
+
+@pytest.mark.parametrize('dense', [False, True], ids=['range', 'ranking'])
+def test_trailing_space_matches_whole_words(client, catalog, auth, monkeypatch, dense):
+    catalog(10)
+    if dense:
+        monkeypatch.setattr(autocomplete, 'DENSE_MATCHES', 0)
+    create_cocktail(client, auth('typist'), 'Limes', ['Lime', 'Lime Juice', 'Limeade', 'Key Lime'])
+    assert {'Lime', 'Lime Juice', 'Key Lime'} <= complete(client, 'lime ')
+    assert 'Limeade' not in complete(client, 'lime ')
+    assert 'Limeade' in complete(client, 'lime')
+
+
+def test_other_workers_ingredients_are_suggested(catalog, auth):
+    catalog(10)
+    # Two workers started on the same catalog
+    first, second = create_app().test_client(), create_app().test_client()
+    headers = auth('worker')
+    create_cocktail(first, headers, 'First', ['Quuxberry Cordial'])
+    # The second worker's own, newer ingredient must not hide the older one
+    create_cocktail(second, headers, 'Second', ['Quuxberry Bitters'])
+    assert complete(second, 'quuxberry') == {'Quuxberry Cordial', 'Quuxberry Bitters'}
+    create_cocktail(second, headers, 'Third', ['Zorblat Soda'])
+    assert complete(first, 'zorblat') == {'Zorblat Soda'}
@@ -0,0 +1,38 @@
+# tests/test_bulk.py
+import json
+
+
+def ndjson(*records):
+    return '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records) + '\n'
+
+
+def cocktail(name, ingredients=None):
+    return {
+        'name': name, 'instructions': 'Stir', 'glass_type': 'Rocks',
+        'ingredients': ingredients or [{'name': 'Gin', 'amount': '2 oz'}],
+    }
+
+
+def test_bad_lines_are_reported_without_failing_their_chunk(client, auth):
+    body = ndjson(
+        cocktail('Bulk One'),
+        cocktail('Bulk Numeric', [{'name': 5, 'amount': '1 oz'}]),
+        cocktail('Bulk Two'),
+        cocktail('Bulk List', [{'name': 'Gin', 'amount': ['1 oz']}]),
+        '{not json',
+        cocktail('Bulk Three', [{'name': 'Bulk Bitters', 'amount': None}]),
+    )
+    response = client.post(
+        '/api/cocktails/bulk', data=body, headers={**auth('importer'), 'Content-Type': 'application/x-ndjson'}
+    )
+    assert response.status_code == 201
+    result = response.get_json()
+    assert result['imported'] == 3
+    assert result['failed'] == 3
+    assert [error['line'] for error in result['errors']] == [2, 4, 5]
+    assert result['errors'][0]['error'] == 'Ingredient name must be a string'
+    assert result['errors'][1]['error'] == 'Ingredient amount must be a string'
+
+    names = {c['name'] for c in client.get('/api/cocktails/search?q=bulk&limit=50').get_json()}
+    assert {'Bulk One', 'Bulk Two', 'Bulk Three'} <= names
+    assert not names & {'Bulk Numeric', 'Bulk List'}
@@ -0,0 +1,36 @@
+# tests/test_cocktails.py
+import pytest
+
+RECIPE = {'name': 'Typed Sour', 'instructions': 'Shake', 'glass_type': 'Coupe'}
+
+
+@pytest.mark.parametrize('ingredients', [
+    [{'name': 5, 'amount': '1 oz'}],
+    [{'name': '', 'amount': '1 oz'}],
+    [{'name': 'Gin', 'amount': {'oz': 1}}],
+    [{'name': 'Gin', 'amount': ['1 oz']}],
+    ['Gin'],
+    'Gin',
+], ids=['numeric-name', 'empty-name', 'dict-amount', 'list-amount', 'string-item', 'not-a-list'])
+def test_malformed_ingredients_are_rejected(client, auth, ingredients):
+    headers = auth('typist')
+    response = client.post('/api/cocktails', json={**RECIPE, 'ingredients': ingredients}, headers=headers)
+    assert response.status_code == 400
+
+    created = client.post('/api/cocktails', json={
+        **RECIPE, 'ingredients': [{'name': 'Gin', 'amount': '2 oz'}]
+    }, headers=headers).get_json()
+    response = client.put(f"/api/cocktails/{created['id']}", json={
+        **RECIPE, 'ingredients': ingredients
+    }, headers=headers)
+    assert response.status_code == 400
+    assert client.get(f"/api/cocktails/{created['id']}").get_json()['ingredients'] == [
+        {'name': 'Gin', 'amount': '2 oz'}
+    ]
+
+
+def test_missing_amount_is_allowed(client, auth):
+    response = client.post('/api/cocktails', json={
+        **RECIPE, 'ingredients': [{'name': 'Gin'}, {'name': 'Tonic', 'amount': None}]
+    }, headers=auth('typist'))
+    assert response.status_code == 201
@@ -0,0 +1,61 @@
+# tests/test_pagination.py
+import pytest
+
+from pagination import encode_cursor
+
+
+@pytest.fixture(params=[False, True], ids=['orm', 'snapshot'])
+def snapshot(request, app):
+    app.extensions['catalog'].enabled = request.param
+    yield request.param
+    app.extensions['catalog'].enabled = True
+
+
+@pytest.mark.parametrize('query', [
+    f"cursor={encode_cursor('abc')}",
+    f"cursor={encode_cursor(True)}",
+    f"sort=top_rated&cursor={encode_cursor('x', 1)}",
+    f"sort=top_rated&cursor={encode_cursor(4.5, [1])}",
+])
+def test_forged_list_cursors_are_rejected(client, catalog, snapshot, query):
+    catalog(10)
+    response = client.get(f'/api/cocktails?{query}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+def test_list_cursor_pages_through_catalog(client, catalog, snapshot):
+    catalog(10)
+    first = client.get('/api/cocktails?limit=4')
+    second = client.get(f"/api/cocktails?limit=4&cursor={first.headers['X-Next-Cursor']}")
+    assert [c['id'] for c in second.get_json()] == [5, 6, 7, 8]
+
+
+@pytest.fixture
+def reviewed(client, auth):
+    # A cocktail with five reviews by the returned user
+    headers = auth('pager')
+    cocktail_id = client.post('/api/cocktails', json={
+        'name': 'Paged Sour', 'instructions': 'Shake', 'glass_type': 'Coupe',
+        'ingredients': [{'name': 'Gin', 'amount': '2 oz'}],
+    }, headers=headers).get_json()['id']
+    for n in range(5):
+        client.post(f'/api/cocktails/{cocktail_id}/reviews', json={'content': f'Take {n}', 'rating': 3}, headers=headers)
+    return cocktail_id, headers
+
+
+@pytest.mark.parametrize('endpoint', ['cocktail', 'user'])
+def test_review_cursors_page_and_reject_forgeries(client, reviewed, endpoint):
+    cocktail_id, headers = reviewed
+    path = f'/api/cocktails/{cocktail_id}/reviews' if endpoint == 'cocktail' else '/api/user/profile/reviews'
+
+    first = client.get(f'{path}?limit=2', headers=headers)
+    second = client.get(f"{path}?limit=2&cursor={first.headers['X-Next-Cursor']}", headers=headers)
+    contents = [r['content'] for r in first.get_json() + second.get_json()]
+    assert contents[:4] == ['Take 4', 'Take 3', 'Take 2', 'Take 1']
+
+    created_at = first.get_json()[-1]['created_at']
+    for cursor in (encode_cursor(created_at, 'abc'), encode_cursor('not a date', 1), encode_cursor(created_at)):
+        response = client.get(f'{path}?cursor={cursor}', headers=headers)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,53 @@
+# tests/test_passwords.py
+import os
+import signal
+import time
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.security import check_password_hash
+
+from passwords import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher()
+    hasher.init_app(SimpleNamespace(extensions={}, config={
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_HASH_WORKERS': 1,
+        'PASSWORD_HASH_TIMEOUT': 30,
+        'PASSWORD_HASH_QUEUE_LIMIT': 0,
+    }))
+    yield hasher
+    hasher.shutdown()
+
+
+def test_broken_pool_is_replaced(hasher):
+    assert check_password_hash(hasher.hash('secret'), 'secret')
+    broken = hasher._pool
+    for pid in list(broken._processes):
+        os.kill(pid, signal.SIGKILL)
+    # The call that finds the pool broken is hashed inline, the next one
+    # runs in a new pool
+    assert check_password_hash(hasher.hash('secret'), 'secret')
+    assert check_password_hash(hasher.hash('secret'), 'secret')
+    assert hasher._pool is not None and hasher._pool is not broken
+
+
+def test_slot_is_held_until_a_timed_out_hash_finishes(hasher):
+    hasher.hash('warm up')
+    hasher.method, hasher.timeout = 'pbkdf2:sha256:3000000', 0.01
+    with pytest.raises(HasherBusy):
+        hasher.hash('slow')
+    # The hash is still running in the only process, so its slot is taken
+    assert not hasher._slots.acquire(blocking=False)
+    hasher.method, hasher.timeout = 'pbkdf2:sha256:1000', 30
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            assert check_password_hash(hasher.hash('secret'), 'secret')
+            break
+        except HasherBusy:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
@@ -0,0 +1,54 @@
+# tests/test_query_counts.py
+import logging
+
+import pytest
+
+# Two catalog sizes an order of magnitude apart, with pages larger than the
+# small one: a route whose statement count follows the number of rows (N+1
+# loading) shows up as a difference
+SIZES = (30, 300)
+
+PATHS = (
+    '/api/cocktails?limit=100',
+    '/api/cocktails?limit=100&sort=top_rated',
+    '/api/cocktails?limit=100&fields=id,name,ingredients',
+    '/api/cocktails/1',
+    '/api/cocktails/2',
+)
+
+
+def statement_count(client, caplog, path):
+    # QueryStats logs the statements a request ran once it is torn down, so
+    # the count includes those run while a streamed body was sent
+    caplog.clear()
+    with client.get(path) as response:
+        assert response.status_code == 200, path
+        response.get_data()
+    counts = [r.sql_statements for r in caplog.records if r.name == 'query_stats']
+    assert len(counts) == 1, path
+    return counts[0]
+
+
+def count_statements(client, caplog, catalog, cocktails):
+    catalog(cocktails)
+    counts = {}
+    for path in PATHS:
+        # The first request after a reseed also refreshes the snapshot
+        statement_count(client, caplog, path)
+        counts[path] = statement_count(client, caplog, path)
+    return counts
+
+
+@pytest.mark.parametrize('snapshot', [False, True], ids=['orm', 'snapshot'])
+def test_statement_count_does_not_grow_with_catalog(app, client, catalog, caplog, snapshot):
+    caplog.set_level(logging.INFO, logger='query_stats')
+    catalog_cache = app.extensions['catalog']
+    enabled, catalog_cache.enabled = catalog_cache.enabled, snapshot
+    try:
+        small = count_statements(client, caplog, catalog, SIZES[0])
+        large = count_statements(client, caplog, catalog, SIZES[1])
+    finally:
+        catalog_cache.enabled = enabled
+    assert small == large
+    # Page, ingredients and the embedded reviews are a handful of statements
+    assert max(large.values()) <= 6, large
@@ -0,0 +1,103 @@
+# tests/test_query_plans.py
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import seed
+from models import db
+from query_stats import explain
+
+# A full table scan: SQLite reports walking an index as "SCAN t USING INDEX"
+FULL_SCAN = re.compile(r'(^|\| )SCAN \w+( AS \w+)?( \||$)')
+
+
+@contextmanager
+def plans(app):
+    # EXPLAIN QUERY PLAN of every statement the app runs meanwhile, with its
+    # real parameters
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            captured.append((' '.join(statement.split()), explain(conn, statement, parameters)))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def check(captured, table_filter, index_name):
+    # The app's statements matching `table_filter` use `index_name` and
+    # never scan a whole table or sort in a temporary b-tree
+    matching = [(sql, plan) for sql, plan in captured if table_filter in sql]
+    assert matching, f'no statement matching {table_filter!r} ran'
+    for sql, plan in matching:
+        assert plan and not plan.startswith('unavailable'), (sql, plan)
+        assert not FULL_SCAN.search(plan), (sql, plan)
+        assert 'TEMP B-TREE' not in plan, (sql, plan)
+    assert any(index_name in plan for _, plan in matching), matching
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    with app.app_context():
+        seed.generate_data(app, 50, 300, 1500, seed=7)
+        seed.refresh_derived_data(app)
+
+
+@pytest.fixture
+def orm(app):
+    # The ORM path, where the catalog statements run per request
+    catalog_cache = app.extensions['catalog']
+    enabled, catalog_cache.enabled = catalog_cache.enabled, False
+    yield
+    catalog_cache.enabled = enabled
+
+
+def test_top_rated_page_walks_rating_index(app, client, seeded, orm):
+    with plans(app) as captured:
+        response = client.get('/api/cocktails?sort=top_rated&limit=20')
+        cursor = response.headers['X-Next-Cursor']
+        response.get_data()
+        client.get(f'/api/cocktails?sort=top_rated&limit=20&cursor={cursor}').get_data()
+    check(captured, 'ORDER BY cocktail.rating_avg DESC', 'ix_cocktail_rating_avg_id')
+
+
+def test_cocktail_ingredients_use_cocktail_index(app, client, seeded, orm):
+    with plans(app) as captured:
+        client.get('/api/cocktails?limit=20').get_data()
+        client.get('/api/cocktails/1').get_data()
+    check(captured, 'FROM cocktail_ingredient', 'ix_cocktail_ingredient_cocktail_ingredient')
+
+
+def test_review_pages_use_review_indexes(app, client, auth, seeded):
+    headers = auth('planner')
+    client.post('/api/cocktails/1/reviews', json={'content': 'Plan', 'rating': 4}, headers=headers)
+    with plans(app) as captured:
+        response = client.get('/api/cocktails/1/reviews?limit=2')
+        client.get(f"/api/cocktails/1/reviews?limit=2&cursor={response.headers['X-Next-Cursor']}")
+        client.get('/api/cocktails/2')
+    check(captured, 'WHERE review.cocktail_id', 'ix_review_cocktail_created')
+
+    with plans(app) as captured:
+        client.get('/api/user/profile/reviews', headers=headers)
+    check(captured, 'WHERE review.user_id', 'ix_review_user_created')
+
+
+def test_cocktail_delete_uses_foreign_key_indexes(app, client, auth, seeded):
+    headers = auth('deleter')
+    created = client.post('/api/cocktails', json={
+        'name': 'Plan Sour', 'instructions': 'Shake', 'glass_type': 'Coupe',
+        'ingredients': [{'name': 'Gin', 'amount': '50 ml'}, {'name': 'Lemon', 'amount': '25 ml'}],
+    }, headers=headers).get_json()
+    client.post(f"/api/cocktails/{created['id']}/reviews", json={'content': 'Plan', 'rating': 5}, headers=headers)
+    with plans(app) as captured:
+        assert client.delete(f"/api/cocktails/{created['id']}", headers=headers).status_code == 200
+    check(captured, 'DELETE FROM review', 'ix_review_cocktail_created')
+    check(captured, 'DELETE FROM cocktail_ingredient', 'ix_cocktail_ingredient_cocktail_ingredient')
@@ -0,0 +1,56 @@
+# tests/test_ratelimit.py
+import pytest
+
+from app import create_app
+from config import Config
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    # A rate-limited app with tiny write limits and in-process counters
+    def build(**config):
+        monkeypatch.setattr(Config, 'RATELIMIT_ENABLED', True)
+        monkeypatch.setattr(Config, 'RATELIMIT_STORAGE_URL', 'memory://')
+        monkeypatch.setattr(Config, 'RATELIMIT_DEFAULT', '2 per hour')
+        for name, value in config.items():
+            monkeypatch.setattr(Config, name, value)
+        return create_app().test_client()
+    return build
+
+
+def test_browsing_uses_the_read_limit(limited, catalog):
+    catalog(10)
+    client = limited(RATELIMIT_READ='20 per minute')
+    for _ in range(10):
+        assert client.get('/api/cocktails').status_code == 200
+        assert client.get('/api/cocktails/1').status_code == 200
+        assert client.get('/api/ingredients').status_code == 200
+        assert client.post('/api/verify-token').status_code == 401
+    # Routes without a limit of their own still get RATELIMIT_DEFAULT
+    assert [client.post('/api/logout').status_code for _ in range(3)][-1] == 429
+
+
+def test_client_address_comes_from_trusted_proxy(limited):
+    client = limited(PROXY_FIX={'x_for': 1, 'x_proto': 0, 'x_host': 0, 'x_prefix': 0})
+
+    def logout(forwarded_for):
+        return client.post('/api/logout', headers={'X-Forwarded-For': forwarded_for}).status_code
+
+    assert logout('203.0.113.1') != 429
+    assert logout('203.0.113.1') != 429
+    assert logout('203.0.113.1') == 429
+    # Only the entry the proxy appended counts; a spoofed one does not
+    assert logout('10.9.9.9, 203.0.113.1') == 429
+    assert logout('203.0.113.2') != 429
+
+
+def test_incomplete_counter_storage_cannot_be_created():
+    from ratelimit import CounterStorage, MemoryStorage
+
+    class IncrOnly(CounterStorage):
+        def incr(self, key, ttl):
+            return 1
+
+    with pytest.raises(TypeError):
+        IncrOnly()
+    MemoryStorage()
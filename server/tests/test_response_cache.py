@@ -0,0 +1,81 @@
+# tests/test_response_cache.py
+import pytest
+
+from app import create_app
+from pagination import encode_cursor
+
+
+@pytest.fixture
+def workers(app):
+    # Two apps on one database, each with its own in-process response cache,
+    # standing in for two gunicorn workers
+    apps = [app, create_app()]
+    for worker in apps:
+        worker.extensions['response_cache'].enabled = True
+    yield [worker.test_client() for worker in apps]
+    for worker in apps:
+        worker.extensions['response_cache'].enabled = False
+
+
+@pytest.mark.parametrize('snapshot', [False, True], ids=['orm', 'snapshot'])
+def test_other_workers_writes_are_not_served_from_cache(app, workers, auth, snapshot):
+    first, second = workers
+    for worker in (first, second):
+        worker.application.extensions['catalog'].enabled = snapshot
+    headers = auth('cacher')
+    created = first.post('/api/cocktails', json={
+        'name': 'Cache Fizz', 'instructions': 'Build', 'glass_type': 'Highball',
+        'ingredients': [{'name': 'Gin', 'amount': '50 ml'}],
+    }, headers=headers).get_json()
+    path = f"/api/cocktails/{created['id']}"
+    # The page starting at the new cocktail
+    listing = f"/api/cocktails?cursor={encode_cursor(created['id'] - 1)}"
+
+    # Both workers cache the detail and the list
+    for worker in (first, second):
+        assert worker.get(path).get_json()['name'] == 'Cache Fizz'
+        worker.get(listing).get_data()
+    stale = second.get(path)
+
+    # A write on the first worker only bumps that worker's namespace counters
+    assert first.put(path, json={
+        'name': 'Cache Sour', 'instructions': 'Shake', 'glass_type': 'Coupe',
+        'ingredients': [{'name': 'Gin', 'amount': '50 ml'}],
+    }, headers=headers).status_code == 200
+
+    response = second.get(path)
+    assert response.get_json()['name'] == 'Cache Sour'
+    assert response.headers['ETag'] != stale.headers['ETag']
+    listed = second.get(listing).get_data(as_text=True)
+    assert 'Cache Sour' in listed and 'Cache Fizz' not in listed
+    # A client revalidating with the old ETag gets the new body, not a 304
+    assert second.get(path, headers={'If-None-Match': stale.headers['ETag']}).status_code == 200
+
+
+def test_streamed_bodies_over_the_size_cap_are_not_cached(app, client):
+    response_cache, catalog = app.extensions['response_cache'], app.extensions['catalog']
+    # The ORM path streams the ingredient list
+    catalog.enabled, response_cache.enabled, response_cache.max_body_bytes = False, True, 64
+    try:
+        entries = response_cache.backend.stats()['entries']
+        assert len(client.get('/api/ingredients').get_data()) > 64
+        assert response_cache.backend.stats()['entries'] == entries
+
+        response_cache.max_body_bytes = None
+        client.get('/api/ingredients').get_data()
+        assert response_cache.backend.stats()['entries'] == entries + 1
+    finally:
+        catalog.enabled, response_cache.enabled = app.config['CATALOG_SNAPSHOT_ENABLED'], False
+        response_cache.max_body_bytes = app.config['CACHE_MAX_BODY_BYTES']
+
+
+def test_incomplete_cache_backend_cannot_be_created():
+    from cache import CacheBackend, MemoryCache
+
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+    MemoryCache()
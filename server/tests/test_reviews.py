@@ -0,0 +1,66 @@
+# tests/test_reviews.py
+import pytest
+
+from models import CatalogState
+
+
+@pytest.fixture
+def cocktail(client, auth):
+    headers = auth('bartender')
+    created = client.post('/api/cocktails', json={
+        'name': 'Review Sour', 'instructions': 'Shake', 'glass_type': 'Coupe',
+        'ingredients': [{'name': 'Gin', 'amount': '2 oz'}],
+    }, headers=headers).get_json()
+    return created['id']
+
+
+def aggregates(client, cocktail_id):
+    data = client.get(f'/api/cocktails/{cocktail_id}').get_json()
+    return data['review_count'], data['rating_avg']
+
+
+def catalog_version(app):
+    with app.app_context():
+        return CatalogState.current().version
+
+
+def test_review_writes_maintain_aggregates(client, auth, cocktail):
+    first, second = auth('critic1'), auth('critic2')
+    review = client.post(f'/api/cocktails/{cocktail}/reviews', json={'content': 'Fine', 'rating': 4}, headers=first)
+    assert review.status_code == 201
+    client.post(f'/api/cocktails/{cocktail}/reviews', json={'content': 'Meh', 'rating': '2'}, headers=second)
+    assert aggregates(client, cocktail) == (2, 3.0)
+
+    review_id = review.get_json()['id']
+    assert client.put(f'/api/reviews/{review_id}', json={'rating': 5}, headers=first).status_code == 200
+    assert aggregates(client, cocktail) == (2, 3.5)
+    assert client.put(f'/api/reviews/{review_id}', json={'content': 'Great'}, headers=first).status_code == 200
+    assert aggregates(client, cocktail) == (2, 3.5)
+
+    assert client.delete(f'/api/reviews/{review_id}', headers=first).status_code == 200
+    assert aggregates(client, cocktail) == (1, 2.0)
+
+
+@pytest.mark.parametrize('rating', ['abc', 99, 0, -1, 4.5, True, None, [5]])
+def test_invalid_ratings_are_rejected(app, client, auth, cocktail, rating):
+    headers = auth('critic3')
+    version = catalog_version(app)
+    response = client.post(f'/api/cocktails/{cocktail}/reviews', json={'content': 'Bad', 'rating': rating}, headers=headers)
+    assert response.status_code == 400
+    assert aggregates(client, cocktail) == (0, 0.0)
+    assert catalog_version(app) == version
+
+    review_id = client.post(
+        f'/api/cocktails/{cocktail}/reviews', json={'content': 'Good', 'rating': 3}, headers=headers
+    ).get_json()['id']
+    response = client.put(f'/api/reviews/{review_id}', json={'content': 'Changed', 'rating': rating}, headers=headers)
+    assert response.status_code == 400
+    assert aggregates(client, cocktail) == (1, 3.0)
+    assert client.get(f'/api/cocktails/{cocktail}/reviews').get_json()[0]['content'] == 'Good'
+
+
+def test_review_on_unknown_cocktail_is_not_found(app, client, auth):
+    version = catalog_version(app)
+    response = client.post('/api/cocktails/999999/reviews', json={'content': 'Ghost', 'rating': 5}, headers=auth('critic4'))
+    assert response.status_code == 404
+    assert catalog_version(app) == version
@@ -0,0 +1,48 @@
+# tests/test_seed.py
+import seed
+from models import db, Cocktail, CocktailIngredient, Ingredient
+
+
+def links(cocktail_id):
+    return dict(db.session.query(Ingredient.name, CocktailIngredient.amount).join(
+        CocktailIngredient, CocktailIngredient.ingredient_id == Ingredient.id
+    ).filter(CocktailIngredient.cocktail_id == cocktail_id))
+
+
+def test_upsert_replaces_a_cocktails_ingredients(app, monkeypatch):
+    with app.app_context():
+        seed.seed_data(app)
+        first = seed.SAMPLE_COCKTAILS[0]
+        before = links(first['id'])
+        version = db.session.get(Cocktail, first['id']).version
+
+        # The recipe loses an ingredient and changes an amount
+        edited = dict(first, ingredients=first['ingredients'][1:])
+        amount, name = seed.parse_ingredient(edited['ingredients'][0])
+        edited['ingredients'] = [f'9 {name}'] + edited['ingredients'][1:]
+        monkeypatch.setattr(seed, 'SAMPLE_COCKTAILS', [edited] + seed.SAMPLE_COCKTAILS[1:])
+        seed.seed_data(app, upsert=True)
+        db.session.expire_all()
+
+        dropped = seed.parse_ingredient(first['ingredients'][0])[1]
+        after = links(first['id'])
+        assert dropped in before and dropped not in after
+        assert after[name] == '9'
+        assert set(after) == set(before) - {dropped}
+        assert db.session.get(Cocktail, first['id']).version > version
+
+        # Reseeding unchanged data writes nothing
+        version = db.session.get(Cocktail, first['id']).version
+        seed.seed_data(app, upsert=True)
+        db.session.expire_all()
+        assert links(first['id']) == after
+        assert db.session.get(Cocktail, first['id']).version == version
+
+
+def test_generated_links_follow_their_cocktails(app, monkeypatch):
+    # SQLite leaves foreign keys unchecked unless asked, unlike PostgreSQL
+    monkeypatch.setitem(seed.SQLITE_LOAD_PRAGMAS, 'foreign_keys', 'ON')
+    with app.app_context():
+        seed.generate_data(app, 5, 25, 50, seed=3, chunk_size=10)
+        assert db.session.query(Cocktail).count() == 25
+        assert db.session.query(CocktailIngredient.cocktail_id).distinct().count() == 25